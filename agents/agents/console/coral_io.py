@@ -0,0 +1,122 @@
+"""
+Coral I/O
+Parsing of Coral mentions and the tip results other agents send back
+"""
+
+import html
+import json
+import re
+from typing import Dict, Any, List, Optional
+
+MESSAGE_PATTERN = re.compile(r'<message\b([^>]*?)(?:/>|>(.*?)</message>)', re.DOTALL)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)\s*=\s*"([^"]*)"')
+CONTENT_PATTERN = re.compile(r'<content>(.*?)</content>', re.DOTALL)
+
+THREAD_KEYS = ('threadId', 'thread_id', 'threadID')
+SENDER_KEYS = ('senderId', 'sender_id', 'sender', 'senderID')
+
+
+def _first(mapping: Dict[str, Any], keys) -> Optional[str]:
+    for key in keys:
+        if mapping.get(key):
+            return str(mapping[key])
+    return None
+
+
+def parse_mentions(raw: Any) -> List[Dict[str, str]]:
+    """Extract {'threadId', 'senderId', 'content'} dicts from a wait_for_mentions result
+
+    Coral returns mentions either as JSON or as XML-like text depending on
+    the server version; both are accepted. Anything unrecognized yields no
+    mentions.
+    """
+    if isinstance(raw, (list, dict)):
+        data = raw
+    else:
+        text = str(raw or '')
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+
+        if data is None:
+            mentions = []
+            for attributes, body in MESSAGE_PATTERN.findall(text):
+                attrs = {k: html.unescape(v) for k, v in ATTRIBUTE_PATTERN.findall(attributes)}
+                content = attrs.get('content')
+                if content is None:
+                    inner = CONTENT_PATTERN.search(body or '')
+                    content = html.unescape((inner.group(1) if inner else body or '').strip())
+                mentions.append({
+                    'threadId': _first(attrs, THREAD_KEYS),
+                    'senderId': _first(attrs, SENDER_KEYS),
+                    'content': content
+                })
+            return [m for m in mentions if m['threadId'] and m['content']]
+
+    if isinstance(data, dict):
+        data = data.get('messages', data.get('mentions', [data]))
+
+    mentions = []
+    for message in data if isinstance(data, list) else []:
+        if not isinstance(message, dict):
+            continue
+        mention = {
+            'threadId': _first(message, THREAD_KEYS),
+            'senderId': _first(message, SENDER_KEYS),
+            'content': message.get('content') or ''
+        }
+        if mention['threadId'] and mention['content']:
+            mentions.append(mention)
+    return mentions
+
+
+def _json_objects(text: str):
+    """Yield every JSON object embedded in free text"""
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except ValueError:
+            start = text.find('{', start + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        start = text.find('{', end)
+
+
+def parse_tip_reply(content: str, types) -> Optional[Dict[str, Any]]:
+    """Return the first JSON object in a message whose `type` is one of `types` and that has a tip_id
+
+    The tip_id is read from the top level, falling back to the echoed tip.
+    """
+    for obj in _json_objects(content or ''):
+        if obj.get('type') not in types:
+            continue
+        tip = obj.get('tip')
+        tip_id = obj.get('tip_id') or (tip.get('tip_id') if isinstance(tip, dict) else None)
+        if isinstance(tip_id, str) and tip_id:
+            return dict(obj, tip_id=tip_id)
+    return None
+
+
+def parse_thread_id(raw: Any) -> Optional[str]:
+    """Pull the thread ID out of a create_thread result"""
+    text = str(raw or '')
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        thread = data.get('thread', data)
+        found = _first(thread, ('threadId', 'id', 'thread_id')) if isinstance(thread, dict) else None
+        if found:
+            return found
+
+    match = re.search(r'\b(?:threadId|thread_id|id)\b["\']?\s*[=:]\s*["\']?([\w-]+)', text)
+    return match.group(1) if match else None
+
+
+def tools_by_name(tools) -> Dict[str, Any]:
+    return {tool.name: tool for tool in tools}
@@ -7,10 +7,13 @@ Handles user input and coordinates other agents
 import asyncio
 import os
 import re
+import sys
 import json
 import logging
+import threading
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
 from langchain.chat_models import init_chat_model
@@ -18,6 +21,8 @@ from langchain.prompts import ChatPromptTemplate
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 
+from coral_io import parse_mentions, parse_thread_id, parse_tip_reply, tools_by_name
+
 # Load environment variables
 load_dotenv()
 
@@ -66,6 +71,104 @@ class ConsoleTipInterface:
         
         return history
 
+class StdinReader:
+    """Console lines delivered to the event loop without blocking it
+    
+    A daemon thread does the blocking reads and hands each line to the loop,
+    so the loop keeps running tips while the user types, and an unfinished
+    read never holds up shutdown. (connect_read_pipe would make the terminal
+    non-blocking, which stdout shares, and breaks large prints.)
+    """
+    
+    def __init__(self):
+        self._lines: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _read(self, loop: asyncio.AbstractEventLoop) -> None:
+        while True:
+            try:
+                line = sys.stdin.readline()
+            except (OSError, ValueError):
+                line = ''
+            loop.call_soon_threadsafe(self._lines.put_nowait, line.rstrip('\r\n') if line else None)
+            if not line:
+                return
+    
+    async def readline(self, prompt: str = "") -> Optional[str]:
+        """Next line without its newline, or None at end of input"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._read, args=(asyncio.get_running_loop(),),
+                                            name="stdin-reader", daemon=True)
+            self._thread.start()
+        if prompt:
+            print(prompt, end='', flush=True)
+        return await self._lines.get()
+
+# Replies the validation and transaction agents send about a tip, echoing its tip_id
+REPLY_TYPES = ('validation_result', 'transaction_result')
+
+class ReplyRouter:
+    """Hands the replies in the console's Coral inbox to the tips waiting for them
+    
+    One task reads wait_for_mentions for the whole console. Each tip
+    registers a future per reply type under its tip_id, which the agents
+    echo back, so any number of tips can wait at once without one taking
+    another's replies. A reply for a tip nobody waits for any more is
+    dropped; mentions that are not tip replies go to `unrouted`.
+    """
+    
+    def __init__(self, wait_for_mentions, timeout_ms: int, unrouted: Callable[[List[Dict[str, str]]], None]):
+        self.wait_for_mentions = wait_for_mentions
+        self.timeout_ms = timeout_ms
+        self.unrouted = unrouted
+        self._waiting: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def expect(self, tip_id: str, reply_type: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[(tip_id, reply_type)] = future
+        return future
+    
+    def forget(self, tip_id: str) -> None:
+        for reply_type in REPLY_TYPES:
+            future = self._waiting.pop((tip_id, reply_type), None)
+            if future is not None and not future.done():
+                future.cancel()
+    
+    def route(self, mentions: List[Dict[str, str]]) -> None:
+        unrouted = []
+        for mention in mentions:
+            reply = parse_tip_reply(mention['content'], REPLY_TYPES)
+            if reply is None:
+                unrouted.append(mention)
+                continue
+            future = self._waiting.pop((reply['tip_id'], reply['type']), None)
+            if future is None:
+                logger.info(f"Dropping {reply['type']} for {reply['tip_id']}, which is no longer waiting")
+            elif not future.done():
+                future.set_result(reply)
+        if unrouted:
+            self.unrouted(unrouted)
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                raw = await self.wait_for_mentions.ainvoke({"timeoutMs": self.timeout_ms})
+                self.route(parse_mentions(raw))
+            except Exception as e:
+                logger.error(f"Reading mentions failed: {e}")
+                await asyncio.sleep(1)
+
 def load_config() -> Dict[str, Any]:
     """Load configuration from environment variables"""
     config = {
@@ -77,6 +180,10 @@ def load_config() -> Dict[str, Any]:
         "model_temperature": float(os.getenv("MODEL_TEMPERATURE", "0.3")),
         "model_max_tokens": int(os.getenv("MODEL_MAX_TOKENS", "4000")),
         "timeout_ms": float(os.getenv("TIMEOUT_MS", "60000")),
+        "mention_timeout_ms": int(os.getenv("MENTION_TIMEOUT_MS", "30000")),
+        "validation_agent_id": os.getenv("VALIDATION_AGENT_ID", "validation"),
+        "max_tips_in_flight": int(os.getenv("CONSOLE_MAX_TIPS_IN_FLIGHT", "8")),
+        "tip_timeout_s": float(os.getenv("CONSOLE_TIP_TIMEOUT_S", "120")),
     }
     
     # Validate required fields
@@ -105,30 +212,18 @@ async def create_console_agent(coral_tools) -> AgentExecutor:
             "system",
             f"""You are a console interface agent for a crypto tipping system.
 
-Your responsibilities:
-1. Parse user tip commands: /tip @recipient amount SOL message
-2. Coordinate with other agents through Coral Protocol
-3. Display results to the user
-4. Handle user queries about balance and history
-
 Available Coral tools: {coral_tools_description}
 
-Process flow for tip commands:
-1. Parse the command (recipient, amount, message)
-2. Create thread with validation agent
-3. Send tip data for validation
-4. Wait for validation result
-5. If valid, create thread with transaction agent
-6. Send validated tip data for execution
-7. Wait for transaction result
-8. Create thread with notification agent
-9. Send transaction result for notification
-10. Display final result to user
-
-For balance queries: Display current balance
-For history queries: Display recent transactions
+Tip commands never reach you: the console sends them to the validation agent
+itself and matches the validation and transaction results to each tip. You
+only receive the other mentions addressed to the console. They are listed in
+the input with their threadId and senderId; do not call wait_for_mentions for
+them.
 
-Always use proper thread management and agent communication.
+Process flow:
+1. Read each mention in the input
+2. Summarize it for the user in one or two lines, naming the sender
+3. If it asks the console a question, answer it in the same thread with send_message
 """
         ),
         ("human", "{input}"),
@@ -149,6 +244,82 @@ Always use proper thread management and agent communication.
     agent = create_tool_calling_agent(model, coral_tools, prompt)
     return AgentExecutor(agent=agent, tools=coral_tools, verbose=True)
 
+async def create_tip_thread(tools: Dict[str, Any], config: Dict[str, Any]) -> str:
+    """Open the 'console-tips' thread the console sends every tip to the validation agent in"""
+    created = await tools['create_thread'].ainvoke({
+        'threadName': 'console-tips',
+        'participantIds': [config["validation_agent_id"]]
+    })
+    thread_id = parse_thread_id(created)
+    if thread_id is None:
+        raise RuntimeError(f"Could not read thread ID from create_thread result: {created}")
+    return thread_id
+
+async def process_tip(tools: Dict[str, Any], router: ReplyRouter, interface: ConsoleTipInterface, tip_id: str,
+                      tip_data: Dict[str, Any], thread_id: str, config: Dict[str, Any],
+                      slots: asyncio.Semaphore) -> None:
+    """Send one tip to the validation agent and print its results, tagged with the tip ID
+    
+    The validation agent forwards a valid tip to the transaction agent, and
+    both reply with the tip_id in tip_data, which the router matches to this
+    tip. At most `slots` tips are between sending and their last reply.
+    """
+    if slots.locked():
+        print(f" [{tip_id}] ⏳ Queued, {config['max_tips_in_flight']} tips already in flight")
+    async with slots:
+        coral_tip_id = tip_data['tip_id']
+        validated = router.expect(coral_tip_id, 'validation_result')
+        executed = router.expect(coral_tip_id, 'transaction_result')
+        timeout = config["tip_timeout_s"]
+        try:
+            await tools['send_message'].ainvoke({
+                'threadId': thread_id,
+                'content': json.dumps({'type': 'tip', 'tip_id': coral_tip_id, 'tip': tip_data}),
+                'mentions': [config["validation_agent_id"]]
+            })
+            
+            verdict = (await asyncio.wait_for(validated, timeout)).get('result') or {}
+            if not verdict.get('is_valid'):
+                print(f"\n[{tip_id}] 🚫 Rejected: {verdict.get('reason', 'validation failed')}")
+                return
+            if verdict.get('forwarded') is False:
+                print(f"\n[{tip_id}] ❌ Valid, but not passed on for execution: {verdict.get('forward_error')}")
+                return
+            
+            result = (await asyncio.wait_for(executed, timeout)).get('result') or {}
+            if result.get('success'):
+                print(f"\n[{tip_id}] 📋 Sent {tip_data['amount']} SOL → @{tip_data['recipient']} "
+                      f"({result.get('transaction_id')})")
+                interface.transaction_history.append({
+                    'amount': tip_data['amount'],
+                    'recipient': tip_data['recipient'],
+                    'timestamp': tip_data['timestamp']
+                })
+                interface.balance = result.get('balance_after', interface.balance - tip_data['amount'])
+            elif result.get('status') == 'unknown':
+                print(f"\n[{tip_id}] ⏳ Sent, but not yet confirmed; do not retry it ({result.get('pending_id')})")
+            else:
+                print(f"\n[{tip_id}] ❌ Transfer failed: {result.get('error', 'unknown error')}")
+        
+        except asyncio.TimeoutError:
+            print(f"\n[{tip_id}] ⌛ No reply within {timeout:g}s; the tip may still go through")
+        except Exception as e:
+            print(f"\n[{tip_id}] ❌ Error processing tip: {e}")
+            logger.error(f"Tip {tip_id} error: {e}")
+        finally:
+            router.forget(coral_tip_id)
+
+async def answer_mentions(agent_executor: AgentExecutor, mentions: List[Dict[str, str]]) -> None:
+    """Let the LLM show the user mentions that are not replies about a tip"""
+    try:
+        result = await agent_executor.ainvoke({
+            "input": f"Mentions to handle: {json.dumps(mentions)}",
+            "agent_scratchpad": []
+        })
+        print(f"\n📨 {result.get('output', '')}")
+    except Exception as e:
+        logger.error(f"Handling mentions failed: {e}")
+
 async def main():
     """Main console interface loop"""
     print(" Coral Protocol + Mistral AI Tipping System")
@@ -184,6 +355,24 @@ async def main():
         # Create console agent
         agent_executor = await create_console_agent(coral_tools)
         interface = ConsoleTipInterface()
+        stdin = StdinReader()
+        tools = tools_by_name(coral_tools)
+        tip_thread = await create_tip_thread(tools, config)
+        in_flight = set()
+        
+        def track(task: asyncio.Task) -> None:
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        
+        router = ReplyRouter(tools["wait_for_mentions"], config["mention_timeout_ms"],
+                             lambda mentions: track(asyncio.ensure_future(answer_mentions(agent_executor, mentions))))
+        router.start()
+        # Tips run as tasks so the next command can be entered while earlier ones are in flight
+        slots = asyncio.Semaphore(config["max_tips_in_flight"])
+        # Tip IDs are echoed back by the other agents; the session part keeps a restarted
+        # console from taking a late reply meant for the previous run's tip-1
+        session = uuid.uuid4().hex[:8]
+        tip_count = 0
         
         print("🎯 Console interface ready!")
         print("💡 Type /help for available commands")
@@ -191,9 +380,12 @@ async def main():
         # Main console loop
         while True:
             try:
-                command = input("\n💬 Enter command: ").strip()
+                line = await stdin.readline("\n💬 Enter command: ")
+                if line is None:
+                    break
+                command = line.strip()
                 
-                if command.lower() in ['quit', 'exit', 'q']:
+                if command.lower() in ['quit', 'exit', 'q', '/quit']:
                     print("👋 Goodbye!")
                     break
                 
@@ -222,29 +414,15 @@ async def main():
                         print("💡 Use: /tip @recipient amount SOL message")
                         continue
                     
-                    print(f" Processing tip: {tip_data['amount']} SOL → @{tip_data['recipient']}")
+                    tip_count += 1
+                    tip_id = f"tip-{tip_count}"
+                    tip_data['tip_id'] = f"console-{session}-{tip_count}"
+                    print(f" [{tip_id}] Processing tip: {tip_data['amount']} SOL → @{tip_data['recipient']}")
                     
-                    # Process through Coral Protocol agents
-                    try:
-                        result = await agent_executor.ainvoke({
-                            "input": f"Process tip command: {command}",
-                            "agent_scratchpad": []
-                        })
-                        
-                        output = result.get('output', 'Processing...')
-                        print(f"📋 Result: {output}")
-                        
-                        # Update local state if successful
-                        if "success" in output.lower() or "sent" in output.lower():
-                            interface.transaction_history.append({
-                                'amount': tip_data['amount'],
-                                'recipient': tip_data['recipient'],
-                                'timestamp': tip_data['timestamp']
-                            })
-                            interface.balance -= tip_data['amount']
-                        
-                    except Exception as e:
-                        print(f"❌ Error processing tip: {e}")
+                    # Process through Coral Protocol agents in the background
+                    track(asyncio.create_task(process_tip(
+                        tools, router, interface, tip_id, tip_data, tip_thread, config, slots
+                    )))
                 
                 else:
                     print("❌ Unknown command. Type /help for available commands")
@@ -255,6 +433,11 @@ async def main():
             except Exception as e:
                 print(f"❌ Error: {e}")
                 logger.error(f"Console error: {e}")
+        
+        if in_flight:
+            print(f"⏳ Waiting for {len(in_flight)} tip(s) in flight...")
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        await router.stop()
                 
     except Exception as e:
         print(f"💥 Fatal error: {e}")
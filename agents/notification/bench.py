@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Notification Agent Benchmarks
+Micro-benchmarks for notification delivery
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+
+from dispatcher import NotificationDispatcher
+from main import ConsoleNotifier
+from notification_log import NotificationLog
+from sink_stub import SinkStub, start_stub
+from sinks import ConsoleSink, JsonlSink, Sink, UnixSocketSink, WebhookSink
+from templates import encode_json, render
+
+
+def _notification(i: int) -> dict:
+    return {
+        'type': 'success',
+        'transaction_id': f"mock_tx_{i:08x}",
+        'amount': 1.5,
+        'recipient': f"user{i % 1000}",
+        'timestamp': time.time()
+    }
+
+
+async def _dispatch(args) -> None:
+    stub = SinkStub(latency=args.webhook_latency_ms / 1000, error_rate=args.webhook_error_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "notify.sock")
+        servers = await start_stub(stub, '127.0.0.1', 0, socket_path)
+        port = servers[0].sockets[0].getsockname()[1]
+
+        sinks = [
+            JsonlSink(os.path.join(tmp, "notifications.jsonl")),
+            WebhookSink(f"http://127.0.0.1:{port}/notify"),
+            UnixSocketSink(socket_path),
+        ]
+        dispatcher = NotificationDispatcher(
+            sinks, overflow={'webhook': args.webhook_overflow}, queue_size=args.queue_size,
+            timeout=args.timeout_ms / 1000, retry_backoff=0.01, spill_dir=tmp
+        )
+        dispatcher.start()
+
+        # Publish at a steady rate, as a tip pipeline would, and time only the publish calls
+        publish_times = []
+        lags = []
+        interval = 1.0 / args.rate
+        start = time.perf_counter()
+        for i in range(args.notifications):
+            due = start + i * interval
+            delay = due - time.perf_counter()
+            if delay > 0 or i % 100 == 0:
+                before = time.perf_counter()
+                await asyncio.sleep(max(delay, 0))
+                lags.append(time.perf_counter() - before - max(delay, 0))
+            t0 = time.perf_counter()
+            dispatcher.publish(_notification(i))
+            publish_times.append(time.perf_counter() - t0)
+        published = time.perf_counter() - start
+
+        drain_start = time.perf_counter()
+        await dispatcher.close(drain_timeout=args.drain_s)
+        drained = time.perf_counter() - drain_start
+        # Let the stub finish requests still inside its injected latency before stopping it
+        await asyncio.sleep(2 * stub.latency)
+        for server in servers:
+            server.close()
+
+    publish_times.sort()
+    lags.sort()
+    print(f"{args.notifications} notifications at {args.rate}/s to jsonl, webhook "
+          f"({args.webhook_latency_ms:g} ms, {args.webhook_error_rate:.0%} errors, {args.webhook_overflow}) and unix")
+    print(f"publish: p50 {publish_times[len(publish_times) // 2] * 1e6:.1f} us, "
+          f"p99 {publish_times[int(len(publish_times) * 0.99)] * 1e6:.1f} us, "
+          f"max {publish_times[-1] * 1e6:.1f} us (published in {published:.2f}s, drained in {drained:.2f}s)")
+    if lags:
+        print(f"event loop lag: p50 {lags[len(lags) // 2] * 1e3:.2f} ms, p99 {lags[int(len(lags) * 0.99)] * 1e3:.2f} ms")
+    print(f"stub received: {stub.counters}")
+    print(json.dumps(dispatcher.stats(), indent=2))
+
+
+def bench_dispatch(args) -> None:
+    asyncio.run(_dispatch(args))
+
+
+class _CountingStream(io.TextIOBase):
+    """Stands in for stdout, counting what the console sink prints"""
+
+    def __init__(self):
+        self.characters = 0
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        self.characters += len(text)
+        self.lines += text.count('\n')
+        return len(text)
+
+
+async def _storm(args, coalesce_by) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, "notifications.jsonl")
+        dispatcher = NotificationDispatcher([ConsoleSink(), JsonlSink(jsonl_path)], digest_sinks=['console'],
+                                            queue_size=args.notifications)
+        notifier = ConsoleNotifier(dispatcher, coalesce_by, args.window_s, args.max_count)
+        stdout = _CountingStream()
+        with contextlib.redirect_stdout(stdout):
+            dispatcher.start()
+            interval = 1.0 / args.rate
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            for i in range(args.notifications):
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0 or i % 100 == 0:
+                    await asyncio.sleep(max(delay, 0))
+                notifier.send_success_notification({
+                    'amount': 0.1 + (i % 7) / 10,
+                    'recipient': f"user{i % args.recipients}",
+                    'message': "great thread!",
+                    'transaction_id': f"mock_tx_{i:08x}",
+                    'timestamp': time.time()
+                }, sender=f"author{i % args.senders}")
+            notifier.flush_digests()
+            await dispatcher.close(drain_timeout=30)
+            cpu = time.process_time() - cpu_start
+        with open(jsonl_path, encoding='utf-8') as f:
+            persisted = sum(1 for _ in f)
+
+    coalescer = notifier.coalescer.stats() if notifier.coalescer is not None else {}
+    return {'console_lines': stdout.lines, 'console_chars': stdout.characters, 'persisted': persisted,
+            'cpu_us': cpu / args.notifications * 1e6, 'digests': coalescer.get('digests', 0)}
+
+
+def bench_coalesce(args) -> None:
+    print(f"{args.notifications} tips at {args.rate:g}/s to {args.recipients} recipients from {args.senders} senders, "
+          f"console sink coalesced over {args.window_s:g}s windows (max {args.max_count}), every record to jsonl")
+    baseline = asyncio.run(_storm(args, None))
+    for coalesce_by in (None, 'recipient', 'sender'):
+        result = baseline if coalesce_by is None else asyncio.run(_storm(args, coalesce_by))
+        print(f"{coalesce_by or 'off':>9}: console {result['console_lines']:>7} lines / {result['console_chars']:>9} chars "
+              f"({baseline['console_chars'] / max(result['console_chars'], 1):6.1f}x less), "
+              f"{result['digests']:>5} digests, {result['persisted']} records persisted, "
+              f"{result['cpu_us']:.1f} us CPU per tip")
+
+
+def _notify_all(notifier: ConsoleNotifier, count: int) -> None:
+    for i in range(count):
+        tip = {'amount': 0.5, 'recipient': f"user{i % 1000}", 'author_id': f"author{i % 5000}"}
+        if i % 10 == 0:
+            notifier.send_validation_failure_notification("Message contains spam keyword 'free money'", tip)
+        elif i % 10 == 1:
+            notifier.send_failure_notification("Transfer failed: blockhash expired", tip, f"mock_tx_{i:08x}")
+        else:
+            notifier.send_success_notification(dict(tip, transaction_id=f"mock_tx_{i:08x}", message="gm"))
+
+
+def bench_history(args) -> None:
+    tracemalloc.start()
+    unbounded_notifier = ConsoleNotifier(history_size=args.notifications)
+    _notify_all(unbounded_notifier, args.notifications)
+    unbounded = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del unbounded_notifier
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = NotificationLog(os.path.join(tmp, "notifications.db"), batch_size=args.batch)
+        notifier = ConsoleNotifier(log=log, history_size=args.history_size)
+        tracemalloc.start()
+        start = time.perf_counter()
+        _notify_all(notifier, args.notifications)
+        log.flush()
+        elapsed = time.perf_counter() - start
+        bounded = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{args.notifications} notifications logged in batches of {args.batch}: "
+              f"{elapsed / args.notifications * 1e6:.1f} us each, {args.notifications / elapsed:,.0f}/s")
+        print(f"memory held: {unbounded / 2**20:.1f} MiB with an unbounded history, "
+              f"{bounded / 2**20:.2f} MiB with a {args.history_size}-entry tail and the log")
+
+        now = time.time()
+        queries = {
+            "failures for one tx": dict(transaction_id=f"mock_tx_{args.notifications // 2 + 1:08x}",
+                                        types=('failure', 'validation_failure')),
+            "last hour of validation failures": dict(types='validation_failure', since=now - 3600),
+            "last second of everything": dict(since=now - 1),
+        }
+        for name, filters in queries.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                rows = log.query(limit=None, **filters)
+            per_query = (time.perf_counter() - start) / args.repeat
+            print(f"{name}: {len(rows)} rows in {per_query * 1e3:.2f} ms  [{'; '.join(log.explain(**filters))}]")
+        log.close()
+
+
+def _eager_success(transaction_result: dict) -> dict:
+    """A success notification as built before templates: rendered up front and stored with the record"""
+    content = f"""
+✅ TIP SENT SUCCESSFULLY!
+💰 Amount: {transaction_result['amount']} SOL
+👤 Recipient: @{transaction_result['recipient']}
+💬 Message: {transaction_result.get('message', 'No message')}
+🆔 Transaction: {transaction_result['transaction_id']}
+🔗 Explorer: {transaction_result.get('explorer_url', 'N/A')}
+⏰ Time: {transaction_result.get('timestamp', 'N/A')}
+💳 Balance: {transaction_result.get('balance_after', 'N/A')} SOL
+"""
+    return {
+        'type': 'success',
+        'transaction_id': transaction_result['transaction_id'],
+        'amount': transaction_result['amount'],
+        'recipient': transaction_result['recipient'],
+        'sender': None,
+        'timestamp': datetime.utcnow().isoformat(),
+        'content': content
+    }
+
+
+def bench_templates(args) -> None:
+    results = [{
+        'amount': round(0.1 + (i % 50) / 10, 2),
+        'recipient': f"user{i % 1000}",
+        'message': "thanks for the thread!",
+        'transaction_id': f"mock_tx_{i:08x}",
+        'explorer_url': f"https://explorer.solana.com/tx/mock_tx_{i:08x}?cluster=devnet",
+        'timestamp': datetime.utcnow().isoformat(),
+        'balance_after': 100 - i * 0.001
+    } for i in range(args.notifications)]
+    jsonl = Sink()  # the base sink's 'json' payload, without opening a file
+    # (console style, show every nth notification): a coalesced console shows about one in a hundred
+    scenarios = {
+        "console text (default)": ('text', 1),
+        "jsonl only": (None, 1),
+        "jsonl + console text": ('text', 1),
+        "jsonl + console compact": ('compact', 1),
+        "jsonl + coalesced console": ('text', 100),
+    }
+
+    print(f"{args.notifications} success notifications, shown on the console and/or written to a JSONL sink")
+    for name, (console_style, shown_every) in scenarios.items():
+        with_jsonl = name.startswith('jsonl')
+        # As it would be set up for these sinks: text is rendered up front when the console shows text
+        notifier = ConsoleNotifier(history_size=args.notifications, render_text=console_style == 'text')
+        stats = {}
+        for mode in ('eager', 'lazy'):
+            # One pass for CPU, then one under tracemalloc for the memory each record keeps
+            for traced in (False, True):
+                notifier.notification_history.clear()
+                stdout = _CountingStream()
+                records = []
+                if traced:
+                    tracemalloc.start()
+                cpu_start = time.process_time()
+                for i, result in enumerate(results):
+                    shown = console_style is not None and i % shown_every == 0
+                    if mode == 'eager':
+                        record = _eager_success(result)
+                        notifier.notification_history.append(record)
+                        if with_jsonl:
+                            # As the JSONL sink wrote records before templates
+                            stdout.write(json.dumps(record, default=str) + '\n')
+                        if shown:
+                            # Before templates the console could only show the stored text
+                            stdout.write(record['content'])
+                    else:
+                        record = notifier.send_success_notification(result)
+                        if with_jsonl:
+                            stdout.write(encode_json(jsonl.payload(record)) + '\n')
+                        if shown:
+                            stdout.write(render(record, console_style))
+                    records.append(record)
+                if traced:
+                    held = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.stop()
+                else:
+                    cpu = time.process_time() - cpu_start
+                del records
+            stats[mode] = (cpu / args.notifications, held / args.notifications)
+
+        (eager_cpu, eager_mem), (lazy_cpu, lazy_mem) = stats['eager'], stats['lazy']
+        print(f"{name:>26}: CPU {eager_cpu * 1e6:5.1f} -> {lazy_cpu * 1e6:5.1f} us per notification "
+              f"({eager_cpu * args.rate / 60:.1%} -> {lazy_cpu * args.rate / 60:.1%} of a core at {args.rate:,}/min), "
+              f"memory {eager_mem:,.0f} -> {lazy_mem:,.0f} B per record")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification agent benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dispatch_parser = subparsers.add_parser("dispatch", help="Publish latency with a slow, flaky webhook sink")
+    dispatch_parser.add_argument("--notifications", type=int, default=20_000)
+    dispatch_parser.add_argument("--rate", type=float, default=5_000, help="Notifications published per second")
+    dispatch_parser.add_argument("--queue-size", type=int, default=1_000)
+    dispatch_parser.add_argument("--webhook-latency-ms", type=float, default=50)
+    dispatch_parser.add_argument("--webhook-error-rate", type=float, default=0.05)
+    dispatch_parser.add_argument("--webhook-overflow", default='spill', choices=['drop_newest', 'drop_oldest', 'spill'])
+    dispatch_parser.add_argument("--timeout-ms", type=float, default=1_000)
+    dispatch_parser.add_argument("--drain-s", type=float, default=30)
+    dispatch_parser.set_defaults(func=bench_dispatch)
+
+    coalesce_parser = subparsers.add_parser("coalesce", help="Console output and CPU per tip during a tip storm")
+    coalesce_parser.add_argument("--notifications", type=int, default=20_000)
+    coalesce_parser.add_argument("--rate", type=float, default=4_000, help="Tips notified per second")
+    coalesce_parser.add_argument("--recipients", type=int, default=20)
+    coalesce_parser.add_argument("--senders", type=int, default=200)
+    coalesce_parser.add_argument("--window-s", type=float, default=2.0)
+    coalesce_parser.add_argument("--max-count", type=int, default=1_000)
+    coalesce_parser.set_defaults(func=bench_coalesce)
+
+    history_parser = subparsers.add_parser("history", help="SQLite notification log inserts, queries and memory")
+    history_parser.add_argument("--notifications", type=int, default=200_000)
+    history_parser.add_argument("--batch", type=int, default=500)
+    history_parser.add_argument("--history-size", type=int, default=100)
+    history_parser.add_argument("--repeat", type=int, default=5)
+    history_parser.set_defaults(func=bench_history)
+
+    templates_parser = subparsers.add_parser("templates", help="CPU and memory of eager text vs lazy rendering")
+    templates_parser.add_argument("--notifications", type=int, default=100_000)
+    templates_parser.add_argument("--rate", type=int, default=100_000, help="Notifications per minute to size CPU against")
+    templates_parser.set_defaults(func=bench_templates)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Notification Coalescing
+Digests of bursts of notifications to the same recipient or from the same sender
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DIGEST_HEADLINES = {
+    'success': ("✅", "tip", "sent"),
+    'failure': ("❌", "tip", "failed"),
+    'validation_failure': ("❌", "tip", "rejected"),
+}
+
+
+class _Burst:
+    __slots__ = ('started', 'count', 'amount', 'last_error', 'timer')
+
+    def __init__(self, started: float):
+        self.started = started
+        self.count = 0
+        self.amount = 0.0
+        self.last_error: Optional[str] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class Coalescer:
+    """Lets the first notification of a burst through and folds the rest into a digest
+
+    Notifications are grouped by type and by `key` (their recipient or
+    sender). The first one in a group opens a `window_seconds` window and
+    is shown as usual; later ones in the window are only counted, and a
+    digest of them is emitted when the window closes or as soon as
+    `max_count` have piled up. Quiet traffic therefore looks unchanged,
+    while a storm costs one digest per group and window.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], key: str = 'recipient',
+                 window_seconds: float = 10.0, max_count: int = 100):
+        if key not in ('recipient', 'sender'):
+            raise ValueError(f"Coalesce key must be 'recipient' or 'sender', not {key!r}")
+        self.emit = emit
+        self.key = key
+        self.window_seconds = window_seconds
+        self.max_count = max_count
+        self.absorbed = 0
+        self.digests = 0
+        self._bursts: Dict[Tuple[str, str], _Burst] = {}
+
+    def add(self, notification: Dict[str, Any]) -> bool:
+        """Count a notification; False if it opens a burst and should be delivered as is"""
+        group = (notification.get('type', ''), str(notification.get(self.key) or 'unknown'))
+        burst = self._bursts.get(group)
+        if burst is None:
+            burst = self._bursts[group] = _Burst(time.monotonic())
+            try:
+                burst.timer = asyncio.get_running_loop().call_later(self.window_seconds, self._close, group)
+            except RuntimeError:
+                # No event loop: bursts only end on max_count or flush()
+                pass
+            return False
+
+        burst.count += 1
+        burst.amount += float(notification.get('amount') or 0.0)
+        if notification.get('error'):
+            burst.last_error = notification['error']
+        self.absorbed += 1
+        if burst.count >= self.max_count:
+            self._emit(group, burst)
+        return True
+
+    def _emit(self, group: Tuple[str, str], burst: _Burst) -> None:
+        kind, key = group
+        icon, noun, verb = DIGEST_HEADLINES.get(kind, ("📢", "notification", "received"))
+        plural = "" if burst.count == 1 else "s"
+        self.digests += 1
+        # Structured only: sinks render it with the 'digest' template when they need text
+        self.emit({
+            'type': 'digest',
+            'digest_of': kind,
+            self.key: key,
+            'count': burst.count,
+            'amount': burst.amount,
+            'window_seconds': round(time.monotonic() - burst.started, 3),
+            'last_error': burst.last_error,
+            'icon': icon,
+            'label': f"{noun}{plural} {verb}",
+            'direction': f"to @{key}" if self.key == 'recipient' else f"from {key}",
+        })
+        burst.count = 0
+        burst.amount = 0.0
+        burst.last_error = None
+
+    def _close(self, group: Tuple[str, str]) -> None:
+        burst = self._bursts.pop(group, None)
+        if burst is not None and burst.count:
+            self._emit(group, burst)
+
+    def flush(self) -> None:
+        """Emit every pending digest now, e.g. on shutdown"""
+        for group in list(self._bursts):
+            burst = self._bursts[group]
+            if burst.timer is not None:
+                burst.timer.cancel()
+            self._close(group)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'open_bursts': len(self._bursts), 'absorbed': self.absorbed, 'digests': self.digests}
@@ -0,0 +1,98 @@
+"""
+Coral I/O
+Parsing of Coral mentions and the structured results other agents send
+"""
+
+import html
+import json
+import re
+from typing import Dict, Any, List, Optional
+
+MESSAGE_PATTERN = re.compile(r'<message\b([^>]*?)(?:/>|>(.*?)</message>)', re.DOTALL)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)\s*=\s*"([^"]*)"')
+CONTENT_PATTERN = re.compile(r'<content>(.*?)</content>', re.DOTALL)
+
+THREAD_KEYS = ('threadId', 'thread_id', 'threadID')
+SENDER_KEYS = ('senderId', 'sender_id', 'sender', 'senderID')
+
+
+def _first(mapping: Dict[str, Any], keys) -> Optional[str]:
+    for key in keys:
+        if mapping.get(key):
+            return str(mapping[key])
+    return None
+
+
+def parse_mentions(raw: Any) -> List[Dict[str, str]]:
+    """Extract {'threadId', 'senderId', 'content'} dicts from a wait_for_mentions result
+
+    Coral returns mentions either as JSON or as XML-like text depending on
+    the server version; both are accepted. Anything unrecognized yields no
+    mentions.
+    """
+    if isinstance(raw, (list, dict)):
+        data = raw
+    else:
+        text = str(raw or '')
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+
+        if data is None:
+            mentions = []
+            for attributes, body in MESSAGE_PATTERN.findall(text):
+                attrs = {k: html.unescape(v) for k, v in ATTRIBUTE_PATTERN.findall(attributes)}
+                content = attrs.get('content')
+                if content is None:
+                    inner = CONTENT_PATTERN.search(body or '')
+                    content = html.unescape((inner.group(1) if inner else body or '').strip())
+                mentions.append({
+                    'threadId': _first(attrs, THREAD_KEYS),
+                    'senderId': _first(attrs, SENDER_KEYS),
+                    'content': content
+                })
+            return [m for m in mentions if m['threadId'] and m['content']]
+
+    if isinstance(data, dict):
+        data = data.get('messages', data.get('mentions', [data]))
+
+    mentions = []
+    for message in data if isinstance(data, list) else []:
+        if not isinstance(message, dict):
+            continue
+        mention = {
+            'threadId': _first(message, THREAD_KEYS),
+            'senderId': _first(message, SENDER_KEYS),
+            'content': message.get('content') or ''
+        }
+        if mention['threadId'] and mention['content']:
+            mentions.append(mention)
+    return mentions
+
+
+def _json_objects(text: str):
+    """Yield every JSON object embedded in free text"""
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except ValueError:
+            start = text.find('{', start + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        start = text.find('{', end)
+
+
+def parse_result_payload(content: str, types) -> Optional[Dict[str, Any]]:
+    """Return the first JSON object in a message whose `type` is one of `types`, or None"""
+    for obj in _json_objects(content or ''):
+        if obj.get('type') in types:
+            return obj
+    return None
+
+
+def tools_by_name(tools) -> Dict[str, Any]:
+    return {tool.name: tool for tool in tools}
@@ -0,0 +1,308 @@
+"""
+Notification Dispatcher
+Fans notifications out to sinks through independent bounded queues
+"""
+
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from sinks import Sink
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'spill')
+
+
+class SpillFile:
+    """Overflow notifications kept on disk, read back in the order they were written
+
+    append only buffers in memory, so it is safe to call from the event loop.
+    flush and take do the file I/O on a thread of the spill file's own, one
+    at a time and in the order they were called, even when the caller is
+    cancelled midway; take returns buffered notifications directly once the
+    file is drained.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a+', encoding='utf-8')
+        self._read_offset = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._writing = 0
+        self._lock = asyncio.Lock()
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spill')
+        # Resume whatever a previous run left behind
+        self._file.seek(0)
+        self._on_disk = sum(1 for _ in self._file)
+
+    @property
+    def pending(self) -> int:
+        return self._on_disk + self._writing + len(self._buffer)
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def append(self, notification: Dict[str, Any]) -> None:
+        self._buffer.append(notification)
+
+    async def flush(self) -> None:
+        """Write the buffered notifications to the file"""
+        async with self._lock:
+            buffered, self._buffer = self._buffer, []
+            if not buffered:
+                return
+            self._writing = len(buffered)
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._io, self._write, buffered)
+            except asyncio.CancelledError:
+                # The write carries on in the spill thread, ahead of anything submitted later
+                self._on_disk += len(buffered)
+                raise
+            except BaseException:
+                # Still older than anything appended meanwhile
+                self._buffer[:0] = buffered
+                raise
+            else:
+                self._on_disk += len(buffered)
+            finally:
+                self._writing = 0
+
+    async def take(self, limit: int) -> List[Dict[str, Any]]:
+        """Remove and return up to `limit` of the oldest spilled notifications"""
+        async with self._lock:
+            if not self._on_disk:
+                taken, self._buffer = self._buffer[:limit], self._buffer[limit:]
+                return taken
+            notifications = await asyncio.get_running_loop().run_in_executor(self._io, self._read, limit)
+            self._on_disk -= len(notifications)
+            return notifications
+
+    def _write(self, notifications: List[Dict[str, Any]]) -> None:
+        self._file.write(''.join(json.dumps(notification, default=str) + '\n' for notification in notifications))
+        self._file.flush()
+
+    def _read(self, limit: int) -> List[Dict[str, Any]]:
+        self._file.seek(self._read_offset)
+        notifications = []
+        while len(notifications) < limit:
+            line = self._file.readline()
+            if not line:
+                break
+            notifications.append(json.loads(line))
+        self._read_offset = self._file.tell()
+        if not self._file.readline():
+            # Fully replayed: start the file over rather than letting it grow
+            self._file.truncate(0)
+            self._read_offset = 0
+        self._file.seek(0, os.SEEK_END)
+        return notifications
+
+    async def close(self) -> None:
+        """Write what is still buffered so the next run resumes it, then close the file"""
+        try:
+            await self.flush()
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self._io, self._file.close)
+            self._io.shutdown(wait=False)
+
+
+class SinkQueue:
+    """A sink with its own bounded queue, delivery task, retries and overflow policy
+
+    When the queue is full, `drop_newest` discards the new notification,
+    `drop_oldest` discards the oldest queued one to make room, and `spill`
+    appends the new one to a file that is replayed once the queue empties,
+    so spilled notifications arrive late and after newer ones. offer only
+    buffers spilled notifications; the delivery task writes them out, or a
+    flush task once `batch_size` are waiting.
+    Deliveries take up to `batch_size` queued notifications at once; a
+    batch that still fails after `retries` retries is counted and dropped.
+    """
+
+    def __init__(self, sink: Sink, queue_size: int = 1000, overflow: str = 'drop_oldest', retries: int = 3,
+                 timeout: float = 2.0, retry_backoff: float = 0.1, batch_size: int = 100,
+                 spill_dir: str = '.'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r} (expected one of {', '.join(OVERFLOW_POLICIES)})")
+        self.sink = sink
+        self.overflow = overflow
+        self.retries = retries
+        self.timeout = timeout
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(queue_size)
+        self.spill = SpillFile(os.path.join(spill_dir, f"{sink.name}.spill.jsonl")) if overflow == 'spill' else None
+        self.counters = {'delivered': 0, 'batches': 0, 'retries': 0, 'failed': 0, 'dropped': 0, 'spilled': 0}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._delivering = False
+
+    def offer(self, notification: Dict[str, Any]) -> bool:
+        """Queue a notification without waiting; False if the overflow policy discarded it"""
+        try:
+            self.queue.put_nowait(notification)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow == 'spill':
+            self.spill.append(notification)
+            self.counters['spilled'] += 1
+            # The delivery task may be stuck on a slow sink; keep the memory buffer bounded anyway
+            if self.spill.buffered >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+                self._flush_task = asyncio.ensure_future(self._flush_spill())
+            return True
+        self.counters['dropped'] += 1
+        if self.overflow == 'drop_newest':
+            return False
+        self.queue.get_nowait()
+        self.queue.task_done()
+        self.queue.put_nowait(notification)
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _flush_spill(self) -> None:
+        try:
+            await self.spill.flush()
+        except OSError as e:
+            # Kept in memory; the next flush tries again
+            logger.warning(f"Sink {self.sink.name} could not write its spill file: {e!r}")
+
+    async def _run(self) -> None:
+        while True:
+            if self.spill is not None:
+                if self.queue.empty() and self.spill.pending:
+                    for notification in await self.spill.take(self.queue.maxsize or self.batch_size):
+                        self.queue.put_nowait(notification)
+                if self.spill.buffered:
+                    await self._flush_spill()
+
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._delivering = True
+            try:
+                await self._deliver(batch)
+            finally:
+                self._delivering = False
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _deliver(self, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                await asyncio.wait_for(self.sink.send_batch(batch), self.timeout)
+                self.counters['delivered'] += len(batch)
+                self.counters['batches'] += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                self.counters['retries'] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+        self.counters['failed'] += len(batch)
+        logger.warning(f"Sink {self.sink.name} dropped {len(batch)} notifications after "
+                       f"{self.retries + 1} attempts: {error!r}")
+
+    def _idle(self) -> bool:
+        return not self._delivering and self.queue.empty() and (self.spill is None or not self.spill.pending)
+
+    async def _drain(self) -> None:
+        # Polled: the delivery task refills the queue from the spill file, so queue.join can return early
+        while not self._idle():
+            await asyncio.sleep(0.01)
+
+    async def close(self, drain_timeout: float = 5.0) -> None:
+        """Deliver what is queued or spilled, waiting at most `drain_timeout`, then stop"""
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._drain(), drain_timeout)
+            except asyncio.TimeoutError:
+                undelivered = self.queue.qsize() + (self.spill.pending if self.spill is not None else 0)
+                logger.warning(f"Sink {self.sink.name} closed with {undelivered} notifications undelivered")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.sink.close()
+        if self.spill is not None:
+            await self.spill.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, queued=self.queue.qsize(), overflow=self.overflow,
+                    spill_pending=self.spill.pending if self.spill is not None else 0)
+
+
+class NotificationDispatcher:
+    """Delivers every published notification to every sink, concurrently
+
+    publish never waits: each sink has its own queue and delivery task, so
+    a slow or failing sink only fills its own queue and never delays the
+    caller or the other sinks.
+    Sinks named in `digest_sinks` skip notifications published as
+    coalesced and receive the digests standing in for them instead; the
+    other sinks still get every notification.
+    """
+
+    def __init__(self, sinks: List[Sink], overflow: Optional[Dict[str, str]] = None, default_overflow: str = 'drop_oldest',
+                 digest_sinks: Iterable[str] = (), **queue_options):
+        overflow = overflow or {}
+        self.queues = [SinkQueue(sink, overflow=overflow.get(sink.name, default_overflow), **queue_options)
+                       for sink in sinks]
+        digest_sinks = set(digest_sinks)
+        self._digest_queues = [queue for queue in self.queues if queue.sink.name in digest_sinks]
+        self._record_queues = [queue for queue in self.queues if queue.sink.name not in digest_sinks]
+        self.published = 0
+        self.digests = 0
+
+    def start(self) -> None:
+        for queue in self.queues:
+            queue.start()
+
+    def publish(self, notification: Dict[str, Any], coalesced: bool = False) -> None:
+        self.published += 1
+        for queue in self._record_queues if coalesced else self.queues:
+            queue.offer(notification)
+
+    def publish_digest(self, digest: Dict[str, Any]) -> None:
+        self.digests += 1
+        for queue in self._digest_queues:
+            queue.offer(digest)
+
+    async def close(self, drain_timeout: float = 5.0) -> None:
+        await asyncio.gather(*(queue.close(drain_timeout) for queue in self.queues))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'published': self.published, 'digests': self.digests, 'sinks': {queue.sink.name: queue.stats() for queue in self.queues}}
+
+
+def parse_overflow(spec: str):
+    """Parse 'drop_oldest,webhook=spill' into a default policy and per-sink overrides"""
+    default = 'drop_oldest'
+    overrides = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, policy = entry.partition('=')
+        if sep:
+            overrides[name.strip()] = policy.strip()
+        else:
+            default = entry
+    for policy in [default, *overrides.values()]:
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r} (expected one of {', '.join(OVERFLOW_POLICIES)})")
+    return default, overrides
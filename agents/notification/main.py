@@ -8,8 +8,9 @@ import asyncio
 import os
 import json
 import logging
-from typing import Dict, Any
-from datetime import datetime
+from collections import deque
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 from langchain.chat_models import init_chat_model
@@ -17,6 +18,13 @@ from langchain.prompts import ChatPromptTemplate
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 
+from coral_io import parse_mentions, parse_result_payload, tools_by_name
+from coalesce import Coalescer
+from dispatcher import NotificationDispatcher, parse_overflow
+from notification_log import NotificationLog
+from sinks import parse_sinks, parse_styles
+from templates import failure_text, success_text, validation_failure_text
+
 # Load environment variables
 load_dotenv()
 
@@ -27,78 +35,155 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _sender(tip_data: Optional[Dict[str, Any]]) -> Optional[str]:
+    return (tip_data.get('author_id') or tip_data.get('sender')) if tip_data else None
+
 class ConsoleNotifier:
-    """Console-based notification system"""
+    """Console-based notification system
     
-    def __init__(self):
-        self.notification_history = []
-        
-    def send_success_notification(self, transaction_result: Dict[str, Any]) -> str:
-        """Generate success notification"""
-        notification = f"""
-✅ TIP SENT SUCCESSFULLY!
-💰 Amount: {transaction_result['amount']} SOL
-👤 Recipient: @{transaction_result['recipient']}
-💬 Message: {transaction_result.get('message', 'No message')}
-🆔 Transaction: {transaction_result['transaction_id']}
-🔗 Explorer: {transaction_result.get('explorer_url', 'N/A')}
-⏰ Time: {transaction_result.get('timestamp', 'N/A')}
-💳 Balance: {transaction_result.get('balance_after', 'N/A')} SOL
-"""
+    Notifications are structured records, and the send_* methods return
+    them. When a sink shows notifications as text (the default console
+    sink does), the text is rendered once, here, and kept as the record's
+    'content', as it was before templates; otherwise records hold only
+    their fields and sinks render them, from the templates in
+    templates.py, when delivered. `render_text` overrides that choice.
+    Only the last `history_size` notifications are kept in memory; with a
+    log, every notification is also written to SQLite and can be looked up
+    with query_notifications. With a dispatcher, notifications are published
+    to its sinks (console, JSONL file, webhook, Unix socket) without waiting
+    for delivery. With `coalesce_by` set to 'recipient' or 'sender', bursts
+    to the digest sinks are folded into digests (see coalesce.Coalescer);
+    the history and the other sinks still get every notification.
+    """
+    
+    def __init__(self, dispatcher: Optional[NotificationDispatcher] = None, coalesce_by: Optional[str] = None,
+                 coalesce_window: float = 10.0, coalesce_max: int = 100,
+                 log: Optional[NotificationLog] = None, history_size: int = 100,
+                 render_text: Optional[bool] = None):
+        self.notification_history = deque(maxlen=history_size)
+        if render_text is None:
+            render_text = dispatcher is not None and any(queue.sink.style == 'text' for queue in dispatcher.queues)
+        self.render_text = render_text
+        self.log = log
+        self.dispatcher = dispatcher
+        self.coalescer = (Coalescer(self._publish_digest, coalesce_by, coalesce_window, coalesce_max)
+                          if coalesce_by else None)
+    
+    def _record(self, notification: Dict[str, Any]) -> None:
+        self.notification_history.append(notification)
+        if self.log is not None:
+            self.log.append(notification)
+        if self.dispatcher is not None:
+            coalesced = self.coalescer is not None and self.coalescer.add(notification)
+            self.dispatcher.publish(notification, coalesced)
+    
+    def _publish_digest(self, digest: Dict[str, Any]) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.publish_digest(digest)
+    
+    def flush_digests(self) -> None:
+        """Emit the digests of bursts still open, e.g. before shutting down"""
+        if self.coalescer is not None:
+            self.coalescer.flush()
         
-        # Record notification
-        self.notification_history.append({
+    def send_success_notification(self, transaction_result: Dict[str, Any],
+                                  sender: Optional[str] = None) -> Dict[str, Any]:
+        """Generate success notification, returning its record"""
+        notification = {
             'type': 'success',
             'transaction_id': transaction_result['transaction_id'],
-            'timestamp': datetime.utcnow().isoformat(),
-            'content': notification
-        })
+            'amount': transaction_result['amount'],
+            'recipient': transaction_result['recipient'],
+            'sender': sender,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if self.render_text:
+            # The text carries the optional details, so the record does not
+            notification['content'] = success_text(transaction_result, transaction_result.get('timestamp', 'N/A'))
+        else:
+            # Optional details are only stored when present; the templates show their defaults otherwise
+            for field in ('message', 'explorer_url', 'balance_after'):
+                if field in transaction_result:
+                    notification[field] = transaction_result[field]
+            if 'timestamp' in transaction_result:
+                notification['transaction_time'] = transaction_result['timestamp']
+        
+        # Record notification
+        self._record(notification)
         
         return notification
     
-    def send_failure_notification(self, error: str, tip_data: Dict[str, Any] = None) -> str:
-        """Generate failure notification"""
-        notification = f"""
-❌ TIP FAILED!
-🚫 Error: {error}
-💡 Please check your command and try again.
-"""
-        
-        if tip_data:
-            notification += f"📝 Tip details: {tip_data['amount']} SOL → @{tip_data['recipient']}\n"
-        
-        # Record notification
-        self.notification_history.append({
+    def send_failure_notification(self, error: str, tip_data: Dict[str, Any] = None,
+                                  transaction_id: Optional[str] = None) -> Dict[str, Any]:
+        """Generate failure notification, returning its record"""
+        notification = {
             'type': 'failure',
+            'transaction_id': transaction_id,
             'error': error,
-            'timestamp': datetime.utcnow().isoformat(),
-            'content': notification
-        })
+            'amount': tip_data.get('amount') if tip_data else None,
+            'recipient': tip_data.get('recipient') if tip_data else None,
+            'sender': _sender(tip_data),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if self.render_text:
+            notification['content'] = failure_text(notification)
+        
+        # Record notification
+        self._record(notification)
         
         return notification
     
-    def send_validation_failure_notification(self, validation_error: str, tip_data: Dict[str, Any]) -> str:
-        """Generate validation failure notification"""
-        notification = f"""
-❌ TIP VALIDATION FAILED!
-🚫 Error: {validation_error}
-📝 Tip details: {tip_data['amount']} SOL → @{tip_data['recipient']}
-💡 Please check your command and try again.
-"""
-        
-        # Record notification
-        self.notification_history.append({
+    def send_validation_failure_notification(self, validation_error: str, tip_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate validation failure notification, returning its record"""
+        notification = {
             'type': 'validation_failure',
+            'transaction_id': tip_data.get('transaction_id'),
             'error': validation_error,
-            'timestamp': datetime.utcnow().isoformat(),
-            'content': notification
-        })
+            'amount': tip_data['amount'],
+            'recipient': tip_data['recipient'],
+            'sender': _sender(tip_data),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        if self.render_text:
+            notification['content'] = validation_failure_text(notification)
+        
+        # Record notification
+        self._record(notification)
         
         return notification
     
     def get_notification_history(self, limit: int = 10) -> list:
         """Get recent notification history"""
-        return self.notification_history[-limit:]
+        return list(self.notification_history)[-limit:]
+    
+    def query_notifications(self, transaction_id: Optional[str] = None, types=None, since: Optional[float] = None,
+                            until: Optional[float] = None, limit: Optional[int] = 1000) -> list:
+        """Look notifications up in the log, newest first (see NotificationLog.query)
+        
+        Without a log only the in-memory tail is searched.
+        """
+        if self.log is not None:
+            return self.log.query(transaction_id, types, since, until, limit)
+        
+        types = {types} if isinstance(types, str) else (set(types) if types is not None else None)
+        matches = []
+        for notification in reversed(self.notification_history):
+            if transaction_id is not None and notification.get('transaction_id') != transaction_id:
+                continue
+            if types is not None and notification.get('type') not in types:
+                continue
+            if since is not None or until is not None:
+                stamp = datetime.fromisoformat(notification['timestamp']).replace(tzinfo=timezone.utc).timestamp()
+                if (since is not None and stamp < since) or (until is not None and stamp >= until):
+                    continue
+            matches.append(notification)
+        return matches[:limit]
+    
+    def close(self) -> None:
+        """Emit pending digests and write out the log"""
+        self.flush_digests()
+        if self.log is not None:
+            self.log.close()
 
 def load_config() -> Dict[str, Any]:
     """Load configuration from environment variables"""
@@ -111,6 +196,21 @@ def load_config() -> Dict[str, Any]:
         "model_temperature": float(os.getenv("MODEL_TEMPERATURE", "0.1")),
         "model_max_tokens": int(os.getenv("MODEL_MAX_TOKENS", "4000")),
         "timeout_ms": float(os.getenv("TIMEOUT_MS", "60000")),
+        "mention_timeout_ms": int(os.getenv("MENTION_TIMEOUT_MS", "30000")),
+        "notify_sinks": os.getenv("NOTIFY_SINKS", "console"),
+        "notify_overflow": os.getenv("NOTIFY_OVERFLOW", "drop_oldest"),
+        "notify_queue_size": int(os.getenv("NOTIFY_QUEUE_SIZE", "1000")),
+        "notify_retries": int(os.getenv("NOTIFY_RETRIES", "3")),
+        "notify_timeout_ms": float(os.getenv("NOTIFY_TIMEOUT_MS", "2000")),
+        "notify_spill_dir": os.getenv("NOTIFY_SPILL_DIR", "."),
+        "notify_coalesce_by": os.getenv("NOTIFY_COALESCE_BY", "").strip() or None,
+        "notify_coalesce_window_s": float(os.getenv("NOTIFY_COALESCE_WINDOW_S", "10")),
+        "notify_coalesce_max": int(os.getenv("NOTIFY_COALESCE_MAX", "100")),
+        "notify_digest_sinks": os.getenv("NOTIFY_DIGEST_SINKS", "console"),
+        "notify_styles": os.getenv("NOTIFY_STYLES", ""),
+        "notify_log": os.getenv("NOTIFY_LOG", "").strip() or None,
+        "notify_log_batch": int(os.getenv("NOTIFY_LOG_BATCH", "500")),
+        "notify_history_size": int(os.getenv("NOTIFY_HISTORY_SIZE", "100")),
     }
     
     # Validate required fields
@@ -148,11 +248,16 @@ Your responsibilities:
 
 Available Coral tools: {coral_tools_description}
 
+Structured transaction results and validation failures are turned into
+notifications automatically before they reach you. You only receive mentions
+that could not be parsed as one. They are listed in the input with their
+threadId and senderId; do not call wait_for_mentions for them.
+
 Process flow:
-1. Use wait_for_mentions to receive transaction results or validation failures
+1. Read each mention in the input
 2. Generate appropriate notification based on result type
-3. Send notification back to console agent
-4. Log notification for tracking
+3. Send notification back to the sender with send_message in the same thread
+4. Always mention the sender in your reply
 
 Notification types:
 - Success: Transaction completed successfully
@@ -162,6 +267,7 @@ Notification types:
 Always provide clear, helpful information in notifications.
 """
         ),
+        ("human", "{input}"),
         ("placeholder", "{agent_scratchpad}")
     ])
     
@@ -179,6 +285,44 @@ Always provide clear, helpful information in notifications.
     agent = create_tool_calling_agent(model, coral_tools, prompt)
     return AgentExecutor(agent=agent, tools=coral_tools, verbose=True)
 
+def create_dispatcher(config: Dict[str, Any]) -> NotificationDispatcher:
+    """Dispatcher for the sinks named in NOTIFY_SINKS"""
+    default_overflow, overflow = parse_overflow(config["notify_overflow"])
+    return NotificationDispatcher(
+        parse_sinks(config["notify_sinks"], parse_styles(config["notify_styles"])),
+        overflow=overflow,
+        default_overflow=default_overflow,
+        digest_sinks=[name.strip() for name in config["notify_digest_sinks"].split(',') if name.strip()],
+        queue_size=config["notify_queue_size"],
+        retries=config["notify_retries"],
+        timeout=config["notify_timeout_ms"] / 1000,
+        spill_dir=config["notify_spill_dir"]
+    )
+
+# Structured results the transaction and validation agents mention us on
+RESULT_TYPES = ('transaction_result', 'validation_result')
+
+def notify_result(notifier: ConsoleNotifier, payload: Dict[str, Any]) -> bool:
+    """Turn a structured agent result into a notification; False if there was nothing to notify"""
+    tip = payload.get('tip') or {}
+    result = payload.get('result') or {}
+    if payload['type'] == 'transaction_result':
+        if result.get('success'):
+            notifier.send_success_notification(result, _sender(tip))
+        else:
+            notifier.send_failure_notification(result.get('error', 'Unknown error'), tip or None,
+                                               result.get('transaction_id'))
+        return True
+    if not result.get('is_valid', True) and tip:
+        notifier.send_validation_failure_notification(result.get('reason', 'Validation failed'), tip)
+        return True
+    return False
+
+def looks_like_messages(raw: Any) -> bool:
+    """Whether an unparsed wait_for_mentions result still seems to carry messages"""
+    text = str(raw or '').lower()
+    return 'sender' in text and 'thread' in text
+
 async def main():
     """Main notification agent loop"""
     print("📢 Starting Notification Agent")
@@ -205,24 +349,57 @@ async def main():
         
         # Create notification agent
         agent_executor = await create_notification_agent(coral_tools)
-        notifier = ConsoleNotifier()
+        dispatcher = create_dispatcher(config)
+        dispatcher.start()
+        notifier = ConsoleNotifier(
+            dispatcher,
+            coalesce_by=config["notify_coalesce_by"],
+            coalesce_window=config["notify_coalesce_window_s"],
+            coalesce_max=config["notify_coalesce_max"],
+            log=NotificationLog(config["notify_log"], config["notify_log_batch"]) if config["notify_log"] else None,
+            history_size=config["notify_history_size"]
+        )
+        
+        wait_for_mentions = tools_by_name(coral_tools)["wait_for_mentions"]
         
         print("🎯 Notification agent ready!")
         
-        # Main notification loop
-        while True:
-            try:
-                # Listen for notification requests
-                await agent_executor.ainvoke({
-                    "input": "Listen for transaction results and validation failures to send notifications",
-                    "agent_scratchpad": []
-                })
-                await asyncio.sleep(5)
-                
-            except Exception as e:
-                print(f"❌ Notification error: {e}")
-                logger.error(f"Notification error: {e}")
-                await asyncio.sleep(10)
+        try:
+            # Main notification loop
+            while True:
+                try:
+                    # Listen for notification requests
+                    raw = await wait_for_mentions.ainvoke({"timeoutMs": config["mention_timeout_ms"]})
+                    mentions = parse_mentions(raw)
+                    unparsed: List[Dict[str, str]] = []
+                    
+                    # Direct path: structured results become notifications without the LLM
+                    for mention in mentions:
+                        payload = parse_result_payload(mention['content'], RESULT_TYPES)
+                        if payload is None:
+                            unparsed.append(mention)
+                        else:
+                            notify_result(notifier, payload)
+                    
+                    if unparsed:
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {json.dumps(unparsed)}",
+                            "agent_scratchpad": []
+                        })
+                    elif not mentions and looks_like_messages(raw):
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {raw}",
+                            "agent_scratchpad": []
+                        })
+                    
+                except Exception as e:
+                    print(f"❌ Notification error: {e}")
+                    logger.error(f"Notification error: {e}")
+                    await asyncio.sleep(10)
+        finally:
+            # Pending digests and buffered log rows would otherwise be lost on exit
+            notifier.close()
+            await dispatcher.close()
                 
     except Exception as e:
         print(f"💥 Fatal error in notification agent: {e}")
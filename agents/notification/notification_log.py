@@ -0,0 +1,129 @@
+"""
+Notification Log
+Every notification in SQLite, indexed for lookups by transaction, type and time
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+class NotificationLog:
+    """Append-only SQLite log of notifications
+
+    append only buffers the notification; the buffer is written in one
+    transaction once `batch_size` notifications are waiting, or
+    `flush_interval` seconds after the first of them when an event loop is
+    running. Queries flush first, so they always see every appended
+    notification. Lookups by transaction_id, by type and by time each go
+    through an index rather than a table scan.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notifications ("
+            "id INTEGER PRIMARY KEY, stamp REAL NOT NULL, type TEXT NOT NULL, transaction_id TEXT, "
+            "recipient TEXT, sender TEXT, record TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS notifications_tx ON notifications (transaction_id, type, stamp)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS notifications_type ON notifications (type, stamp)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS notifications_stamp ON notifications (stamp)")
+
+    def append(self, notification: Dict[str, Any], stamp: Optional[float] = None) -> None:
+        self._pending.append((
+            time.time() if stamp is None else stamp,
+            notification.get('type', ''),
+            notification.get('transaction_id'),
+            notification.get('recipient'),
+            notification.get('sender'),
+            json.dumps(notification, default=str)
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+            except RuntimeError:
+                # No event loop: the buffer is written on batch_size, query or close
+                pass
+
+    def flush(self) -> None:
+        """Write the buffered notifications in one transaction"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO notifications (stamp, type, transaction_id, recipient, sender, record) "
+                "VALUES (?, ?, ?, ?, ?, ?)", pending
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            self._pending = pending + self._pending
+            raise
+        self.written += len(pending)
+
+    @staticmethod
+    def _where(transaction_id: Optional[str], types: Union[str, Iterable[str], None],
+               since: Optional[float], until: Optional[float]):
+        clauses, params = [], []
+        if transaction_id is not None:
+            clauses.append("transaction_id = ?")
+            params.append(transaction_id)
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            clauses.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        if since is not None:
+            clauses.append("stamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("stamp < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, transaction_id: Optional[str] = None, types: Union[str, Iterable[str], None] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = 1000) -> List[Dict[str, Any]]:
+        """Notifications matching every given filter, newest first
+
+        `types` is one type or several, e.g. ('failure', 'validation_failure');
+        `since` and `until` are Unix timestamps. Each record gets the time it
+        was logged as 'logged_at'.
+        """
+        self.flush()
+        where, params = self._where(transaction_id, types, since, until)
+        sql = f"SELECT stamp, record FROM notifications{where} ORDER BY stamp DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(json.loads(record), logged_at=stamp) for stamp, record in self._db.execute(sql, params)]
+
+    def explain(self, transaction_id: Optional[str] = None, types: Union[str, Iterable[str], None] = None,
+                since: Optional[float] = None, until: Optional[float] = None) -> List[str]:
+        """SQLite's plan for the equivalent query, to check that it uses an index"""
+        where, params = self._where(transaction_id, types, since, until)
+        return [row[-1] for row in self._db.execute(
+            f"EXPLAIN QUERY PLAN SELECT stamp, record FROM notifications{where} ORDER BY stamp DESC", params
+        )]
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Local Notification Sink Stand-in
+Webhook (HTTP) and Unix socket receivers with latency and failure injection,
+for exercising the notification dispatcher
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from typing import Optional
+
+
+class SinkStub:
+    """Counts the notifications it receives; the webhook can be made slow or flaky"""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, verbose: bool = False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.counters = {'requests': 0, 'errors': 0, 'notifications': 0, 'socket_notifications': 0}
+
+    def _received(self, notification, counter: str) -> None:
+        self.counters[counter] += 1
+        if self.verbose:
+            print(json.dumps(notification, default=str))
+
+    async def serve_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve keep-alive HTTP/1.1 POSTs of a notification or a JSON array of them"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', '0')))
+                self.counters['requests'] += 1
+                await asyncio.sleep(self.latency)
+
+                if random.random() < self.error_rate:
+                    self.counters['errors'] += 1
+                    status = '503 Service Unavailable'
+                else:
+                    status = '204 No Content'
+                    payload = json.loads(body)
+                    for notification in payload if isinstance(payload, list) else [payload]:
+                        self._received(notification, 'notifications')
+
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode('ascii'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_socket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Read JSON lines from a Unix socket connection"""
+        try:
+            async for line in reader:
+                if line.strip():
+                    self._received(json.loads(line), 'socket_notifications')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def start_stub(stub: SinkStub, host: str, port: int, unix_path: Optional[str] = None):
+    """Start the webhook server, and the Unix socket server if a path is given, on the running loop"""
+    servers = [await asyncio.start_server(stub.serve_http, host, port)]
+    if unix_path:
+        servers.append(await asyncio.start_unix_server(stub.serve_socket, unix_path))
+    return servers
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local webhook and Unix socket notification receiver")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--unix", help="Also listen on this Unix socket path")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before answering each webhook POST")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of webhook POSTs answered with 503")
+    parser.add_argument("--verbose", action="store_true", help="Print every notification received")
+    args = parser.parse_args()
+
+    stub = SinkStub(args.latency_ms / 1000, args.error_rate, args.verbose)
+    servers = await start_stub(stub, args.host, args.port, args.unix)
+    print(f"🧪 Notification sink stand-in on http://{args.host}:{args.port}"
+          + (f" and unix:{args.unix}" if args.unix else ""))
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
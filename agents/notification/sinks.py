@@ -0,0 +1,242 @@
+"""
+Notification Sinks
+Destinations the dispatcher delivers notifications to
+"""
+
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from templates import STYLES, encode_json, render
+
+_encode_compact_json = json.JSONEncoder(default=str, separators=(',', ':')).encode
+
+
+class SinkError(Exception):
+    """A sink could not accept a delivery; the dispatcher may retry it"""
+
+
+class Sink:
+    """One notification destination
+
+    The dispatcher calls send_batch from a single task per sink, so a sink
+    never sees overlapping deliveries and needs no locking of its own.
+    Notifications arrive as structured records and are rendered here, in
+    the sink's `style` ('text', 'compact' or 'json'), only when delivered.
+    """
+
+    name = 'sink'
+    style = 'json'
+
+    def payload(self, notification: Dict[str, Any]) -> Dict[str, Any]:
+        """The record as delivered: its fields, plus its text as 'content' unless the style is 'json'"""
+        if self.style == 'json':
+            return notification
+        return dict(notification, content=render(notification, self.style))
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class ConsoleSink(Sink):
+    """Print each notification to stdout, as text by default, writing off the event loop
+
+    A slow or blocked terminal then only backs up this sink's queue.
+    """
+
+    name = 'console'
+    style = 'text'
+
+    @staticmethod
+    def _write(text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> None:
+        style = self.style
+        if style == 'json':
+            text = ''.join(render(notification, style) + '\n' for notification in notifications)
+        else:
+            text = ''.join(render(notification, style) for notification in notifications)
+        await asyncio.get_running_loop().run_in_executor(None, self._write, text)
+
+
+class JsonlSink(Sink):
+    """Append notifications to a JSON lines file, writing off the event loop"""
+
+    name = 'jsonl'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _write(self, data: str) -> None:
+        self._file.write(data)
+        self._file.flush()
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> None:
+        data = ''.join(encode_json(self.payload(notification)) + '\n' for notification in notifications)
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    async def close(self) -> None:
+        self._file.close()
+
+
+class WebhookSink(Sink):
+    """POST each batch as a JSON array to an HTTP endpoint over a keep-alive connection"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Webhook URL must be http(s): {url}")
+        self.url = url
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = parts.path or '/'
+        self.ssl = parts.scheme == 'https'
+        self._connection: Optional[tuple] = None
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> None:
+        body = _encode_compact_json([self.payload(notification) for notification in notifications])
+        body = body.encode('utf-8')
+        if self._connection is None:
+            self._connection = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        reader, writer = self._connection
+
+        try:
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body
+            )
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("Webhook connection closed")
+            status = int(status_line.split()[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            await reader.readexactly(int(headers.get('content-length', '0')))
+        except BaseException:
+            # Timeouts cancel mid-request, which leaves the connection unusable
+            self._drop_connection()
+            raise
+
+        if headers.get('connection', '').lower() == 'close':
+            self._drop_connection()
+        if not 200 <= status < 300:
+            raise SinkError(f"Webhook HTTP {status}")
+
+    def _drop_connection(self) -> None:
+        if self._connection is not None:
+            self._connection[1].close()
+            self._connection = None
+
+    async def close(self) -> None:
+        self._drop_connection()
+
+
+class UnixSocketSink(Sink):
+    """Write notifications as JSON lines to a Unix domain socket, reconnecting after errors"""
+
+    name = 'unix'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def send_batch(self, notifications: List[Dict[str, Any]]) -> None:
+        if self._writer is None:
+            _, self._writer = await asyncio.open_unix_connection(self.path)
+        data = ''.join(encode_json(self.payload(notification)) + '\n' for notification in notifications)
+        try:
+            self._writer.write(data.encode('utf-8'))
+            await self._writer.drain()
+        except BaseException:
+            self._writer.close()
+            self._writer = None
+            raise
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+SINK_TYPES = {
+    'console': ConsoleSink,
+    'jsonl': JsonlSink,
+    'webhook': WebhookSink,
+    'unix': UnixSocketSink,
+}
+
+
+def parse_styles(spec: str) -> Dict[str, str]:
+    """Parse 'console=compact,webhook=text' into per-sink rendering styles"""
+    styles = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, style = entry.partition('=')
+        style = style.strip()
+        if style not in STYLES:
+            raise ValueError(f"Unknown notification style {style!r} for {name.strip()!r} "
+                             f"(expected one of {', '.join(STYLES)})")
+        styles[name.strip()] = style
+    return styles
+
+
+def parse_sinks(spec: str, styles: Optional[Dict[str, str]] = None) -> List[Sink]:
+    """Build sinks from a spec such as 'console,jsonl:notifications.jsonl,webhook:http://127.0.0.1:8787/notify'
+
+    Each entry is a sink type, followed by its path or URL for the types
+    that need one. A type used twice gets a numbered name. `styles` maps
+    sink names to the style they render in, overriding the type's default.
+    """
+    styles = styles or {}
+    sinks = []
+    names = set()
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kind, _, target = entry.partition(':')
+        if kind not in SINK_TYPES:
+            raise ValueError(f"Unknown notification sink {kind!r} (expected one of {', '.join(SINK_TYPES)})")
+        if kind != 'console' and not target:
+            raise ValueError(f"Notification sink {kind!r} needs a target, e.g. {kind}:<path or URL>")
+        if kind == 'console':
+            sink = ConsoleSink()
+        elif kind == 'webhook':
+            sink = WebhookSink(target)
+        else:
+            sink = SINK_TYPES[kind](os.path.expanduser(target))
+
+        name = kind
+        number = 2
+        while name in names:
+            name = f"{kind}{number}"
+            number += 1
+        sink.name = name
+        if name in styles:
+            sink.style = styles[name]
+        names.add(name)
+        sinks.append(sink)
+    return sinks
@@ -0,0 +1,137 @@
+"""
+Balance Account
+Reserve/commit balance accounting for concurrent transfers
+"""
+
+import itertools
+from typing import Dict, Optional
+
+LAMPORTS_PER_SOL = 1_000_000_000
+
+
+def to_lamports(amount: float) -> int:
+    """Convert a SOL amount to integer lamports"""
+    return round(amount * LAMPORTS_PER_SOL)
+
+
+class InsufficientBalanceError(Exception):
+    """Raised when a reservation exceeds the available balance"""
+
+
+class Hold:
+    """Funds reserved for one in-flight transfer"""
+
+    __slots__ = ('hold_id', 'lamports')
+
+    def __init__(self, hold_id: int, lamports: int):
+        self.hold_id = hold_id
+        self.lamports = lamports
+
+    @property
+    def amount(self) -> float:
+        return self.lamports / LAMPORTS_PER_SOL
+
+
+class BalanceAccount:
+    """Account balance with outstanding holds
+
+    Amounts are tracked as integer lamports so thousands of concurrent
+    reserve/release cycles cannot drift. `available` is what a new
+    reservation may use: the settled balance minus every open hold.
+    """
+
+    def __init__(self, balance: float):
+        self._settled = to_lamports(balance)
+        self._reserved = 0
+        self._holds: Dict[int, Hold] = {}
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_lamports(cls, lamports: int) -> "BalanceAccount":
+        """Account with an exact settled balance, e.g. as replayed from the ledger"""
+        account = cls(0)
+        account._settled = lamports
+        return account
+
+    @property
+    def balance(self) -> float:
+        """Settled balance, ignoring open holds"""
+        return self._settled / LAMPORTS_PER_SOL
+
+    @property
+    def reserved(self) -> float:
+        return self._reserved / LAMPORTS_PER_SOL
+
+    @property
+    def available(self) -> float:
+        return (self._settled - self._reserved) / LAMPORTS_PER_SOL
+
+    @property
+    def open_holds(self) -> int:
+        return len(self._holds)
+
+    @property
+    def available_lamports(self) -> int:
+        return self._settled - self._reserved
+
+    def reserve(self, amount: float) -> Hold:
+        """Reserve funds for a transfer"""
+        return self.reserve_lamports(to_lamports(amount))
+
+    def reserve_lamports(self, lamports: int) -> Hold:
+        """Reserve an exact number of lamports"""
+        if lamports < 0:
+            raise ValueError("Cannot reserve a negative amount")
+        if lamports > self._settled - self._reserved:
+            raise InsufficientBalanceError(
+                f'Insufficient balance. Required: {lamports / LAMPORTS_PER_SOL} SOL, '
+                f'Available: {self.available} SOL'
+            )
+
+        hold = Hold(next(self._ids), lamports)
+        self._holds[hold.hold_id] = hold
+        self._reserved += lamports
+        return hold
+
+    def commit(self, hold: Hold, lamports: Optional[int] = None) -> None:
+        """Settle a hold: the reserved funds leave the account
+
+        Passing `lamports` settles only that part of the hold and releases
+        the rest, for groups where some transfers failed.
+        """
+        if lamports is None:
+            lamports = hold.lamports
+        if not 0 <= lamports <= hold.lamports:
+            raise ValueError(f"Cannot commit {lamports} lamports of a {hold.lamports} lamport hold")
+        self._close(hold)
+        self._settled -= lamports
+
+    def settle(self, hold: Hold, lamports: int) -> None:
+        """Settle part of a hold as one of its transfers completes, keeping the rest reserved"""
+        if not 0 <= lamports <= hold.lamports:
+            raise ValueError(f"Cannot settle {lamports} lamports of a {hold.lamports} lamport hold")
+        if hold.hold_id not in self._holds:
+            raise KeyError(f"Hold {hold.hold_id} is not open")
+        hold.lamports -= lamports
+        self._reserved -= lamports
+        self._settled -= lamports
+
+    def split(self, hold: Hold, lamports: int) -> Hold:
+        """Move part of a hold into a new hold of its own, e.g. to keep it open longer"""
+        if not 0 <= lamports <= hold.lamports:
+            raise ValueError(f"Cannot split {lamports} lamports off a {hold.lamports} lamport hold")
+        if hold.hold_id not in self._holds:
+            raise KeyError(f"Hold {hold.hold_id} is not open")
+        hold.lamports -= lamports
+        part = Hold(next(self._ids), lamports)
+        self._holds[part.hold_id] = part
+        return part
+
+    def release(self, hold: Hold) -> None:
+        """Cancel a hold: the reserved funds become available again"""
+        self._close(hold)
+
+    def _close(self, hold: Hold) -> None:
+        if self._holds.pop(hold.hold_id, None) is None:
+            raise KeyError(f"Hold {hold.hold_id} is not open")
+        self._reserved -= hold.lamports
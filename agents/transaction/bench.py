@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Transaction Agent Benchmarks
+Micro-benchmarks for the transaction executor and its storage
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from balance import BalanceAccount, InsufficientBalanceError, to_lamports
+from ledger import TransactionLedger
+from rpc_stub import RpcStub, parse_profile, start_stub
+from transaction_store import TransactionRecord, TransactionStore
+
+
+def _fake_record(index: int, recipients: int, epoch: float) -> TransactionRecord:
+    """Build a record shaped like MockTransactionExecutor output"""
+    tx_id = f"mock_tx_{uuid.uuid4().hex[:8]}{index}"
+    return TransactionRecord(tx_id, 0.01, f"user{index % recipients}", '', epoch, 100.0 - index * 0.01)
+
+
+def _legacy_transaction(index: int, recipients: int, epoch: float) -> dict:
+    """The per-transaction dict the executor used to keep in its history"""
+    tx_id = f"mock_tx_{uuid.uuid4().hex[:8]}{index}"
+    return {
+        'success': True,
+        'transaction_id': tx_id,
+        'amount': 0.01,
+        'recipient': f"user{index % recipients}",
+        'message': '',
+        'timestamp': datetime.utcfromtimestamp(epoch).isoformat(),
+        'explorer_url': f"https://explorer.solana.com/tx/{tx_id}?cluster=devnet",
+        'balance_after': 100.0 - index * 0.01
+    }
+
+
+def bench_store(args) -> None:
+    """Lookup latency of TransactionStore as history grows"""
+    print(f"{'records':>10} {'get (ns)':>10} {'recent (ns)':>12} {'range (ns)':>11} {'list scan (ns)':>15}")
+
+    for size in args.sizes:
+        store = TransactionStore()
+        history = []
+        start_epoch = time.time()
+        for i in range(size):
+            record = _fake_record(i, args.recipients, start_epoch + i * 0.01)
+            store.add(record)
+            history.append(record)
+
+        ids = [history[random.randrange(size)].transaction_id for _ in range(args.lookups)]
+        recipients = [f"user{random.randrange(args.recipients)}" for _ in range(args.lookups)]
+        end_epoch = start_epoch + size * 0.01
+
+        t0 = time.perf_counter_ns()
+        for tx_id in ids:
+            store.get(tx_id)
+        get_ns = (time.perf_counter_ns() - t0) / len(ids)
+
+        t0 = time.perf_counter_ns()
+        for recipient in recipients:
+            store.recent_for_recipient(recipient, 10)
+        recent_ns = (time.perf_counter_ns() - t0) / len(recipients)
+
+        t0 = time.perf_counter_ns()
+        for _ in range(args.lookups):
+            store.between(end_epoch - 5, end_epoch)
+        range_ns = (time.perf_counter_ns() - t0) / args.lookups
+
+        # The old linear scan, sampled sparingly since it is O(n)
+        scan_ids = ids[:max(1, args.lookups // 100)]
+        t0 = time.perf_counter_ns()
+        for tx_id in scan_ids:
+            next(record for record in history if record.transaction_id == tx_id)
+        scan_ns = (time.perf_counter_ns() - t0) / len(scan_ids)
+
+        print(f"{size:>10} {get_ns:>10.0f} {recent_ns:>12.0f} {range_ns:>11.0f} {scan_ns:>15.0f}")
+
+
+def bench_ledger(args) -> None:
+    """Replay time of a ledger with and without index rebuild"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.ledger')
+        # Snapshot only where the benchmark asks, so each replay below measures the same file
+        writer = TransactionLedger(path, initial_balance=float(args.entries), close_snapshot_min=None)
+        for _ in writer.recover():
+            pass
+
+        t0 = time.perf_counter()
+        epoch = time.time()
+        for first in range(0, args.entries, 100_000):
+            records = [_fake_record(i, args.recipients, epoch + i * 0.001)
+                       for i in range(first, min(first + 100_000, args.entries))]
+            data = b''.join(writer.encode(record) for record in records)
+            writer._write_and_sync(data)
+            writer._committed(data, sum(to_lamports(record.amount) for record in records), len(records), records)
+            if args.snapshot:
+                writer._write_snapshot(*writer._take_segment())
+        writer.close()
+        write_s = time.perf_counter() - t0
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"wrote {args.entries} entries ({size_mb:.1f} MB) in {write_s:.2f}s"
+              + (" with snapshot segments" if args.snapshot else " without a snapshot"))
+
+        t0 = time.perf_counter()
+        ledger = TransactionLedger(path, initial_balance=0.0, close_snapshot_min=None)
+        tail = list(ledger.recover())
+        ledger.close()
+        print(f"replay only:           {time.perf_counter() - t0:.2f}s ({len(tail)} entries after the snapshot)")
+
+        t0 = time.perf_counter()
+        ledger = TransactionLedger(path, initial_balance=0.0, close_snapshot_min=None)
+        tail = list(ledger.recover())
+        store = TransactionStore(base=ledger.snapshot)
+        for record in tail:
+            store.add(record)
+        ledger.close()
+        print(f"replay + index build:  {time.perf_counter() - t0:.2f}s ({len(store)} transactions)")
+
+        # The restored store answers like one built record by record
+        newest = store.recent_for_recipient("user0", 3)
+        assert newest and store.get(newest[0].transaction_id).epoch_us == newest[0].epoch_us
+        assert len(store.between(epoch, epoch + 1)) == min(1000, args.entries)
+        assert ledger.balance_lamports == to_lamports(args.entries) - args.entries * to_lamports(0.01)
+
+
+def bench_memory(args) -> None:
+    """Bytes per transaction: legacy dict history vs TransactionStore records"""
+    epoch = time.time()
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        kept = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        gc.collect()
+        return current / args.records
+
+    def build_legacy():
+        return [_legacy_transaction(i, args.recipients, epoch + i * 0.01) for i in range(args.records)]
+
+    def build_store():
+        store = TransactionStore()
+        for i in range(args.records):
+            store.add(_fake_record(i, args.recipients, epoch + i * 0.01))
+        return store
+
+    legacy = measure(build_legacy)
+    compact = measure(build_store)
+    print(f"{args.records} transactions")
+    print(f"dict history (no indexes):      {legacy:>6.0f} bytes/tx")
+    print(f"TransactionStore (all indexes): {compact:>6.0f} bytes/tx ({legacy / compact:.1f}x smaller)")
+
+
+def bench_holds(args) -> None:
+    """Stress concurrent reservations and check the account never overspends"""
+    account = BalanceAccount(args.balance)
+    stats = {'committed': 0, 'released': 0, 'rejected': 0, 'spent': 0.0}
+
+    def check():
+        assert account.balance >= 0, f"settled balance went negative: {account.balance}"
+        assert account.available >= 0, f"available balance went negative: {account.available}"
+
+    async def transfer():
+        amount = round(random.uniform(0.001, args.max_amount), 9)
+        try:
+            hold = account.reserve(amount)
+        except InsufficientBalanceError:
+            stats['rejected'] += 1
+            return
+        check()
+
+        await asyncio.sleep(random.uniform(0, args.max_latency))
+
+        if random.random() < args.failure_rate:
+            account.release(hold)
+            stats['released'] += 1
+        else:
+            account.commit(hold)
+            stats['committed'] += 1
+            stats['spent'] += hold.amount
+        check()
+
+    async def run():
+        await asyncio.gather(*(transfer() for _ in range(args.transfers)))
+
+    t0 = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+
+    assert account.open_holds == 0 and account.reserved == 0
+    assert abs(account.balance - (args.balance - stats['spent'])) < 1e-6
+    print(f"{args.transfers} concurrent transfers in {elapsed:.2f}s: "
+          f"{stats['committed']} committed, {stats['released']} released, "
+          f"{stats['rejected']} rejected, final balance {account.balance:.9f} SOL")
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def bench_executor(args) -> None:
+    """Drive MockTransactionExecutor against a Solana RPC endpoint"""
+
+    async def run():
+        server = stub = None
+        rpc_url = args.rpc_url
+        if not rpc_url:
+            stub = RpcStub(parse_profile(args.latency_ms), parse_profile(args.confirm_ms),
+                           error_rate=args.error_rate, drop_rate=args.drop_rate,
+                           blockhash_valid_slots=args.blockhash_valid_slots)
+            server = await start_stub('127.0.0.1', 0, stub)
+            port = server.sockets[0].getsockname()[1]
+            rpc_url = f"http://127.0.0.1:{port}"
+
+        os.environ.update({
+            'SOLANA_RPC_URL': rpc_url,
+            'TX_LEDGER_PATH': '',
+            'TX_MAX_IN_FLIGHT': str(args.concurrency),
+            'TX_RPC_CONFIRM_TIMEOUT_S': str(args.confirm_timeout),
+            'INITIAL_BALANCE': str(args.tips),
+        })
+        # Imported here so the other benchmarks run without the agent's dependencies
+        from main import MockTransactionExecutor
+        executor = MockTransactionExecutor()
+
+        latencies = []
+        failures = 0
+
+        async def one_tip(i: int):
+            nonlocal failures
+            t0 = time.perf_counter()
+            result = await executor.execute_tip({'amount': 0.001, 'recipient': f"user{i % args.recipients}"})
+            latencies.append(time.perf_counter() - t0)
+            if not result['success']:
+                failures += 1
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(one_tip(i) for i in range(args.tips)))
+        elapsed = time.perf_counter() - t0
+
+        await executor.close()
+        if server is not None:
+            # Let the server's connection handlers see the client hang up
+            await asyncio.sleep(0.1)
+            server.close()
+            await server.wait_closed()
+        return latencies, failures, elapsed, stub
+
+    latencies, failures, elapsed, stub = asyncio.run(run())
+    latencies.sort()
+    print(f"{args.tips} tips, concurrency {args.concurrency}: {args.tips / elapsed:.1f} tips/sec, {failures} failed")
+    if stub is not None:
+        landed = stub.landed()
+        print(f"{landed} transfers landed for {args.tips - failures} successful tips "
+              f"({stub.counters['sent']} sent, {stub.counters['dropped']} dropped)")
+        if landed > args.tips - failures:
+            print("⚠️  Some tips were paid out more than once")
+    print(f"latency p50 {_percentile(latencies, 0.50) * 1000:.0f} ms, "
+          f"p95 {_percentile(latencies, 0.95) * 1000:.0f} ms, "
+          f"p99 {_percentile(latencies, 0.99) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction agent benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    store_parser = subparsers.add_parser("store", help="TransactionStore lookup latency")
+    store_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    store_parser.add_argument("--lookups", type=int, default=10_000)
+    store_parser.add_argument("--recipients", type=int, default=1_000)
+    store_parser.set_defaults(func=bench_store)
+
+    ledger_parser = subparsers.add_parser("ledger", help="Ledger recovery time")
+    ledger_parser.add_argument("--entries", type=int, default=1_000_000)
+    ledger_parser.add_argument("--recipients", type=int, default=1_000)
+    ledger_parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                               help="Replay every ledger entry instead of loading snapshot segments")
+    ledger_parser.set_defaults(func=bench_ledger)
+
+    memory_parser = subparsers.add_parser("memory", help="Memory per stored transaction")
+    memory_parser.add_argument("--records", type=int, default=1_000_000)
+    memory_parser.add_argument("--recipients", type=int, default=1_000)
+    memory_parser.set_defaults(func=bench_memory)
+
+    holds_parser = subparsers.add_parser("holds", help="Concurrent reserve/commit stress test")
+    holds_parser.add_argument("--transfers", type=int, default=10_000)
+    holds_parser.add_argument("--balance", type=float, default=100.0)
+    holds_parser.add_argument("--max-amount", type=float, default=0.5)
+    holds_parser.add_argument("--max-latency", type=float, default=0.05)
+    holds_parser.add_argument("--failure-rate", type=float, default=0.1)
+    holds_parser.set_defaults(func=bench_holds)
+
+    executor_parser = subparsers.add_parser("executor", help="Executor throughput against a Solana RPC stand-in")
+    executor_parser.add_argument("--rpc-url", help="Existing RPC endpoint; starts an in-process stand-in if omitted")
+    executor_parser.add_argument("--tips", type=int, default=2_000)
+    executor_parser.add_argument("--concurrency", type=int, default=64)
+    executor_parser.add_argument("--recipients", type=int, default=10_000)
+    executor_parser.add_argument("--confirm-timeout", type=float, default=5.0)
+    executor_parser.add_argument("--latency-ms", type=float, nargs=3, default=[20, 60, 120], metavar=("P50", "P95", "P99"))
+    executor_parser.add_argument("--confirm-ms", type=float, nargs=3, default=[400, 900, 1600], metavar=("P50", "P95", "P99"))
+    executor_parser.add_argument("--error-rate", type=float, default=0.0)
+    executor_parser.add_argument("--drop-rate", type=float, default=0.0)
+    executor_parser.add_argument("--blockhash-valid-slots", type=int, default=150)
+    executor_parser.set_defaults(func=bench_executor)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
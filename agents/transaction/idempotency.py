@@ -0,0 +1,82 @@
+"""
+Idempotency Cache
+Bounded TTL/LRU cache of transfer results keyed by tip idempotency key
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+def idempotency_key(tip_data: Dict[str, Any]) -> Optional[str]:
+    """Derive a stable key for one user tip command
+
+    An explicit `idempotency_key` wins. Otherwise the key is a hash of the tip
+    payload including the timestamp the console stamped on the command, so
+    retries of the same command collide while two identical commands typed
+    separately do not. Tips without a timestamp get no key; see message_key.
+    """
+    if tip_data.get('idempotency_key'):
+        return str(tip_data['idempotency_key'])
+    if not tip_data.get('timestamp'):
+        return None
+
+    payload = json.dumps([
+        tip_data.get('author_id', ''),
+        tip_data.get('platform', ''),
+        tip_data['recipient'],
+        float(tip_data['amount']),
+        tip_data.get('message', ''),
+        tip_data['timestamp']
+    ], separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def message_key(mention: Dict[str, Any]) -> Optional[str]:
+    """Fallback key for a tip that carries none: the Coral message it arrived in
+
+    A redelivered message, or one processed twice, maps to the same key.
+    """
+    if not mention.get('messageId'):
+        return None
+    return f"coral:{mention.get('threadId', '')}:{mention['messageId']}"
+
+
+class IdempotencyCache:
+    """LRU cache whose entries also expire after a TTL"""
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Cache a result, evicting the least recently used entry when full"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,449 @@
+"""
+Transaction Ledger
+Append-only binary ledger of completed transfers with group commit, columnar
+snapshots and mmap replay of the tail
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from balance import LAMPORTS_PER_SOL, to_lamports
+from transaction_store import FrozenTransactions, TransactionRecord
+
+logger = logging.getLogger(__name__)
+
+# Amounts and balances are stored as integer lamports, as BalanceAccount keeps them,
+# so replaying millions of entries cannot drift
+
+# File header: magic, initial balance
+FILE_HEADER = struct.Struct('<8sq')
+FILE_MAGIC = b'TIPLDG02'
+
+# Entry: body length, crc32 of body, then body
+ENTRY_HEADER = struct.Struct('<II')
+
+# Body: epoch, amount, balance_after, then tx_id, recipient, message (utf-8)
+ENTRY_BODY = struct.Struct('<dqqBBH')
+
+# Snapshot manifest: magic, ledger offset, entry count, balance at offset, segment count, crc32 of the rest
+SNAPSHOT = struct.Struct('<8sQQqII')
+SNAPSHOT_MAGIC = b'TIPSNP03'
+
+# Snapshot segment: magic, first entry, entry count, payload length, crc32 of the payload; then the payload
+SEGMENT = struct.Struct('<8sQQQI')
+SEGMENT_MAGIC = b'TIPSEG02'
+
+# Segment payload: length of a JSON object holding the string columns, the JSON, then
+# the numeric columns as little-endian arrays of `count` items each, then every
+# recipient's row numbers back to back, split by the JSON 'by_recipient' counts
+SEGMENT_STRINGS = struct.Struct('<I')
+NUMERIC_COLUMNS = (('amounts', 'd'), ('recipient_codes', 'I'), ('epoch_us', 'q'), ('balance_after', 'd'))
+
+
+class LedgerError(Exception):
+    """Raised when a ledger file cannot be used"""
+
+
+class TransactionLedger:
+    """Append-only ledger that the transaction agent rebuilds its state from
+
+    Every `snapshot_every` entries, the entries since the previous snapshot
+    are also written as a segment of columns (see FrozenTransactions), and a
+    manifest records the ledger offset, entry count and balance they cover.
+    Recovery loads the segments as `snapshot` and only decodes and
+    CRC-checks the ledger tail written after them. close() also segments
+    the tail, but only once it has `close_snapshot_min` entries (never when
+    None); a shorter tail is cheaper to replay than to write as a segment.
+    """
+
+    def __init__(self, path: str, initial_balance: float,
+                 commit_interval: float = 0.005, snapshot_every: int = 100_000,
+                 close_snapshot_min: Optional[int] = 10_000):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every
+        self.close_snapshot_min = close_snapshot_min
+        self.initial_lamports = to_lamports(initial_balance)
+        self.balance_lamports = self.initial_lamports
+        self.entries = 0
+        self.offset = FILE_HEADER.size
+
+        self._fd = None
+        self._buffer: List[bytes] = []
+        self._buffered_amount = 0
+        self._buffered_entries = 0
+        self._commit_future = None
+        self._commit_lock = None
+        self._commit_tasks = set()
+        self._buffered_records: List[TransactionRecord] = []
+        # Durable entries not yet covered by a snapshot segment
+        self._unsegmented: List[TransactionRecord] = []
+        self._segments = 0
+        self.snapshot: Optional[FrozenTransactions] = None
+
+    @property
+    def balance(self) -> float:
+        return self.balance_lamports / LAMPORTS_PER_SOL
+
+    @staticmethod
+    def encode(record: TransactionRecord) -> bytes:
+        """Encode a completed transfer as a ledger entry"""
+        tx_id = record.transaction_id.encode('utf-8')
+        recipient = record.recipient.encode('utf-8')[:255]
+        message = record.message.encode('utf-8')[:65535]
+
+        body = ENTRY_BODY.pack(
+            record.epoch, to_lamports(record.amount), to_lamports(record.balance_after),
+            len(tx_id), len(recipient), len(message)
+        ) + tx_id + recipient + message
+        return ENTRY_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+    def recover(self) -> Iterator[TransactionRecord]:
+        """Open the ledger, yielding the transfers not covered by the snapshot
+
+        Transfers covered by a valid snapshot are loaded into `snapshot`
+        without being decoded from the ledger; the entries after it are
+        CRC-checked and a torn tail from a crash is truncated. Without a
+        usable snapshot every entry is replayed. Once the iterator is
+        exhausted, `balance_lamports` and `entries` reflect the ledger and the file is
+        open for appends.
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'wb') as f:
+                f.write(FILE_HEADER.pack(FILE_MAGIC, self.initial_lamports))
+                f.flush()
+                os.fsync(f.fileno())
+            self._remove_segments(0)
+            self._open_for_append(FILE_HEADER.size)
+            return
+
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise LedgerError(f"Ledger {self.path} is truncated")
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, initial_lamports = FILE_HEADER.unpack_from(mm, 0)
+                if magic != FILE_MAGIC:
+                    raise LedgerError(f"{self.path} is not a transaction ledger")
+
+                self.initial_lamports = initial_lamports
+                offset, entries, balance = self._load_snapshot(size)
+                unpack_header = ENTRY_HEADER.unpack_from
+                unpack_body = ENTRY_BODY.unpack_from
+                body_size = ENTRY_BODY.size
+
+                while offset + ENTRY_HEADER.size <= size:
+                    length, crc = unpack_header(mm, offset)
+                    start = offset + ENTRY_HEADER.size
+                    end = start + length
+                    if end > size:
+                        break
+                    body = mm[start:end]
+                    if zlib.crc32(body) != crc:
+                        break
+
+                    epoch, amount, balance_after, tx_len, recipient_len, message_len = unpack_body(body, 0)
+                    pos = body_size + tx_len
+                    tx_id = body[body_size:pos].decode('utf-8')
+                    recipient = body[pos:pos + recipient_len].decode('utf-8')
+                    message = body[pos + recipient_len:].decode('utf-8')
+
+                    balance -= amount
+                    entries += 1
+                    offset = end
+
+                    record = TransactionRecord(tx_id, amount / LAMPORTS_PER_SOL, recipient, message, epoch,
+                                               balance_after / LAMPORTS_PER_SOL)
+                    self._unsegmented.append(record)
+                    yield record
+
+        self.balance_lamports = balance
+        self.entries = entries
+        self._open_for_append(offset)
+
+    def _segment_path(self, index: int) -> str:
+        return f"{self.snapshot_path}.{index:06d}"
+
+    def _load_snapshot(self, ledger_size: int) -> Tuple[int, int, int]:
+        """Load a valid snapshot into `snapshot`; return the (offset, entries, lamports) to replay from"""
+        start = (FILE_HEADER.size, 0, self.initial_lamports)
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read(SNAPSHOT.size)
+        except FileNotFoundError:
+            return start
+
+        if len(data) != SNAPSHOT.size:
+            return start
+        magic, offset, entries, balance, segments, crc = SNAPSHOT.unpack(data)
+        if magic != SNAPSHOT_MAGIC or crc != zlib.crc32(data[:-4]) or offset > ledger_size:
+            return start
+
+        snapshot = FrozenTransactions()
+        for index in range(segments):
+            columns = self._read_segment(index, len(snapshot))
+            if columns is None:
+                return start
+            snapshot.extend(columns)
+        if len(snapshot) != entries:
+            return start
+
+        self.snapshot = snapshot
+        self._segments = segments
+        # Segments past the manifest belong to a snapshot that never completed
+        self._remove_segments(segments)
+        return offset, entries, balance
+
+    def _read_segment(self, index: int, first_entry: int):
+        try:
+            with open(self._segment_path(index), 'rb') as f:
+                header = f.read(SEGMENT.size)
+                if len(header) != SEGMENT.size:
+                    return None
+                magic, first, count, length, crc = SEGMENT.unpack(header)
+                payload = f.read(length)
+        except FileNotFoundError:
+            return None
+        if magic != SEGMENT_MAGIC or first != first_entry or len(payload) != length or zlib.crc32(payload) != crc:
+            return None
+        try:
+            return self._decode_segment(payload, count)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _encode_segment(columns: Dict[str, Any]) -> bytes:
+        """Serialize FrozenTransactions.columns as a segment payload"""
+        strings = json.dumps({
+            'ids': columns['ids'],
+            'recipient_names': columns['recipient_names'],
+            'messages': columns['messages'],
+            'epoch_range': list(columns['epoch_range']),
+            'by_recipient': [len(columns['by_recipient'][name]) for name in columns['recipient_names']],
+        }, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+        parts = [SEGMENT_STRINGS.pack(len(strings)), strings]
+        arrays = [columns[key] for key, _ in NUMERIC_COLUMNS]
+        arrays.extend(columns['by_recipient'][name] for name in columns['recipient_names'])
+        for values in arrays:
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            parts.append(values.tobytes())
+        return b''.join(parts)
+
+    @staticmethod
+    def _decode_segment(payload: bytes, count: int) -> Dict[str, Any]:
+        """Inverse of _encode_segment; raises ValueError on a malformed payload"""
+        view = memoryview(payload)
+        if len(view) < SEGMENT_STRINGS.size:
+            raise ValueError("segment payload truncated")
+        strings_len, = SEGMENT_STRINGS.unpack_from(view, 0)
+        pos = SEGMENT_STRINGS.size + strings_len
+        try:
+            strings = json.loads(bytes(view[SEGMENT_STRINGS.size:pos]).decode('utf-8'))
+        except UnicodeDecodeError as e:
+            raise ValueError(str(e)) from e
+
+        def take(typecode: str, n: int) -> array:
+            nonlocal pos
+            values = array(typecode)
+            end = pos + n * values.itemsize
+            if end > len(view):
+                raise ValueError("segment payload truncated")
+            values.frombytes(view[pos:end])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            pos = end
+            return values
+
+        columns = {key: take(typecode, count) for key, typecode in NUMERIC_COLUMNS}
+        names = strings['recipient_names']
+        columns['by_recipient'] = {name: take('I', n) for name, n in zip(names, strings['by_recipient'])}
+        if pos != len(view) or len(strings['ids']) != count or len(strings['messages']) != count:
+            raise ValueError("segment columns do not match the entry count")
+
+        columns.update(ids=strings['ids'], recipient_names=names, messages=strings['messages'],
+                       epoch_range=tuple(strings['epoch_range']))
+        return columns
+
+    def _remove_segments(self, keep: int) -> None:
+        for path in glob.glob(glob.escape(self.snapshot_path) + '.[0-9]*'):
+            suffix = path.rsplit('.', 1)[-1]
+            if suffix.isdigit() and int(suffix) >= keep:
+                os.remove(path)
+
+    def _open_for_append(self, offset: int) -> None:
+        """Open the ledger for appends, dropping anything past the last good entry"""
+        self._fd = os.open(self.path, os.O_WRONLY)
+        if os.fstat(self._fd).st_size > offset:
+            os.ftruncate(self._fd, offset)
+            os.fsync(self._fd)
+        os.lseek(self._fd, offset, os.SEEK_SET)
+        self.offset = offset
+
+    async def append(self, records: List[TransactionRecord]) -> None:
+        """Append transfers and wait until they are durable
+
+        Appends arriving within `commit_interval` share a single write and fsync.
+        """
+        for record in records:
+            self._buffer.append(self.encode(record))
+            self._buffered_amount += to_lamports(record.amount)
+        self._buffered_entries += len(records)
+        self._buffered_records.extend(records)
+
+        if self._commit_future is None:
+            loop = asyncio.get_running_loop()
+            if self._commit_lock is None:
+                self._commit_lock = asyncio.Lock()
+            self._commit_future = loop.create_future()
+            task = loop.create_task(self._group_commit(self._commit_future))
+            self._commit_tasks.add(task)
+            task.add_done_callback(self._commit_tasks.discard)
+
+        await self._commit_future
+
+    def _take_buffer(self):
+        """Swap the buffer out; later appends start the next group"""
+        taken = (b''.join(self._buffer), self._buffered_amount, self._buffered_entries, self._buffered_records)
+        self._buffer = []
+        self._buffered_amount = 0
+        self._buffered_entries = 0
+        self._buffered_records = []
+        return taken
+
+    def _committed(self, data: bytes, lamports: int, count: int, records: List[TransactionRecord]) -> None:
+        self.offset += len(data)
+        self.entries += count
+        self.balance_lamports -= lamports
+        self._unsegmented.extend(records)
+
+    def _rollback(self) -> None:
+        """Drop a partially written group so the file ends at the last good entry"""
+        try:
+            os.ftruncate(self._fd, self.offset)
+            os.lseek(self._fd, self.offset, os.SEEK_SET)
+        except OSError:
+            pass
+
+    async def _group_commit(self, future) -> None:
+        """Write and fsync everything buffered for one commit group"""
+        await asyncio.sleep(self.commit_interval)
+
+        async with self._commit_lock:
+            if future.done():
+                # Already settled by close()
+                return
+            data, amount, count, records = self._take_buffer()
+            self._commit_future = None
+
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write_and_sync, data)
+            except Exception as e:
+                self._rollback()
+                future.set_exception(e)
+                return
+
+            self._committed(data, amount, count, records)
+            if len(self._unsegmented) >= self.snapshot_every:
+                segment = self._take_segment()
+                try:
+                    await loop.run_in_executor(None, self._write_snapshot, *segment)
+                except Exception as e:
+                    # The ledger entries are durable; the next snapshot covers them instead
+                    logger.warning(f"Ledger snapshot failed: {e}")
+                    self._unsegmented = segment[-1] + self._unsegmented
+                    self._segments -= 1
+
+            future.set_result(None)
+
+    def _take_segment(self):
+        records, self._unsegmented = self._unsegmented, []
+        self._segments += 1
+        return self.offset, self.entries, self.balance_lamports, self._segments, records
+
+    def _write_and_sync(self, data: bytes) -> None:
+        """Blocking write plus fsync, run off the event loop"""
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        os.fsync(self._fd)
+
+    @staticmethod
+    def _write_atomically(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _write_snapshot(self, offset: int, entries: int, balance: int, segments: int,
+                        records: List[TransactionRecord]) -> None:
+        """Write the records as segment `segments - 1`, then point the manifest past them"""
+        payload = self._encode_segment(FrozenTransactions.columns(records))
+        header = SEGMENT.pack(SEGMENT_MAGIC, entries - len(records), len(records), len(payload), zlib.crc32(payload))
+        self._write_atomically(self._segment_path(segments - 1), header + payload)
+
+        body = SNAPSHOT.pack(SNAPSHOT_MAGIC, offset, entries, balance, segments, 0)[:-4]
+        self._write_atomically(self.snapshot_path, body + struct.pack('<I', zlib.crc32(body)))
+
+    async def aclose(self) -> None:
+        """Wait for a group commit in progress, then close"""
+        if self._commit_lock is not None:
+            async with self._commit_lock:
+                self.close()
+        else:
+            self.close()
+
+    def close(self) -> None:
+        """Write anything still buffered, settle waiting appends, snapshot a long tail and close
+
+        Appends waiting on the buffered group are resolved once it is durable,
+        or fail with the write error. Call aclose from the event loop so a
+        group already being written finishes first.
+        """
+        if self._fd is None:
+            return
+        future, self._commit_future = self._commit_future, None
+        for task in self._commit_tasks:
+            task.cancel()
+
+        error = None
+        if self._buffer:
+            data, amount, count, records = self._take_buffer()
+            try:
+                self._write_and_sync(data)
+                self._committed(data, amount, count, records)
+            except Exception as e:
+                self._rollback()
+                error = e
+        if future is not None and not future.done():
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+        try:
+            if (self._unsegmented and self.close_snapshot_min is not None
+                    and len(self._unsegmented) >= self.close_snapshot_min):
+                self._write_snapshot(*self._take_segment())
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        if error is not None:
+            raise error
@@ -7,11 +7,13 @@ Executes simulated SOL transfers for validated tips
 import asyncio
 import os
 import json
+import math
 import time
 import uuid
+import random
 import logging
-from typing import Dict, Any
-from datetime import datetime
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
 from langchain.chat_models import init_chat_model
@@ -19,6 +21,14 @@ from langchain.prompts import ChatPromptTemplate
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 
+from balance import BalanceAccount, Hold, LAMPORTS_PER_SOL, to_lamports
+from coral_io import message_type, parse_mentions, parse_validated_tip, tools_by_name
+from idempotency import IdempotencyCache, idempotency_key, message_key
+from ledger import TransactionLedger
+from scheduler import TipScheduler
+from solana_rpc import SolanaRpcClient, TransferOutcomeUnknown
+from transaction_store import TransactionRecord, TransactionStore
+
 # Load environment variables
 load_dotenv()
 
@@ -33,60 +43,360 @@ class MockTransactionExecutor:
     """Simulated SOL transaction executor"""
     
     def __init__(self):
-        self.transaction_history = []
-        self.balance = float(os.getenv('INITIAL_BALANCE', '100.0'))
+        self.transaction_history = TransactionStore(
+            bucket_seconds=int(os.getenv('TX_INDEX_BUCKET_S', '60'))
+        )
+        self.account = BalanceAccount(float(os.getenv('INITIAL_BALANCE', '100.0')))
+        self.max_in_flight = int(os.getenv('TX_MAX_IN_FLIGHT', '8'))
+        self.latency_distribution = os.getenv('TX_LATENCY_DISTRIBUTION', 'fixed').lower()
+        self.latency_mean = float(os.getenv('TX_LATENCY_MEAN_S', '2.0'))
+        self.latency_jitter = float(os.getenv('TX_LATENCY_JITTER_S', '0.5'))
+        self.in_flight = 0
+        self._semaphore = None
+        self._in_flight_keys = {}
+        # Transfers that may or may not have landed, by pending ID, and the idempotency keys they answer
+        self.unknown_transfers: Dict[str, Dict[str, Any]] = {}
+        self._unknown_keys: Dict[str, str] = {}
+        self.idempotency_cache = IdempotencyCache(
+            max_entries=int(os.getenv('TX_IDEMPOTENCY_MAX_KEYS', '10000')),
+            ttl_seconds=float(os.getenv('TX_IDEMPOTENCY_TTL_S', '600'))
+        )
+        
+        if self.latency_distribution not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown TX_LATENCY_DISTRIBUTION: {self.latency_distribution}")
+        
+        # Send transfers through a Solana RPC endpoint instead of simulating them
+        self.rpc = None
+        rpc_url = os.getenv('SOLANA_RPC_URL', '')
+        if rpc_url:
+            self.rpc = SolanaRpcClient(
+                rpc_url,
+                confirm_timeout=float(os.getenv('TX_RPC_CONFIRM_TIMEOUT_S', '30')),
+                max_retries=int(os.getenv('TX_RPC_MAX_RETRIES', '3'))
+            )
+        
+        # Persist completed transfers; an empty path keeps state in memory only
+        self.ledger = None
+        ledger_path = os.getenv('TX_LEDGER_PATH', '')
+        if ledger_path:
+            self.ledger = TransactionLedger(
+                ledger_path,
+                initial_balance=self.account.balance,
+                commit_interval=float(os.getenv('TX_LEDGER_COMMIT_MS', '5')) / 1000,
+                snapshot_every=int(os.getenv('TX_LEDGER_SNAPSHOT_EVERY', '100000')),
+                close_snapshot_min=int(os.getenv('TX_LEDGER_CLOSE_SNAPSHOT_MIN', '10000'))
+            )
+            self._recover_from_ledger()
+        
+    def _recover_from_ledger(self):
+        """Rebuild balance and transaction history from the ledger"""
+        started = time.perf_counter()
+        
+        tail = list(self.ledger.recover())
+        # Snapshotted transactions stay columnar; only the replayed tail becomes records up front
+        self.transaction_history = TransactionStore(self.transaction_history.bucket_seconds, base=self.ledger.snapshot)
+        for record in tail:
+            self.transaction_history.add(record)
+        
+        self.account = BalanceAccount.from_lamports(self.ledger.balance_lamports)
         
-    def execute_tip(self, tip_data: Dict[str, Any]) -> Dict[str, Any]:
+        if self.ledger.entries:
+            elapsed = time.perf_counter() - started
+            print(f"📒 Recovered {self.ledger.entries} transactions from {self.ledger.path} in {elapsed:.2f}s "
+                  f"({len(tail)} replayed after the snapshot)")
+        
+    def _sample_latency(self) -> float:
+        """Draw a simulated network latency in seconds"""
+        mean = self.latency_mean
+        jitter = self.latency_jitter
+        
+        if self.latency_distribution == 'uniform':
+            latency = random.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == 'normal':
+            latency = random.gauss(mean, jitter)
+        elif self.latency_distribution == 'lognormal' and mean > 0:
+            # Parametrized so the distribution mean stays at `mean`
+            latency = random.lognormvariate(math.log(mean) - jitter ** 2 / 2, jitter)
+        else:
+            latency = mean
+        
+        return max(0.0, latency)
+    
+    async def execute_tip(self, tip_data: Dict[str, Any]) -> Dict[str, Any]:
         """Simulate SOL transaction execution"""
-        amount = tip_data['amount']
-        recipient = tip_data['recipient']
-        message = tip_data.get('message', '')
+        results = await self.execute_tips([tip_data])
+        return results[0]
+    
+    async def execute_tips(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute a batch of tips, coalescing tips to the same recipient
         
-        print(f"🔄 Executing transaction: {amount} SOL → @{recipient}")
+        Returns one result per tip, in the order the tips were given. Tips
+        whose idempotency key has already been executed (or is executing)
+        return that earlier result instead of transferring again; so do tips
+        whose earlier transfer has an unknown outcome, until
+        reconcile_transfer settles it. Each
+        recipient group settles on its own: a group that raises fails only
+        its own tips, while the others keep (and cache) their results.
+        """
+        loop = asyncio.get_running_loop()
+        results = [None] * len(batch)
+        groups = defaultdict(list)
+        owned = {}
+        waiting = []
         
-        # Simulate processing time
-        time.sleep(2)
+        for index, tip_data in enumerate(batch):
+            key = idempotency_key(tip_data)
+            if key is not None:
+                if key in self._unknown_keys:
+                    results[index] = dict(self.unknown_transfers[self._unknown_keys[key]]['result'], duplicate=True)
+                    continue
+                cached = self.idempotency_cache.get(key)
+                if cached is not None:
+                    results[index] = dict(cached, duplicate=True)
+                    continue
+                if key in self._in_flight_keys:
+                    waiting.append((index, self._in_flight_keys[key]))
+                    continue
+                self._in_flight_keys[key] = loop.create_future()
+                owned[index] = key
+            groups[tip_data['recipient']].append(index)
         
-        # Check balance
-        if amount > self.balance:
-            return {
-                'success': False,
-                'error': f'Insufficient balance. Required: {amount} SOL, Available: {self.balance} SOL',
-                'transaction_id': None
-            }
+        try:
+            group_results = await asyncio.gather(*(
+                self._execute_group([batch[i] for i in indexes]) for indexes in groups.values()
+            ), return_exceptions=True)
+        except BaseException as e:
+            # Cancelled while the groups ran
+            for key in owned.values():
+                self._fail_key(key, e)
+            raise
+        
+        for indexes, group_result in zip(groups.values(), group_results):
+            if isinstance(group_result, BaseException):
+                logger.error(f"Tips to @{batch[indexes[0]]['recipient']} failed: {group_result!r}")
+                for index in indexes:
+                    if index in owned:
+                        self._fail_key(owned.pop(index), group_result)
+                    results[index] = {
+                        'success': False,
+                        'error': f'Transaction error: {group_result}',
+                        'transaction_id': None
+                    }
+                continue
+            for index, result in zip(indexes, group_result):
+                results[index] = result
+        
+        for index, key in owned.items():
+            # Only successful transfers are cached; failures may be retried,
+            # and transfers of unknown outcome wait for reconcile_transfer
+            if results[index]['success']:
+                self.idempotency_cache.put(key, results[index])
+            elif results[index].get('status') == 'unknown':
+                self._unknown_keys[key] = results[index]['pending_id']
+                self.unknown_transfers[results[index]['pending_id']]['key'] = key
+            self._in_flight_keys.pop(key).set_result(results[index])
+        
+        for index, future in waiting:
+            try:
+                results[index] = dict(await asyncio.shield(future), duplicate=True)
+            except Exception as e:
+                results[index] = {'success': False, 'error': f'Transaction error: {e}', 'transaction_id': None}
+        
+        return results
+    
+    def _fail_key(self, key: str, error: BaseException) -> None:
+        """Fail the duplicates waiting on an idempotency key, leaving it free for a retry"""
+        future = self._in_flight_keys.pop(key)
+        future.set_exception(error)
+        # Mark retrieved so an unawaited duplicate does not log a warning
+        future.exception()
+    
+    async def _execute_group(self, tips: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute tips to a single recipient under one balance hold"""
+        recipient = tips[0]['recipient']
+        results = [None] * len(tips)
+        admitted = []
+        
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        
+        # One balance check and one hold for the whole group, without
+        # yielding, so concurrent transfers never overspend. Tips are
+        # admitted in order while they fit.
+        available = self.account.available_lamports
+        for index, tip_data in enumerate(tips):
+            amount = tip_data['amount']
+            if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount <= 0:
+                results[index] = {
+                    'success': False,
+                    'error': f'Invalid amount: {amount!r}',
+                    'transaction_id': None
+                }
+                continue
+            lamports = to_lamports(amount)
+            if lamports > available:
+                results[index] = {
+                    'success': False,
+                    'error': f'Insufficient balance. Required: {amount} SOL, '
+                             f'Available: {available / LAMPORTS_PER_SOL} SOL',
+                    'transaction_id': None
+                }
+                continue
+            available -= lamports
+            admitted.append((index, tip_data))
+        
+        if not admitted:
+            return results
+        
+        hold = self.account.reserve_lamports(self.account.available_lamports - available)
+        
+        if len(admitted) == 1:
+            print(f"🔄 Executing transaction: {hold.amount} SOL → @{recipient}")
+        else:
+            print(f"🔄 Executing {len(admitted)} transactions: {hold.amount} SOL → @{recipient}")
+        try:
+            # Each transfer settles its part of the hold as it completes
+            outcomes = await self._transfer(recipient, [tip_data['amount'] for _, tip_data in admitted], hold)
+        finally:
+            # Return what failed, or everything not yet settled if cancelled mid-flight
+            self.account.release(hold)
+        
+        completed_at = time.time()
+        completed = []
+        
+        for (index, tip_data), outcome in zip(admitted, outcomes):
+            if isinstance(outcome, TransferOutcomeUnknown):
+                results[index] = self._hold_unknown(tip_data, outcome)
+                continue
+            if isinstance(outcome, BaseException):
+                results[index] = {
+                    'success': False,
+                    'error': f'Transfer failed: {outcome}',
+                    'transaction_id': None
+                }
+                continue
+            
+            tx_id, balance_after = outcome
+            record = TransactionRecord(
+                tx_id, tip_data['amount'], recipient, tip_data.get('message', ''),
+                completed_at, balance_after
+            )
+            completed.append(record)
+            results[index] = record.to_dict()
+        
+        # Make the transfers durable before anyone is told they happened
+        if self.ledger is not None:
+            await self.ledger.append(completed)
+        
+        for record in completed:
+            # Record transaction
+            self.transaction_history.add(record)
+            print(f"✅ Transaction completed: {record.transaction_id}")
         
-        # Generate mock transaction ID
-        tx_id = f"mock_tx_{uuid.uuid4().hex[:8]}"
-        
-        # Simulate transaction execution
-        self.balance -= amount
-        
-        transaction_result = {
-            'success': True,
-            'transaction_id': tx_id,
-            'amount': amount,
-            'recipient': recipient,
-            'message': message,
-            'timestamp': datetime.utcnow().isoformat(),
-            'explorer_url': f"https://explorer.solana.com/tx/{tx_id}?cluster=devnet",
-            'balance_after': self.balance
+        return results
+    
+    async def _transfer(self, recipient: str, amounts: List[float], hold: Hold) -> List[Any]:
+        """Move funds for each amount, settling it from `hold` as it completes
+        
+        Returns (transaction ID, settled balance just after it) or the
+        exception per transfer. Every call to the network holds one of the
+        `max_in_flight` slots: the simulated group takes one, and each RPC
+        transfer takes its own.
+        """
+        if self.rpc is None:
+            async with self._semaphore:
+                self.in_flight += 1
+                try:
+                    # Simulate network latency without blocking the event loop
+                    await asyncio.sleep(self._sample_latency())
+                finally:
+                    self.in_flight -= 1
+            return [self._settle(hold, to_lamports(amount), f"mock_tx_{uuid.uuid4().hex[:8]}") for amount in amounts]
+        
+        return await asyncio.gather(
+            *(self._rpc_transfer(recipient, to_lamports(amount), hold) for amount in amounts),
+            return_exceptions=True
+        )
+    
+    async def _rpc_transfer(self, recipient: str, lamports: int, hold: Hold) -> Tuple[str, float]:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                signature = await self.rpc.transfer(recipient, lamports)
+            except TransferOutcomeUnknown as e:
+                # It may still land: its funds stay reserved until it is reconciled
+                e.hold = self.account.split(hold, lamports)
+                raise
+            finally:
+                self.in_flight -= 1
+        return self._settle(hold, lamports, signature)
+    
+    def _settle(self, hold: Hold, lamports: int, tx_id: str) -> Tuple[str, float]:
+        self.account.settle(hold, lamports)
+        return tx_id, self.account.balance
+    
+    def _hold_unknown(self, tip_data: Dict[str, Any], error: TransferOutcomeUnknown) -> Dict[str, Any]:
+        """Keep a transfer of unknown outcome pending, with its own hold, and describe it"""
+        pending_id = f"pending_{uuid.uuid4().hex[:8]}"
+        result = {
+            'success': False,
+            'status': 'unknown',
+            'pending_id': pending_id,
+            'signature': error.signature,
+            'error': f'Transfer outcome unknown, it may still land; do not retry it: {error}',
+            'transaction_id': None
         }
+        self.unknown_transfers[pending_id] = {'tip': tip_data, 'hold': error.hold, 'key': None, 'result': result}
+        logger.warning(f"Transfer {pending_id} to @{tip_data['recipient']} has an unknown outcome: {error}")
+        return result
+    
+    async def reconcile_transfer(self, pending_id: str, transaction_id: Optional[str]) -> Dict[str, Any]:
+        """Settle a transfer whose outcome was unknown, once it has been looked up on chain
         
-        # Record transaction
-        self.transaction_history.append(transaction_result)
+        With the ID it landed under, its hold is committed and the transfer
+        recorded and cached under its idempotency key. With None, it never
+        landed: the hold is released and the tip may be retried.
+        """
+        entry = self.unknown_transfers.pop(pending_id)
+        key = entry['key']
+        if key is not None:
+            self._unknown_keys.pop(key, None)
+        tip_data = entry['tip']
         
-        print(f"✅ Transaction completed: {tx_id}")
-        return transaction_result
+        if transaction_id is None:
+            self.account.release(entry['hold'])
+            return {'success': False, 'error': 'Transfer did not land', 'transaction_id': None}
+        
+        self.account.commit(entry['hold'])
+        record = TransactionRecord(
+            transaction_id, tip_data['amount'], tip_data['recipient'], tip_data.get('message', ''),
+            time.time(), self.account.balance
+        )
+        if self.ledger is not None:
+            await self.ledger.append([record])
+        self.transaction_history.add(record)
+        result = record.to_dict()
+        if key is not None:
+            self.idempotency_cache.put(key, result)
+        return result
+    
+    async def close(self):
+        """Release the RPC connections and flush the ledger"""
+        if self.rpc is not None:
+            await self.rpc.close()
+        if self.ledger is not None:
+            await self.ledger.aclose()
     
     def get_transaction_status(self, transaction_id: str) -> Dict[str, Any]:
         """Get transaction status"""
-        for tx in self.transaction_history:
-            if tx['transaction_id'] == transaction_id:
-                return {
-                    'found': True,
-                    'confirmed': tx['success'],
-                    'details': tx
-                }
+        tx = self.transaction_history.get(transaction_id)
+        if tx is not None:
+            return {
+                'found': True,
+                'confirmed': tx.success,
+                'details': tx.to_dict()
+            }
         
         return {
             'found': False,
@@ -94,9 +404,18 @@ class MockTransactionExecutor:
             'error': 'Transaction not found'
         }
     
+    def get_recent_transactions(self, recipient: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the most recent transactions for a recipient"""
+        return [record.to_dict() for record in self.transaction_history.recent_for_recipient(recipient, limit)]
+    
+    @property
+    def balance(self) -> float:
+        """Balance available to new transfers (settled minus open holds)"""
+        return self.account.available
+    
     def get_balance(self) -> float:
         """Get current balance"""
-        return self.balance
+        return self.account.available
 
 def load_config() -> Dict[str, Any]:
     """Load configuration from environment variables"""
@@ -109,6 +428,9 @@ def load_config() -> Dict[str, Any]:
         "model_temperature": float(os.getenv("MODEL_TEMPERATURE", "0.1")),
         "model_max_tokens": int(os.getenv("MODEL_MAX_TOKENS", "4000")),
         "timeout_ms": float(os.getenv("TIMEOUT_MS", "60000")),
+        "mention_timeout_ms": int(os.getenv("MENTION_TIMEOUT_MS", "30000")),
+        "notification_agent_id": os.getenv("NOTIFICATION_AGENT_ID", "notification"),
+        "validation_agent_id": os.getenv("VALIDATION_AGENT_ID", "validation"),
     }
     
     # Validate required fields
@@ -146,24 +468,22 @@ Your responsibilities:
 
 Available Coral tools: {coral_tools_description}
 
+Tips validated by the validation agent are executed automatically before they
+reach you; nothing else is ever executed. You only receive the remaining
+mentions. They are listed in the input with their threadId and senderId; do not
+call wait_for_mentions for them.
+
 Process flow:
-1. Use wait_for_mentions to receive validated tip data
-2. Execute the SOL transfer (simulated)
-3. Generate transaction ID and confirmation
-4. Create thread with notification agent
-5. Send transaction result to notification agent
-6. Respond back to sender with transaction details
-
-Transaction execution:
-- Check balance before execution
-- Generate unique transaction ID
-- Simulate processing time
-- Update balance after execution
-- Record transaction in history
+1. Read each mention in the input
+2. If it asks for a tip to be sent, reply in the same thread with send_message
+   that tips must go to the validation agent, which forwards valid tips here
+3. Otherwise answer the sender's question about transactions briefly
+4. Always mention the sender in your reply
 
 Always provide detailed transaction information in responses.
 """
         ),
+        ("human", "{input}"),
         ("placeholder", "{agent_scratchpad}")
     ])
     
@@ -181,6 +501,77 @@ Always provide detailed transaction information in responses.
     agent = create_tool_calling_agent(model, coral_tools, prompt)
     return AgentExecutor(agent=agent, tools=coral_tools, verbose=True)
 
+async def process_tip_mention(scheduler: TipScheduler, send_message, mention: Dict[str, str],
+                              tip_data: Dict[str, Any], notification_agent_id: str) -> None:
+    """Execute a structured tip and reply with send_message, without the LLM"""
+    try:
+        result = await scheduler.submit(tip_data)
+    except Exception as e:
+        logger.error(f"Transaction error: {e}")
+        result = {'success': False, 'error': f'Transaction error: {e}', 'transaction_id': None}
+    
+    # tip_id lets a requester with several tips in flight match this result to its tip
+    content = json.dumps({'type': 'transaction_result', 'tip_id': tip_data.get('tip_id'), 'tip': tip_data,
+                          'result': result}, default=str)
+    # The validation agent, the notification agent and whoever asked validation for the tip
+    requester = tip_data.get('requested_by')
+    mentions = [agent for agent in (mention['senderId'], notification_agent_id, requester) if agent]
+    mentions = list(dict.fromkeys(mentions))
+    
+    try:
+        await send_message.ainvoke({'threadId': mention['threadId'], 'content': content, 'mentions': mentions})
+    except Exception as e:
+        if len(mentions) < 2:
+            raise
+        # The notification agent may not be in this thread; reply to the sender alone
+        logger.warning(f"Reply with notification mention failed ({e}), retrying sender only")
+        await send_message.ainvoke({'threadId': mention['threadId'], 'content': content, 'mentions': mentions[:1]})
+
+# Messages that never lead to a transfer and need no reply
+IGNORED_TYPES = ('validation_result', 'transaction_result')
+
+def log_task_error(task: asyncio.Task) -> None:
+    """Done callback for tip tasks, which nothing awaits: log what they raised"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Tip task failed: {task.exception()!r}", exc_info=task.exception())
+
+def dispatch_mentions(mentions: List[Dict[str, str]], scheduler: TipScheduler, send_message,
+                      config: Dict[str, Any], tasks: set) -> List[Dict[str, str]]:
+    """Start a task for every validated tip and return the mentions that are not one
+
+    Only validated_tip messages from the validation agent are executed; a
+    validated_tip from anyone else is dropped.
+    """
+    unparsed = []
+    for mention in mentions:
+        if message_type(mention['content']) in IGNORED_TYPES:
+            continue
+        tip_data = parse_validated_tip(mention['content'])
+        if tip_data is None:
+            unparsed.append(mention)
+            continue
+        if mention.get('senderId') != config["validation_agent_id"]:
+            logger.warning(f"Ignoring validated_tip from {mention.get('senderId')}, "
+                           f"only {config['validation_agent_id']} may send tips for execution")
+            continue
+        
+        # Keep retries of the same message from paying out twice when the tip has no key of its own
+        if idempotency_key(tip_data) is None and message_key(mention):
+            tip_data['idempotency_key'] = message_key(mention)
+        
+        task = asyncio.ensure_future(process_tip_mention(
+            scheduler, send_message, mention, tip_data, config["notification_agent_id"]
+        ))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        task.add_done_callback(log_task_error)
+    return unparsed
+
+def looks_like_messages(raw: Any) -> bool:
+    """Whether an unparsed wait_for_mentions result still seems to carry messages"""
+    text = str(raw or '').lower()
+    return 'sender' in text and 'thread' in text
+
 async def main():
     """Main transaction agent loop"""
     print("💸 Starting Transaction Agent")
@@ -208,23 +599,51 @@ async def main():
         # Create transaction agent
         agent_executor = await create_transaction_agent(coral_tools)
         executor = MockTransactionExecutor()
+        scheduler = TipScheduler(executor)
+        scheduler.start()
+        
+        tools = tools_by_name(coral_tools)
+        wait_for_mentions = tools["wait_for_mentions"]
+        send_message = tools["send_message"]
+        tip_tasks = set()
         
         print("🎯 Transaction agent ready!")
         
-        # Main transaction loop
-        while True:
-            try:
-                # Listen for transaction requests
-                await agent_executor.ainvoke({
-                    "input": "Listen for validated tips and execute transactions",
-                    "agent_scratchpad": []
-                })
-                await asyncio.sleep(5)
-                
-            except Exception as e:
-                print(f"❌ Transaction error: {e}")
-                logger.error(f"Transaction error: {e}")
-                await asyncio.sleep(10)
+        try:
+            # Main transaction loop
+            while True:
+                try:
+                    # Listen for transaction requests
+                    raw = await wait_for_mentions.ainvoke({"timeoutMs": config["mention_timeout_ms"]})
+                    mentions = parse_mentions(raw)
+                    
+                    # Fast path: structured tips go straight to the executor
+                    unparsed = dispatch_mentions(mentions, scheduler, send_message, config, tip_tasks)
+                    
+                    # The LLM only handles what the fast path could not parse
+                    if unparsed:
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {json.dumps(unparsed)}",
+                            "agent_scratchpad": []
+                        })
+                    elif not mentions and looks_like_messages(raw):
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {raw}",
+                            "agent_scratchpad": []
+                        })
+                    
+                except Exception as e:
+                    print(f"❌ Transaction error: {e}")
+                    logger.error(f"Transaction error: {e}")
+                    await asyncio.sleep(10)
+        finally:
+            # Tips still queued would otherwise wait forever on stopped workers
+            for task in tip_tasks:
+                task.cancel()
+            await asyncio.gather(*tip_tasks, return_exceptions=True)
+            await scheduler.stop()
+            # Closes RPC connections and flushes the ledger
+            await executor.close()
                 
     except Exception as e:
         print(f"💥 Fatal error in transaction agent: {e}")
@@ -232,4 +651,4 @@ async def main():
         raise
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
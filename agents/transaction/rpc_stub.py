@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Local Solana RPC Stand-in
+JSON-RPC server implementing the transfer subset of the Solana RPC API with
+latency and failure injection, for load-testing the transaction agent
+"""
+
+import argparse
+import asyncio
+import base64
+import bisect
+import json
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from solana_rpc import b58encode
+
+SLOT_SECONDS = 0.4
+STATUS_RETENTION_SECONDS = 300
+
+
+class LatencyProfile:
+    """Latency distribution described by its percentiles
+
+    Samples by interpolating linearly between (0, 0), (0.5, p50), (0.95, p95),
+    (0.99, p99) and (1.0, 1.5 * p99).
+    """
+
+    def __init__(self, p50: float, p95: float, p99: float):
+        if not 0 <= p50 <= p95 <= p99:
+            raise ValueError("Latency percentiles must satisfy 0 <= p50 <= p95 <= p99")
+        self.quantiles = [0.0, 0.5, 0.95, 0.99, 1.0]
+        self.values = [0.0, p50, p95, p99, p99 * 1.5]
+
+    def sample(self) -> float:
+        u = random.random()
+        i = bisect.bisect_right(self.quantiles, u) - 1
+        q0, q1 = self.quantiles[i], self.quantiles[i + 1]
+        v0, v1 = self.values[i], self.values[i + 1]
+        return v0 + (v1 - v0) * (u - q0) / (q1 - q0)
+
+
+class RpcStub:
+    """In-memory chain stand-in answering getLatestBlockhash, sendTransaction
+    and getSignatureStatuses
+
+    Slots stand in for block heights. A transaction that would confirm after
+    its blockhash's lastValidBlockHeight never lands, as on a real cluster.
+    """
+
+    def __init__(self, response_latency: LatencyProfile, confirm_latency: LatencyProfile,
+                 error_rate: float = 0.0, drop_rate: float = 0.0, blockhash_valid_slots: int = 150):
+        self.response_latency = response_latency
+        self.confirm_latency = confirm_latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.blockhash_valid_slots = blockhash_valid_slots
+        # blockhash -> last slot a transaction signed over it can land in
+        self.blockhashes: Dict[str, int] = {}
+        self.started = time.monotonic()
+        # signature -> (landing time or None if dropped, slot it lands in)
+        self.signatures: Dict[str, Tuple[Optional[float], int]] = {}
+        self.counters = {'requests': 0, 'errors': 0, 'sent': 0, 'dropped': 0}
+        self._last_prune = time.monotonic()
+
+    def current_slot(self) -> int:
+        return int((time.monotonic() - self.started) / SLOT_SECONDS)
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one JSON-RPC request"""
+        self.counters['requests'] += 1
+        request_id = request.get('id')
+        method = request.get('method')
+        params = request.get('params') or []
+
+        await asyncio.sleep(self.response_latency.sample())
+
+        if random.random() < self.error_rate:
+            self.counters['errors'] += 1
+            return self._error(request_id, -32005, "Node is behind (injected failure)")
+
+        if method == 'getLatestBlockhash':
+            slot = self.current_slot()
+            blockhash = b58encode(os.urandom(32))
+            self.blockhashes[blockhash] = slot + self.blockhash_valid_slots
+            result = {
+                'context': {'slot': slot},
+                'value': {'blockhash': blockhash, 'lastValidBlockHeight': slot + self.blockhash_valid_slots}
+            }
+        elif method == 'getBlockHeight':
+            result = self.current_slot()
+        elif method == 'sendTransaction':
+            if not params or not isinstance(params[0], str):
+                return self._error(request_id, -32602, "Invalid params: expected encoded transaction")
+            result = self._accept_transaction(params[0])
+        elif method == 'getSignatureStatuses':
+            if not params or not isinstance(params[0], list):
+                return self._error(request_id, -32602, "Invalid params: expected signature list")
+            result = {'context': {'slot': self.current_slot()}, 'value': [self._status(s) for s in params[0]]}
+        elif method == 'getHealth':
+            result = 'ok'
+        else:
+            return self._error(request_id, -32601, f"Method not found: {method}")
+
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def _accept_transaction(self, encoded: str) -> str:
+        now = time.monotonic()
+        signature = b58encode(os.urandom(64))
+        self.counters['sent'] += 1
+
+        lands_at = now + self.confirm_latency.sample()
+        slot = int((lands_at - self.started) / SLOT_SECONDS)
+        if random.random() < self.drop_rate or slot > self._last_valid_slot(encoded):
+            # Accepted by the RPC node but never lands
+            self.counters['dropped'] += 1
+            self.signatures[signature] = (None, 0)
+        else:
+            self.signatures[signature] = (lands_at, slot)
+
+        if now - self._last_prune > STATUS_RETENTION_SECONDS:
+            self._prune(now)
+        return signature
+
+    def _last_valid_slot(self, encoded: str) -> float:
+        """lastValidBlockHeight of the blockhash a stand-in payload was signed over"""
+        try:
+            blockhash = json.loads(base64.b64decode(encoded)).get('blockhash')
+        except (ValueError, AttributeError):
+            return float('inf')
+        return self.blockhashes.get(blockhash, float('inf'))
+
+    def landed(self) -> int:
+        """Transactions that have landed or will land"""
+        return sum(1 for lands_at, _ in self.signatures.values() if lands_at is not None)
+
+    def _status(self, signature: str) -> Optional[Dict[str, Any]]:
+        entry = self.signatures.get(signature)
+        if entry is None or entry[0] is None or entry[0] > time.monotonic():
+            return None
+        return {'slot': entry[1], 'confirmations': None, 'err': None, 'confirmationStatus': 'confirmed'}
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - STATUS_RETENTION_SECONDS
+        self.signatures = {
+            sig: entry for sig, entry in self.signatures.items()
+            if entry[0] is not None and entry[0] >= cutoff
+        }
+        expired = self.current_slot() - int(STATUS_RETENTION_SECONDS / SLOT_SECONDS)
+        self.blockhashes = {h: last for h, last in self.blockhashes.items() if last >= expired}
+        self._last_prune = now
+
+    @staticmethod
+    def _error(request_id, code: int, message: str) -> Dict[str, Any]:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve keep-alive HTTP/1.1 JSON-RPC requests on one connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', '0')))
+                status, payload = await self._dispatch(request_line, body)
+
+                data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('ascii') + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request_line: bytes, body: bytes):
+        if not request_line.startswith(b'POST'):
+            return '405 Method Not Allowed', {'error': 'POST JSON-RPC requests only'}
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return '200 OK', self._error(None, -32700, "Parse error")
+
+        if isinstance(request, list):
+            return '200 OK', list(await asyncio.gather(*(self.handle(r) for r in request)))
+        return '200 OK', await self.handle(request)
+
+
+async def start_stub(host: str, port: int, stub: RpcStub) -> asyncio.AbstractServer:
+    """Start the stand-in server on the running loop"""
+    return await asyncio.start_server(stub.serve_connection, host, port)
+
+
+def parse_profile(values: List[float]) -> LatencyProfile:
+    """Build a LatencyProfile from p50/p95/p99 given in milliseconds"""
+    p50, p95, p99 = values
+    return LatencyProfile(p50 / 1000, p95 / 1000, p99 / 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local Solana RPC stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency-ms", type=float, nargs=3, default=[20, 60, 120],
+                        metavar=("P50", "P95", "P99"), help="RPC response latency percentiles")
+    parser.add_argument("--confirm-ms", type=float, nargs=3, default=[400, 900, 1600],
+                        metavar=("P50", "P95", "P99"), help="Time for a transaction to confirm")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with an error")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of transactions that never land")
+    parser.add_argument("--blockhash-valid-slots", type=int, default=150,
+                        help="Slots (of 0.4s) a blockhash stays valid for")
+    args = parser.parse_args()
+
+    stub = RpcStub(parse_profile(args.latency_ms), parse_profile(args.confirm_ms),
+                   error_rate=args.error_rate, drop_rate=args.drop_rate,
+                   blockhash_valid_slots=args.blockhash_valid_slots)
+    server = await start_stub(args.host, args.port, stub)
+    print(f"🧪 Solana RPC stand-in listening on http://{args.host}:{args.port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,234 @@
+"""
+Tip Scheduler
+Priority queue in front of the transaction executor with per-sender fairness
+and backpressure
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
+
+PRIORITY_LARGE = 0
+PRIORITY_RETRY = 1
+PRIORITY_INTERACTIVE = 2
+PRIORITY_BULK = 3
+
+PRIORITY_NAMES = ['large', 'retry', 'interactive', 'bulk']
+
+BULK_PLATFORMS = ('import', 'replay', 'bulk')
+
+# Dispatches older than this weigh less than 1/e in the dispatch rate
+RATE_WINDOW_S = 2.0
+
+
+class TipScheduler:
+    """Dispatches queued tips to the executor by priority class
+
+    Classes are served in strict priority order, except that a waiting lower
+    class is served once after `starvation_limit` consecutive dispatches from
+    higher classes. Within a class, senders are served round-robin so one
+    sender's burst only gets one slot per round. Queue depth is bounded
+    overall and per sender; a tip that does not fit is rejected immediately
+    with a backpressure result instead of waiting.
+
+    A worker takes the next tip plus, in the same order, up to
+    `batch_max_size - 1` more that are already waiting, and executes them
+    with one execute_tips call so tips to the same recipient share a
+    balance hold. A batch holds at most `batch_max_per_sender` tips from
+    any one sender, so a burst is spread over batches instead of filling
+    one that a later sender's tip has to wait behind.
+    """
+
+    def __init__(self, executor, workers: Optional[int] = None):
+        self.executor = executor
+        self.workers = workers or int(os.getenv('TX_SCHEDULER_WORKERS', str(executor.max_in_flight)))
+        self.max_depth = int(os.getenv('TX_QUEUE_MAX_DEPTH', '1000'))
+        self.max_per_sender = int(os.getenv('TX_QUEUE_MAX_PER_SENDER', '100'))
+        self.large_tip_amount = float(os.getenv('TX_LARGE_TIP_SOL', '10.0'))
+        self.starvation_limit = int(os.getenv('TX_QUEUE_STARVATION_LIMIT', '16'))
+        self.batch_max_size = max(1, int(os.getenv('TX_BATCH_MAX_SIZE', '200')))
+        self.batch_max_per_sender = max(1, int(os.getenv('TX_BATCH_MAX_PER_SENDER', '1')))
+
+        # One OrderedDict per class: sender -> deque of (tip, future, enqueued_at)
+        self._classes: List["OrderedDict[str, deque]"] = [OrderedDict() for _ in PRIORITY_NAMES]
+        self._class_depth = [0] * len(PRIORITY_NAMES)
+        self._sender_depth: Dict[str, int] = {}
+        self._depth = 0
+        self._streak = 0
+        self._items = None
+        self._tasks = []
+        self._dispatch_rate = 0.0
+        self._last_dispatch = None
+        self.rejected = 0
+        self.dispatched = 0
+
+    def classify(self, tip_data: Dict[str, Any]) -> int:
+        """Pick the priority class for a tip"""
+        if tip_data.get('amount', 0) >= self.large_tip_amount:
+            return PRIORITY_LARGE
+        if tip_data.get('retry') or tip_data.get('attempt', 1) > 1:
+            return PRIORITY_RETRY
+        if tip_data.get('bulk') or tip_data.get('platform') in BULK_PLATFORMS:
+            return PRIORITY_BULK
+        return PRIORITY_INTERACTIVE
+
+    @staticmethod
+    def sender_of(tip_data: Dict[str, Any]) -> str:
+        return str(tip_data.get('author_id') or tip_data.get('sender') or 'unknown')
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def retry_after(self) -> float:
+        """Seconds to drain the current queue at the recent dispatch rate"""
+        if self._dispatch_rate <= 0:
+            return 1.0
+        return round(min(60.0, max(0.1, self._depth / self._dispatch_rate)), 2)
+
+    def start(self) -> None:
+        """Start the worker tasks on the running loop"""
+        if self._items is None:
+            self._items = asyncio.Semaphore(0)
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.ensure_future(self._worker()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, tip_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a tip and wait for its transaction result
+
+        Returns a failed result with `backpressure: True` and `retry_after`
+        seconds when the queue or the sender's share of it is full.
+        """
+        sender = self.sender_of(tip_data)
+        if self._depth >= self.max_depth:
+            return self._reject(f"Transaction queue full ({self._depth} tips waiting)")
+        if self._sender_depth.get(sender, 0) >= self.max_per_sender:
+            return self._reject(f"Too many queued tips from {sender} ({self.max_per_sender} max)")
+
+        if not self._tasks:
+            self.start()
+
+        priority = self.classify(tip_data)
+        future = asyncio.get_running_loop().create_future()
+        queue = self._classes[priority].get(sender)
+        if queue is None:
+            queue = self._classes[priority][sender] = deque()
+        queue.append((tip_data, future, time.monotonic()))
+
+        self._class_depth[priority] += 1
+        self._sender_depth[sender] = self._sender_depth.get(sender, 0) + 1
+        self._depth += 1
+        self._items.release()
+
+        return await future
+
+    def _reject(self, reason: str) -> Dict[str, Any]:
+        self.rejected += 1
+        return {
+            'success': False,
+            'error': reason,
+            'transaction_id': None,
+            'backpressure': True,
+            'queue_depth': self._depth,
+            'retry_after': self.retry_after()
+        }
+
+    def _next(self, skip=()):
+        """Pop the next tip by priority, starvation guard and sender round-robin
+
+        Senders in `skip` are passed over; returns None when the class due
+        next only has tips from them.
+        """
+        waiting = [p for p, count in enumerate(self._class_depth) if count]
+        priority = waiting[0]
+        streak = self._streak + 1
+        if len(waiting) > 1 and self._streak >= self.starvation_limit:
+            priority = waiting[-1]
+            streak = 0
+        elif priority == waiting[-1]:
+            streak = 0
+
+        senders = self._classes[priority]
+        sender = next((sender for sender in senders if sender not in skip), None)
+        if sender is None:
+            return None
+        self._streak = streak
+        queue = senders[sender]
+        tip_data, future, enqueued_at = queue.popleft()
+        if queue:
+            senders.move_to_end(sender)
+        else:
+            del senders[sender]
+
+        self._class_depth[priority] -= 1
+        self._depth -= 1
+        remaining = self._sender_depth[sender] - 1
+        if remaining:
+            self._sender_depth[sender] = remaining
+        else:
+            del self._sender_depth[sender]
+        return tip_data, future, enqueued_at
+
+    def _record_dispatch(self, count: int) -> None:
+        """Track tips dispatched per second, decayed over RATE_WINDOW_S, for retry_after estimates"""
+        now = time.monotonic()
+        if self._last_dispatch is not None:
+            self._dispatch_rate *= math.exp(-(now - self._last_dispatch) / RATE_WINDOW_S)
+        self._dispatch_rate += count / RATE_WINDOW_S
+        self._last_dispatch = now
+        self.dispatched += count
+
+    async def _worker(self) -> None:
+        while True:
+            await self._items.acquire()
+            batch = [self._next()]
+            taken = {self.sender_of(batch[0][0]): 1}
+            # Drain what is already queued without waiting for more
+            while len(batch) < self.batch_max_size and not self._items.locked():
+                full = {sender for sender, count in taken.items() if count >= self.batch_max_per_sender}
+                item = self._next(full)
+                if item is None:
+                    break
+                await self._items.acquire()
+                batch.append(item)
+                sender = self.sender_of(item[0])
+                taken[sender] = taken.get(sender, 0) + 1
+
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+            self._record_dispatch(len(batch))
+
+            try:
+                results = await self.executor.execute_tips([tip_data for tip_data, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.monotonic()
+            for (_, future, enqueued_at), result in zip(batch, results):
+                if not future.done():
+                    result['queue_wait'] = round(now - enqueued_at, 4)
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per class plus dispatch and rejection counters"""
+        return {
+            'depth': self._depth,
+            'by_class': dict(zip(PRIORITY_NAMES, self._class_depth)),
+            'senders': len(self._sender_depth),
+            'dispatched': self.dispatched,
+            'rejected': self.rejected,
+            'dispatch_rate': round(self._dispatch_rate, 2)
+        }
@@ -0,0 +1,280 @@
+"""
+Solana RPC Client
+Minimal async JSON-RPC client for the transfer subset of the Solana RPC API
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# getSignatureStatuses accepts at most this many signatures per call
+MAX_STATUS_BATCH = 256
+
+
+def b58encode(data: bytes) -> str:
+    """Base58-encode bytes the way Solana encodes signatures and hashes"""
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    leading_zeros = len(data) - len(data.lstrip(b'\0'))
+    return '1' * leading_zeros + encoded
+
+
+class RpcError(Exception):
+    """Raised when an RPC call or transfer fails"""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class TransferOutcomeUnknown(RpcError):
+    """Raised when a sent transfer can neither be confirmed nor shown to have expired
+
+    It may still land, so it must not be re-sent. `signature` is the
+    transaction's, when the node returned one.
+    """
+
+    signature: Optional[str] = None
+
+
+class SolanaRpcClient:
+    """Keep-alive HTTP JSON-RPC client with batched signature polling"""
+
+    def __init__(self, url: str, request_timeout: float = 10.0, confirm_timeout: float = 30.0,
+                 poll_interval: float = 0.1, max_retries: int = 3, sender: str = 'tippin-sol'):
+        parts = urlsplit(url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = parts.path or '/'
+        self.ssl = parts.scheme == 'https'
+        self.request_timeout = request_timeout
+        self.confirm_timeout = confirm_timeout
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.sender = sender
+
+        self._ids = itertools.count(1)
+        self._idle = []
+        self._watched: Dict[str, asyncio.Future] = {}
+        self._poll_task = None
+
+    async def call(self, method: str, params: Optional[List[Any]] = None) -> Any:
+        """Make one JSON-RPC call and return its result"""
+        request = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params or []}
+        body = json.dumps(request, separators=(',', ':')).encode('utf-8')
+        response = json.loads(await asyncio.wait_for(self._post(body), self.request_timeout))
+
+        if 'error' in response:
+            error = response['error']
+            raise RpcError(f"{method} failed: {error.get('message')}", error.get('code'))
+        return response.get('result')
+
+    async def _post(self, body: bytes) -> bytes:
+        """POST a body over a pooled keep-alive connection"""
+        if self._idle:
+            reader, writer = self._idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+
+        try:
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body
+            )
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("RPC connection closed")
+            status = int(status_line.split()[1])
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            payload = await reader.readexactly(int(headers.get('content-length', '0')))
+        except BaseException:
+            writer.close()
+            raise
+
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+
+        if status != 200:
+            raise RpcError(f"RPC HTTP {status}")
+        return payload
+
+    async def get_latest_blockhash(self) -> Tuple[str, int]:
+        """The latest blockhash and the last block height at which it is valid"""
+        result = await self.call('getLatestBlockhash', [{'commitment': 'confirmed'}])
+        return result['value']['blockhash'], result['value']['lastValidBlockHeight']
+
+    async def get_block_height(self) -> int:
+        return await self.call('getBlockHeight', [{'commitment': 'confirmed'}])
+
+    async def send_transaction(self, encoded: str) -> str:
+        return await self.call('sendTransaction', [encoded, {'encoding': 'base64'}])
+
+    async def get_signature_statuses(self, signatures: List[str]) -> List[Optional[Dict[str, Any]]]:
+        result = await self.call('getSignatureStatuses', [signatures])
+        return result['value']
+
+    async def transfer(self, recipient: str, lamports: int) -> str:
+        """Send a transfer and wait for confirmation, returning its signature
+
+        A transfer is only re-signed with a fresh blockhash, up to
+        `max_retries` times, once the previous transaction can no longer
+        land: the node rejected it, it failed on chain, or the block height
+        has passed its blockhash's lastValidBlockHeight.
+        """
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            signature = None
+            try:
+                blockhash, last_valid_height = await self.get_latest_blockhash()
+                # Stand-in payload: the local RPC only needs something to sign over
+                payload = json.dumps({
+                    'from': self.sender,
+                    'to': recipient,
+                    'lamports': lamports,
+                    'blockhash': blockhash,
+                    'nonce': os.urandom(8).hex()
+                }).encode('utf-8')
+                try:
+                    signature = await self.send_transaction(base64.b64encode(payload).decode('ascii'))
+                except (RpcError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+                    if not (isinstance(e, RpcError) and e.code is not None):
+                        # No JSON-RPC answer: the node may have accepted the transaction anyway
+                        await self._await_expiry(last_valid_height)
+                    raise
+                await self._await_landing(signature, last_valid_height)
+                return signature
+            except TransferOutcomeUnknown as e:
+                e.signature = signature
+                raise
+            except (RpcError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+                last_error = e
+                logger.warning(f"Transfer to @{recipient} failed (attempt {attempt}/{self.max_retries}): {e}")
+
+        raise RpcError(f"Transfer to @{recipient} failed after {self.max_retries} attempts: {last_error}")
+
+    async def _await_landing(self, signature: str, last_valid_height: int) -> Dict[str, Any]:
+        """Wait until a sent transaction is confirmed, or raise RpcError once it can no longer land
+
+        Past the confirmation timeout the signature stays watched for as long
+        as its blockhash is valid, so a late confirmation still counts.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._watched[signature] = future
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.ensure_future(self._poll_statuses())
+
+        try:
+            while True:
+                try:
+                    # Shielded so that a timeout leaves the signature watched
+                    return await asyncio.wait_for(asyncio.shield(future), self.confirm_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if await self._expired(last_valid_height):
+                    break
+                logger.info(f"Transaction {signature} not confirmed after {self.confirm_timeout}s, "
+                            f"still valid until block height {last_valid_height}")
+        finally:
+            self._watched.pop(signature, None)
+            if future.done() and not future.cancelled():
+                future.exception()
+
+        # It may have landed in the last valid blocks, after the final poll
+        status = await self._final_status(signature)
+        if status is not None and status.get('err') is not None:
+            raise RpcError(f"Transaction {signature} failed: {status['err']}")
+        if status is not None and status.get('confirmationStatus') in ('confirmed', 'finalized'):
+            return status
+        raise RpcError(f"Transaction {signature} expired unconfirmed after block height {last_valid_height}")
+
+    async def _await_expiry(self, last_valid_height: int) -> None:
+        """Wait until transactions signed over a blockhash can no longer land"""
+        while not await self._expired(last_valid_height):
+            await asyncio.sleep(self.confirm_timeout)
+
+    async def _expired(self, last_valid_height: int) -> bool:
+        """Whether the block height has passed last_valid_height"""
+        last_error = None
+        for _ in range(self.max_retries):
+            try:
+                return await self.get_block_height() > last_valid_height
+            except (RpcError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+                last_error = e
+                await asyncio.sleep(self.poll_interval)
+        # Guessing either way could pay out twice
+        raise TransferOutcomeUnknown(f"Could not read the block height to check for expiry: {last_error}")
+
+    async def _final_status(self, signature: str) -> Optional[Dict[str, Any]]:
+        last_error = None
+        for _ in range(self.max_retries):
+            try:
+                return (await self.get_signature_statuses([signature]))[0]
+            except (RpcError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+                last_error = e
+                await asyncio.sleep(self.poll_interval)
+        raise TransferOutcomeUnknown(f"Could not read the status of expired transaction {signature}: {last_error}")
+
+    async def _poll_statuses(self) -> None:
+        """Poll every watched signature with batched getSignatureStatuses calls"""
+        while self._watched:
+            signatures = list(self._watched)
+            await asyncio.gather(*(
+                self._poll_chunk(signatures[start:start + MAX_STATUS_BATCH])
+                for start in range(0, len(signatures), MAX_STATUS_BATCH)
+            ))
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll_chunk(self, signatures: List[str]) -> None:
+        """Resolve the watchers of one getSignatureStatuses batch"""
+        try:
+            statuses = await self.get_signature_statuses(signatures)
+        except (RpcError, ConnectionError, asyncio.TimeoutError, OSError) as e:
+            logger.warning(f"Status poll failed: {e}")
+            return
+
+        for signature, status in zip(signatures, statuses):
+            future = self._watched.get(signature)
+            if future is None or future.done() or status is None:
+                continue
+            if status.get('err') is not None:
+                future.set_exception(RpcError(f"Transaction {signature} failed: {status['err']}"))
+            elif status.get('confirmationStatus') in ('confirmed', 'finalized'):
+                future.set_result(status)
+
+    async def close(self) -> None:
+        """Close pooled connections and stop polling"""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent's modules are imported flat, as run_agent.sh runs them from the agent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
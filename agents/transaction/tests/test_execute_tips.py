@@ -0,0 +1,238 @@
+"""
+Batch execution in MockTransactionExecutor
+"""
+
+import asyncio
+import random
+
+import pytest
+
+import main
+from balance import BalanceAccount
+from solana_rpc import RpcError, TransferOutcomeUnknown
+
+
+@pytest.fixture(autouse=True)
+def instant_transfers(monkeypatch):
+    monkeypatch.setenv('TX_LATENCY_MEAN_S', '0')
+    monkeypatch.setenv('TX_LEDGER_PATH', '')
+    monkeypatch.delenv('SOLANA_RPC_URL', raising=False)
+
+
+def test_a_failing_group_does_not_fail_the_others():
+    async def run():
+        executor = main.MockTransactionExecutor()
+        transfer = executor._transfer
+
+        async def flaky_transfer(recipient, *args):
+            if recipient == 'eve':
+                raise ValueError("boom")
+            return await transfer(recipient, *args)
+
+        executor._transfer = flaky_transfer
+        first = await executor.execute_tips([
+            {'recipient': 'eve', 'amount': 2.0, 'idempotency_key': 'k-eve'},
+            {'recipient': 'bob', 'amount': 1.0, 'idempotency_key': 'k-bob'},
+        ])
+        retried = await executor.execute_tips([{'recipient': 'bob', 'amount': 1.0, 'idempotency_key': 'k-bob'}])
+        return executor, first, retried
+
+    executor, (eve, bob), (bob_again,) = asyncio.run(run())
+
+    assert not eve['success'] and 'boom' in eve['error']
+    assert bob['success']
+    assert bob_again['duplicate'] and bob_again['transaction_id'] == bob['transaction_id']
+    assert executor.balance == pytest.approx(99.0)
+    assert executor.account.open_holds == 0
+    assert len(executor.transaction_history) == 1
+
+
+def test_an_invalid_amount_fails_only_its_own_tip():
+    async def run():
+        executor = main.MockTransactionExecutor()
+        results = await executor.execute_tips([
+            {'recipient': 'bob', 'amount': float('nan')},
+            {'recipient': 'bob', 'amount': 1.0},
+        ])
+        return executor, results
+
+    executor, (bad, good) = asyncio.run(run())
+
+    assert not bad['success'] and 'Invalid amount' in bad['error']
+    assert good['success']
+    assert executor.balance == pytest.approx(99.0)
+
+
+class SlowRpc:
+    """Stands in for SolanaRpcClient, tracking how many transfers are sent at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def transfer(self, recipient, lamports):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return f"sig_{recipient}_{lamports}"
+
+    async def close(self):
+        pass
+
+
+def test_each_rpc_transfer_takes_an_in_flight_slot(monkeypatch):
+    monkeypatch.setenv('TX_MAX_IN_FLIGHT', '3')
+
+    async def run():
+        executor = main.MockTransactionExecutor()
+        executor.rpc = SlowRpc()
+        results = await executor.execute_tips([{'recipient': 'bob', 'amount': 0.1} for _ in range(20)])
+        return executor, results
+
+    executor, results = asyncio.run(run())
+
+    assert all(result['success'] for result in results)
+    assert executor.rpc.peak == 3
+
+
+class RejectingRpc(SlowRpc):
+    """Fails transfers of exactly `rejected` lamports"""
+
+    def __init__(self, rejected):
+        super().__init__()
+        self.rejected = rejected
+
+    async def transfer(self, recipient, lamports):
+        if lamports == self.rejected:
+            raise RpcError("rejected")
+        return await super().transfer(recipient, lamports)
+
+
+def test_balance_after_is_the_balance_each_transfer_reached():
+    async def run():
+        executor = main.MockTransactionExecutor()
+        simulated = await executor.execute_tips([{'recipient': 'bob', 'amount': amount} for amount in (1.0, 2.0)])
+        executor.rpc = RejectingRpc(rejected=main.to_lamports(3.0))
+        sent = await executor.execute_tips([{'recipient': 'bob', 'amount': amount} for amount in (3.0, 4.0)])
+        return executor, simulated, sent
+
+    executor, simulated, (rejected, sent) = asyncio.run(run())
+
+    assert [result['balance_after'] for result in simulated] == [99.0, 97.0]
+    assert not rejected['success']
+    assert sent['balance_after'] == pytest.approx(93.0)
+    assert executor.balance == pytest.approx(93.0)
+    assert executor.account.open_holds == 0
+
+
+class LostRpc(SlowRpc):
+    """Every transfer is sent but can be neither confirmed nor shown to have expired"""
+
+    async def transfer(self, recipient, lamports):
+        error = TransferOutcomeUnknown("block height unavailable")
+        error.signature = f"sig_{recipient}"
+        raise error
+
+
+@pytest.mark.parametrize('landed', [True, False])
+def test_unknown_outcome_keeps_its_hold_until_reconciled(landed):
+    tip = {'recipient': 'bob', 'amount': 5.0, 'idempotency_key': 'k-bob'}
+
+    async def run():
+        executor = main.MockTransactionExecutor()
+        executor.rpc = LostRpc()
+        first, = await executor.execute_tips([tip])
+        retried, = await executor.execute_tips([tip])
+        available = executor.balance
+        reconciled = await executor.reconcile_transfer(first['pending_id'], first['signature'] if landed else None)
+        after, = await executor.execute_tips([tip])
+        return executor, first, retried, available, reconciled, after
+
+    executor, first, retried, available, reconciled, after = asyncio.run(run())
+
+    assert first['status'] == 'unknown' and not first['success']
+    assert retried['duplicate'] and retried['pending_id'] == first['pending_id']
+    assert available == pytest.approx(95.0)
+    assert reconciled['success'] is landed
+    if landed:
+        assert after['duplicate'] and after['transaction_id'] == 'sig_bob'
+        assert executor.account.open_holds == 0
+        assert executor.balance == pytest.approx(95.0)
+        assert len(executor.transaction_history) == 1
+    else:
+        # Released, so the retry is sent again, and its outcome is unknown again under a new hold
+        assert after['status'] == 'unknown' and after['pending_id'] != first['pending_id']
+        assert executor.account.open_holds == 1
+        assert executor.balance == pytest.approx(95.0)
+
+
+class CheckedAccount(BalanceAccount):
+    """Fails the test as soon as any balance operation overspends the account"""
+
+    def _check(self):
+        assert self._settled >= 0 and self._reserved >= 0
+        assert self._settled - self._reserved >= 0
+
+    def reserve_lamports(self, lamports):
+        hold = super().reserve_lamports(lamports)
+        self._check()
+        return hold
+
+    def commit(self, hold, lamports=None):
+        super().commit(hold, lamports)
+        self._check()
+
+    def settle(self, hold, lamports):
+        super().settle(hold, lamports)
+        self._check()
+
+    def release(self, hold):
+        super().release(hold)
+        self._check()
+
+
+class FlakyRpc(SlowRpc):
+    """Rejects roughly one transfer in five"""
+
+    def __init__(self):
+        super().__init__()
+        self.rng = random.Random(5)
+
+    async def transfer(self, recipient, lamports):
+        await asyncio.sleep(self.rng.random() * 0.002)
+        if self.rng.random() < 0.2:
+            raise RpcError("rejected")
+        return f"sig_{self.rng.getrandbits(64):016x}"
+
+
+@pytest.mark.parametrize('rpc', [None, FlakyRpc], ids=['simulated', 'rpc'])
+def test_concurrent_batches_never_overspend_a_small_balance(monkeypatch, rpc):
+    monkeypatch.setenv('TX_LATENCY_DISTRIBUTION', 'uniform')
+    monkeypatch.setenv('TX_LATENCY_MEAN_S', '0.002')
+    monkeypatch.setenv('TX_LATENCY_JITTER_S', '0.002')
+    monkeypatch.setenv('TX_MAX_IN_FLIGHT', '64')
+    rng = random.Random(6)
+    initial = 5_000_000_000  # 5 SOL against about 40 SOL of tips
+
+    async def run():
+        executor = main.MockTransactionExecutor()
+        executor.account = CheckedAccount.from_lamports(initial)
+        if rpc is not None:
+            executor.rpc = rpc()
+        batches = [
+            [{'recipient': f"user{rng.randrange(20)}", 'amount': rng.choice((0.01, 0.02, 0.05, 0.1))}
+             for _ in range(rng.randint(1, 10))]
+            for _ in range(1000)
+        ]
+        results = await asyncio.gather(*(executor.execute_tips(batch) for batch in batches))
+        return executor, [result for batch in results for result in batch]
+
+    executor, results = asyncio.run(run())
+
+    paid = sum(main.to_lamports(executor.transaction_history.get(result['transaction_id']).amount)
+               for result in results if result['success'])
+    assert any(result['success'] for result in results)
+    assert any('Insufficient balance' in result['error'] for result in results if not result['success'])
+    assert executor.account.open_holds == 0
+    assert executor.account.available_lamports == initial - paid >= 0
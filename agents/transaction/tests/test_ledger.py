@@ -0,0 +1,99 @@
+"""
+Append-only transaction ledger
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from ledger import TransactionLedger
+from transaction_store import TransactionRecord
+
+
+def record(n, amount, balance_after):
+    return TransactionRecord(f"tx_{n:08x}", amount, 'bob', 'thanks', 1_700_000_000.0 + n, balance_after)
+
+
+def write(path, entries, amount, initial_balance, **options):
+    async def run():
+        ledger = TransactionLedger(path, initial_balance=initial_balance, commit_interval=0, **options)
+        list(ledger.recover())
+        balance = ledger.balance
+        records = []
+        for n in range(entries):
+            balance -= amount
+            records.append(record(n, amount, balance))
+        await ledger.append(records)
+        await ledger.aclose()
+
+    asyncio.run(run())
+
+
+def test_replayed_balance_is_exact_in_lamports(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    write(path, 10_000, 0.1, initial_balance=1_000.0)
+
+    ledger = TransactionLedger(path, initial_balance=0.0)
+    list(ledger.recover())
+
+    assert ledger.entries == 10_000
+    # 0.1 SOL is not exact as a float; subtracting it 10,000 times would not land on 0
+    assert ledger.balance_lamports == 0
+    assert ledger.balance == 0.0
+
+
+def test_snapshot_segments_round_trip(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    recipients = ['bob', 'zoë', 'bob', 'ålice', 'zoë']
+
+    async def run():
+        ledger = TransactionLedger(path, initial_balance=10.0, commit_interval=0, snapshot_every=len(recipients))
+        list(ledger.recover())
+        await ledger.append([
+            TransactionRecord(f"tx_{n}", 1.0, recipient, f"msg {n} ✓", 1_700_000_000.0 + n, 9.0 - n)
+            for n, recipient in enumerate(recipients)
+        ])
+        await ledger.aclose()
+
+    asyncio.run(run())
+
+    ledger = TransactionLedger(path, initial_balance=0.0)
+    assert list(ledger.recover()) == []
+    snapshot = ledger.snapshot
+
+    assert len(snapshot) == 5
+    assert snapshot.get('tx_1').recipient == 'zoë'
+    assert snapshot.get('tx_4').message == 'msg 4 ✓'
+    assert snapshot.get('tx_4').balance_after == 5.0
+    assert [record.transaction_id for record in snapshot.recent_for_recipient('zoë', 10)] == ['tx_4', 'tx_1']
+    assert ledger.balance_lamports == 5 * 10**9
+
+
+def test_a_corrupt_segment_falls_back_to_replay(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    write(path, 4, 1.0, initial_balance=10.0, snapshot_every=4)
+    segment = f"{path}.snapshot.000000"
+    with open(segment, 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b'\xff')
+
+    ledger = TransactionLedger(path, initial_balance=0.0)
+    replayed = list(ledger.recover())
+
+    assert ledger.snapshot is None
+    assert len(replayed) == 4
+    assert ledger.balance == 6.0
+
+
+@pytest.mark.parametrize('close_snapshot_min, segmented', [(4, True), (5, False), (None, False)])
+def test_close_only_snapshots_a_long_enough_tail(tmp_path, close_snapshot_min, segmented):
+    path = str(tmp_path / 'ledger.bin')
+    write(path, 4, 1.0, initial_balance=10.0, close_snapshot_min=close_snapshot_min)
+
+    ledger = TransactionLedger(path, initial_balance=0.0)
+    replayed = list(ledger.recover())
+
+    assert os.path.exists(f"{path}.snapshot") is segmented
+    assert len(replayed) == (0 if segmented else 4)
+    assert ledger.entries == 4
@@ -0,0 +1,173 @@
+"""
+Duplicate tips on the transaction agent's mention path
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import main
+from coral_io import parse_mentions
+
+
+class FakeSendMessage:
+    def __init__(self):
+        self.sent = []
+
+    async def ainvoke(self, args):
+        self.sent.append(args)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def instant_transfers(monkeypatch):
+    monkeypatch.setenv('TX_LATENCY_MEAN_S', '0')
+    monkeypatch.setenv('TX_LEDGER_PATH', '')
+    monkeypatch.delenv('SOLANA_RPC_URL', raising=False)
+    # load_config requires a model key, which the fast path never uses
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+
+
+def validated_tip(tip):
+    return json.dumps({'type': 'validated_tip', 'tip': tip, 'validation': {'is_valid': True}})
+
+
+def run_mentions(raw):
+    """Feed one wait_for_mentions result through the agent's fast path and collect the replies"""
+    async def run():
+        executor = main.MockTransactionExecutor()
+        scheduler = main.TipScheduler(executor)
+        scheduler.start()
+        send_message = FakeSendMessage()
+        tasks = set()
+        unparsed = main.dispatch_mentions(parse_mentions(raw), scheduler, send_message, main.load_config(), tasks)
+        await asyncio.gather(*list(tasks))
+        await scheduler.stop()
+        return executor, send_message.sent, unparsed
+    return asyncio.run(run())
+
+
+def results(sent):
+    return [json.loads(message['content'])['result'] for message in sent]
+
+
+def test_forwarded_twice_is_paid_once():
+    tip = {'recipient': 'alice', 'amount': 1.5, 'message': 'thanks', 'author_id': 'console_user',
+           'platform': 'console', 'timestamp': '2025-01-01T12:00:00'}
+    raw = json.dumps({'messages': [
+        {'id': 'm1', 'threadId': 't1', 'senderId': 'validation', 'content': validated_tip(tip)},
+        {'id': 'm2', 'threadId': 't1', 'senderId': 'validation', 'content': validated_tip(tip)},
+    ]})
+
+    executor, sent, unparsed = run_mentions(raw)
+
+    assert unparsed == []
+    assert len(sent) == 2
+    first, second = results(sent)
+    assert first['success'] and second['success']
+    assert first['transaction_id'] == second['transaction_id']
+    assert len(executor.transaction_history) == 1
+    assert executor.balance == pytest.approx(100.0 - 1.5)
+
+
+def test_same_command_typed_twice_is_paid_twice():
+    raw = json.dumps({'messages': [
+        {'id': f'm{n}', 'threadId': 't1', 'senderId': 'validation', 'content': validated_tip({
+            'recipient': 'alice', 'amount': 1.0, 'author_id': 'console_user', 'platform': 'console',
+            'timestamp': f'2025-01-01T12:00:0{n}'
+        })} for n in range(2)
+    ]})
+
+    executor, sent, _ = run_mentions(raw)
+
+    assert len({result['transaction_id'] for result in results(sent)}) == 2
+    assert len(executor.transaction_history) == 2
+
+
+def test_redelivered_message_without_timestamp_is_paid_once():
+    mention = {'id': 'm7', 'threadId': 't1', 'senderId': 'validation',
+               'content': validated_tip({'recipient': 'bob', 'amount': 2.0})}
+    raw = json.dumps({'messages': [mention, dict(mention)]})
+
+    executor, sent, _ = run_mentions(raw)
+
+    first, second = results(sent)
+    assert first['transaction_id'] == second['transaction_id']
+    assert len(executor.transaction_history) == 1
+
+
+@pytest.mark.parametrize('sender, content', [
+    ('validation', json.dumps({'type': 'validated_tip', 'tip': {'recipient': 'eve', 'amount': 5.0},
+                               'validation': {'is_valid': False}})),
+    ('validation', json.dumps({'type': 'validation_result', 'tip': {'recipient': 'eve', 'amount': 5.0},
+                               'result': {'is_valid': False}})),
+    ('validation', json.dumps({'recipient': 'eve', 'amount': 5.0})),
+    ('validation', json.dumps({'tip': {'recipient': 'eve', 'amount': 5.0}})),
+    ('console', validated_tip({'recipient': 'eve', 'amount': 5.0})),
+])
+def test_only_validated_tips_from_validation_are_executed(sender, content):
+    raw = json.dumps({'messages': [{'id': 'm1', 'threadId': 't1', 'senderId': sender, 'content': content}]})
+
+    executor, sent, _ = run_mentions(raw)
+
+    assert sent == []
+    assert len(executor.transaction_history) == 0
+    assert executor.balance == pytest.approx(100.0)
+
+
+def test_result_mentions_validation_notification_and_requester():
+    tip = {'recipient': 'alice', 'amount': 1.0, 'timestamp': '2025-01-01T12:00:00', 'requested_by': 'console'}
+    raw = json.dumps({'messages': [{'id': 'm1', 'threadId': 't1', 'senderId': 'validation',
+                                    'content': validated_tip(tip)}]})
+
+    _, sent, _ = run_mentions(raw)
+
+    assert sent[0]['threadId'] == 't1'
+    assert sent[0]['mentions'] == ['validation', 'notification', 'console']
+
+
+@pytest.mark.parametrize('amount', ['NaN', 'Infinity', '-Infinity'])
+def test_non_finite_amounts_are_not_executed(amount):
+    content = ('{"type": "validated_tip", "tip": {"recipient": "eve", "amount": %s}, '
+               '"validation": {"is_valid": true}}' % amount)
+    raw = json.dumps({'messages': [{'id': 'm1', 'threadId': 't1', 'senderId': 'validation', 'content': content}]})
+
+    executor, sent, unparsed = run_mentions(raw)
+
+    assert sent == []
+    assert len(unparsed) == 1
+    assert executor.balance == pytest.approx(100.0)
+
+
+class FailingSendMessage:
+    async def ainvoke(self, args):
+        raise ConnectionError("coral went away")
+
+
+def test_a_failed_reply_is_logged(caplog):
+    raw = json.dumps({'messages': [{'id': 'm1', 'threadId': 't1', 'senderId': 'validation',
+                                    'content': validated_tip({'recipient': 'bob', 'amount': 1.0})}]})
+
+    async def run():
+        executor = main.MockTransactionExecutor()
+        scheduler = main.TipScheduler(executor)
+        tasks = set()
+        main.dispatch_mentions(parse_mentions(raw), scheduler, FailingSendMessage(), main.load_config(), tasks)
+        await asyncio.wait(list(tasks))
+        await scheduler.stop()
+
+    asyncio.run(run())
+
+    assert any('Tip task failed' in record.message and 'coral went away' in record.message
+               for record in caplog.records)
+
+
+def test_result_echoes_the_tip_id():
+    tip = {'recipient': 'alice', 'amount': 1.0, 'timestamp': '2025-01-01T12:00:00', 'tip_id': 'console-s-1'}
+    raw = json.dumps({'messages': [{'id': 'm1', 'threadId': 't1', 'senderId': 'validation',
+                                    'content': validated_tip(tip)}]})
+
+    _, sent, _ = run_mentions(raw)
+
+    assert json.loads(sent[0]['content'])['tip_id'] == 'console-s-1'
@@ -0,0 +1,88 @@
+"""
+Batched dispatch from the tip scheduler
+"""
+
+import asyncio
+
+from scheduler import TipScheduler
+
+
+class RecordingExecutor:
+    max_in_flight = 1
+
+    def __init__(self):
+        self.batches = []
+
+    async def execute_tips(self, batch):
+        self.batches.append([tip['recipient'] for tip in batch])
+        await asyncio.sleep(0)
+        return [{'success': True, 'transaction_id': f"tx_{tip['recipient']}"} for tip in batch]
+
+
+def test_queued_tips_are_executed_together_in_priority_order():
+    async def run():
+        executor = RecordingExecutor()
+        scheduler = TipScheduler(executor, workers=1)
+        results = await asyncio.gather(
+            scheduler.submit({'recipient': 'small', 'amount': 1.0, 'author_id': 'x'}),
+            scheduler.submit({'recipient': 'large', 'amount': 50.0, 'author_id': 'y'}),
+            scheduler.submit({'recipient': 'bulk', 'amount': 1.0, 'platform': 'bulk', 'author_id': 'z'}),
+        )
+        await scheduler.stop()
+        return executor.batches, results
+
+    batches, results = asyncio.run(run())
+
+    assert batches == [['large', 'small', 'bulk']]
+    assert [result['transaction_id'] for result in results] == ['tx_small', 'tx_large', 'tx_bulk']
+    assert all('queue_wait' in result for result in results)
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setenv('TX_BATCH_MAX_SIZE', '2')
+
+    async def run():
+        executor = RecordingExecutor()
+        scheduler = TipScheduler(executor, workers=1)
+        await asyncio.gather(*(scheduler.submit({'recipient': f'user{i}', 'amount': 1.0, 'author_id': f'sender{i}'})
+                               for i in range(5)))
+        await scheduler.stop()
+        return executor.batches
+
+    assert [len(batch) for batch in asyncio.run(run())] == [2, 2, 1]
+
+
+def test_a_burst_from_one_sender_does_not_fill_the_batch():
+    async def run():
+        executor = RecordingExecutor()
+        scheduler = TipScheduler(executor, workers=1)
+        burst = [asyncio.ensure_future(scheduler.submit({'recipient': f'a{i}', 'amount': 1.0, 'author_id': 'A'}))
+                 for i in range(100)]
+        while not executor.batches:
+            await asyncio.sleep(0)
+        late = await scheduler.submit({'recipient': 'b', 'amount': 1.0, 'author_id': 'B'})
+        await asyncio.gather(*burst)
+        await scheduler.stop()
+        return executor.batches, late, scheduler
+
+    batches, late, scheduler = asyncio.run(run())
+
+    assert len(batches[0]) == scheduler.batch_max_per_sender
+    assert 'b' in batches[1]
+    assert late['success']
+
+
+def test_dispatch_rate_counts_tips_per_batch():
+    async def run():
+        executor = RecordingExecutor()
+        scheduler = TipScheduler(executor, workers=1)
+        await asyncio.gather(*(scheduler.submit({'recipient': f'user{i}', 'amount': 1.0, 'author_id': f'sender{i}'})
+                               for i in range(50)))
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+
+    assert scheduler.dispatched == 50
+    # Fifty tips dispatched at once, not one per microsecond
+    assert 0 < scheduler.stats()['dispatch_rate'] <= 50
@@ -0,0 +1,254 @@
+"""
+Transaction Store
+In-memory transaction records indexed by ID, recipient and time bucket
+"""
+
+import bisect
+import sys
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+
+EXPLORER_URL = "https://explorer.solana.com/tx/{}?cluster=devnet"
+
+
+class TransactionRecord:
+    """Compact record of one completed transfer
+
+    Only the raw fields are stored; `timestamp` and `explorer_url` are
+    derived on access. Records support `record['key']` and `record.get()`
+    so they can be read like the transaction dicts the executor returns.
+    """
+
+    __slots__ = ('transaction_id', 'amount', 'recipient', 'message', 'epoch_us', 'balance_after')
+
+    FIELDS = ('success', 'transaction_id', 'amount', 'recipient', 'message',
+              'timestamp', 'explorer_url', 'balance_after')
+
+    success = True
+
+    def __init__(self, transaction_id: str, amount: float, recipient: str, message: str,
+                 epoch: float, balance_after: float):
+        self.transaction_id = transaction_id
+        self.amount = amount
+        # Tips cluster on a few handles, so share one string per recipient
+        self.recipient = sys.intern(recipient)
+        self.message = message or ''
+        self.epoch_us = int(epoch * 1_000_000)
+        self.balance_after = balance_after
+
+    @property
+    def epoch(self) -> float:
+        return self.epoch_us / 1_000_000
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.utcfromtimestamp(self.epoch).isoformat()
+
+    @property
+    def explorer_url(self) -> str:
+        return EXPLORER_URL.format(self.transaction_id)
+
+    @classmethod
+    def from_raw(cls, transaction_id: str, amount: float, recipient: str, message: str,
+                 epoch_us: int, balance_after: float) -> "TransactionRecord":
+        """Rebuild a record from stored fields, keeping the exact microsecond epoch"""
+        record = cls.__new__(cls)
+        record.transaction_id = transaction_id
+        record.amount = amount
+        record.recipient = recipient
+        record.message = message
+        record.epoch_us = epoch_us
+        record.balance_after = balance_after
+        return record
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full transaction dict, as returned by execute_tip"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self) -> str:
+        return f"TransactionRecord({self.transaction_id!r}, {self.amount} SOL → @{self.recipient})"
+
+
+class FrozenTransactions:
+    """Read-only transactions kept as columns, as loaded from ledger snapshot segments
+
+    Each segment carries its own recipient index, so loading millions of
+    transactions costs a few list and array copies plus one dict of IDs;
+    TransactionRecord objects are only built for the rows a lookup returns.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.amounts = array('d')
+        self.messages: List[str] = []
+        self.epoch_us = array('q')
+        self.balance_after = array('d')
+        self._row_of: Dict[str, int] = {}
+        # Per segment: first row, recipient names, per-row recipient codes, min and max epoch_us
+        self._segments: List[tuple] = []
+        self._segment_starts: List[int] = []
+        # Recipient -> [(segment first row, segment-relative rows)], oldest segment first
+        self._by_recipient: Dict[str, List[tuple]] = defaultdict(list)
+
+    @staticmethod
+    def columns(records: Sequence[TransactionRecord]) -> Dict[str, Any]:
+        """Columnar form of consecutive records, as stored in one snapshot segment"""
+        names: Dict[str, int] = {}
+        codes = array('I')
+        rows: Dict[str, array] = {}
+        for row, record in enumerate(records):
+            codes.append(names.setdefault(record.recipient, len(names)))
+            recipient_rows = rows.get(record.recipient)
+            if recipient_rows is None:
+                recipient_rows = rows[record.recipient] = array('I')
+            recipient_rows.append(row)
+        epochs = array('q', [record.epoch_us for record in records])
+        return {
+            'ids': [record.transaction_id for record in records],
+            'amounts': array('d', [record.amount for record in records]),
+            'recipient_names': list(names),
+            'recipient_codes': codes,
+            'by_recipient': rows,
+            'messages': [record.message for record in records],
+            'epoch_us': epochs,
+            'balance_after': array('d', [record.balance_after for record in records]),
+            'epoch_range': (min(epochs), max(epochs)) if records else (0, 0),
+        }
+
+    def extend(self, columns: Dict[str, Any]) -> None:
+        """Append one segment's columns; rows keep the order they were written in"""
+        first = len(self.ids)
+        count = len(columns['ids'])
+        self.ids.extend(columns['ids'])
+        self.amounts.extend(columns['amounts'])
+        self.messages.extend(columns['messages'])
+        self.epoch_us.extend(columns['epoch_us'])
+        self.balance_after.extend(columns['balance_after'])
+        self._row_of.update(zip(columns['ids'], range(first, first + count)))
+        names = [sys.intern(name) for name in columns['recipient_names']]
+        self._segments.append((first, names, columns['recipient_codes'], *columns['epoch_range']))
+        self._segment_starts.append(first)
+        for name, rows in columns['by_recipient'].items():
+            self._by_recipient[sys.intern(name)].append((first, rows))
+
+    def _record(self, row: int) -> TransactionRecord:
+        first, names, codes = self._segments[bisect.bisect_right(self._segment_starts, row) - 1][:3]
+        return TransactionRecord.from_raw(
+            self.ids[row], self.amounts[row], names[codes[row - first]], self.messages[row],
+            self.epoch_us[row], self.balance_after[row]
+        )
+
+    def get(self, transaction_id: str) -> Optional[TransactionRecord]:
+        row = self._row_of.get(transaction_id)
+        return None if row is None else self._record(row)
+
+    def recent_for_recipient(self, recipient: str, limit: int) -> List[TransactionRecord]:
+        """Most recent transactions for a recipient, newest first"""
+        results = []
+        for first, rows in reversed(self._by_recipient.get(recipient, ())):
+            for row in reversed(rows):
+                if len(results) >= limit:
+                    return results
+                results.append(self._record(first + row))
+        return results
+
+    def between(self, start_us: int, end_us: int) -> List[TransactionRecord]:
+        """Transactions with start_us <= epoch_us < end_us, skipping segments outside the range"""
+        results = []
+        ends = self._segment_starts[1:] + [len(self.ids)]
+        epochs = self.epoch_us
+        for (first, _, _, low, high), end in zip(self._segments, ends):
+            if high < start_us or low >= end_us:
+                continue
+            results.extend(self._record(row) for row in range(first, end) if start_us <= epochs[row] < end_us)
+        return results
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self._row_of
+
+    def __iter__(self) -> Iterator[TransactionRecord]:
+        return (self._record(row) for row in range(len(self.ids)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class TransactionStore:
+    """Transaction history with constant-time and logarithmic lookups
+
+    `base` holds transactions restored from a ledger snapshot; they are
+    looked up alongside the ones added since.
+    """
+
+    def __init__(self, bucket_seconds: int = 60, base: Optional[FrozenTransactions] = None):
+        self.bucket_seconds = bucket_seconds
+        self.base = base
+        self._by_id: Dict[str, TransactionRecord] = {}
+        self._by_recipient: Dict[str, List[TransactionRecord]] = defaultdict(list)
+        self._by_bucket: Dict[int, List[TransactionRecord]] = defaultdict(list)
+        self._bucket_keys: List[int] = []
+        self._bucket_us = bucket_seconds * 1_000_000
+
+    def add(self, record: TransactionRecord) -> None:
+        """Record a transaction and update every index"""
+        self._by_id[record.transaction_id] = record
+        self._by_recipient[record.recipient].append(record)
+
+        bucket = record.epoch_us // self._bucket_us
+        if bucket not in self._by_bucket:
+            # Buckets arrive in order almost always, so this is usually an append
+            if self._bucket_keys and bucket < self._bucket_keys[-1]:
+                bisect.insort(self._bucket_keys, bucket)
+            else:
+                self._bucket_keys.append(bucket)
+        self._by_bucket[bucket].append(record)
+
+    def get(self, transaction_id: str) -> Optional[TransactionRecord]:
+        """Look up a transaction by ID"""
+        record = self._by_id.get(transaction_id)
+        if record is None and self.base is not None:
+            return self.base.get(transaction_id)
+        return record
+
+    def recent_for_recipient(self, recipient: str, limit: int = 10) -> List[TransactionRecord]:
+        """Most recent transactions for a recipient, newest first"""
+        records = self._by_recipient.get(recipient)
+        recent = records[:-limit - 1:-1] if records else []
+        if len(recent) < limit and self.base is not None:
+            recent.extend(self.base.recent_for_recipient(recipient, limit - len(recent)))
+        return recent
+
+    def between(self, start: float, end: Optional[float] = None) -> List[TransactionRecord]:
+        """Transactions recorded in the epoch range [start, end)"""
+        start_us = int(start * 1_000_000)
+        end_us = int((time.time() if end is None else end) * 1_000_000)
+        first = bisect.bisect_left(self._bucket_keys, start_us // self._bucket_us)
+        last = bisect.bisect_right(self._bucket_keys, end_us // self._bucket_us)
+
+        results = self.base.between(start_us, end_us) if self.base is not None else []
+        for bucket in self._bucket_keys[first:last]:
+            results.extend(r for r in self._by_bucket[bucket] if start_us <= r.epoch_us < end_us)
+        return results
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self._by_id or (self.base is not None and transaction_id in self.base)
+
+    def __iter__(self) -> Iterator[TransactionRecord]:
+        if self.base is None:
+            return iter(self._by_id.values())
+        return chain(self.base, self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id) + (len(self.base) if self.base is not None else 0)
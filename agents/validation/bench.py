@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Validation Agent Benchmarks
+Micro-benchmarks for the tip validator and its checks
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+
+from patterns import PatternMatcher
+from sketches import BehaviorSketches
+
+WORDS = ['thanks', 'great', 'stream', 'for', 'the', 'help', 'love', 'your', 'work', 'gm',
+         'awesome', 'tip', 'coffee', 'on', 'me', 'keep', 'building', 'nice', 'post', 'ser']
+
+
+def _random_patterns(count: int, rng: random.Random) -> dict:
+    """Distinct lowercase terms of 4-12 characters"""
+    patterns = {}
+    while len(patterns) < count:
+        term = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(4, 12)))
+        patterns[term] = round(rng.uniform(0.05, 0.5), 2)
+    return patterns
+
+
+def _random_messages(count: int, patterns: list, hit_rate: float, rng: random.Random) -> list:
+    messages = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 16))
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(patterns))
+        messages.append(' '.join(words))
+    return messages
+
+
+def bench_patterns(args) -> None:
+    rng = random.Random(args.seed)
+    print(f"{'patterns':>9}  {'build (s)':>9}  {'nodes':>7}  {'scan (us)':>9}  {'naive (us)':>10}  {'speedup':>7}")
+    for count in args.sizes:
+        patterns = _random_patterns(count, rng)
+        messages = _random_messages(args.messages, list(patterns), args.hit_rate, rng)
+
+        start = time.perf_counter()
+        matcher = PatternMatcher(patterns)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for message in messages:
+            matcher.score(message)
+        scan = (time.perf_counter() - start) / len(messages)
+
+        # The loop TipValidator used before: one substring scan per keyword
+        weights = list(patterns.items())
+        sample = messages[:max(1, len(messages) // 10)]
+        start = time.perf_counter()
+        for message in sample:
+            sum(weight for keyword, weight in weights if keyword in message)
+        naive = (time.perf_counter() - start) / len(sample)
+
+        nodes = len(matcher._goto)
+        print(f"{count:>9}  {build:>9.3f}  {nodes:>7}  {scan * 1e6:>9.1f}  {naive * 1e6:>10.1f}  {naive / scan:>6.1f}x")
+
+
+def _random_tips(count: int, rng: random.Random, authors: int, recipients: int) -> list:
+    """Tips shaped like a bulk import, including some each check should reject"""
+    handles = [f"user{i}" for i in range(recipients)] + ['x', 'bob123', 'alice000']
+    notes = [' '.join(rng.choices(WORDS, k=rng.randint(0, 8))) for _ in range(500)]
+    notes += ['free scam bot', 'fake hack', 'spam']
+    return [{
+        'recipient': rng.choice(handles),
+        'amount': rng.choice([0.0001, 0.01, 0.5, 1.0, 2.5, 150.0]),
+        'message': rng.choice(notes),
+        'author_id': f"author{rng.randrange(authors)}"
+    } for _ in range(count)]
+
+
+def bench_batch(args) -> None:
+    from main import TipValidator, np
+
+    if np is None:
+        print("NumPy is not installed; validate_batch would fall back to validate_tip")
+        return
+
+    rng = random.Random(args.seed)
+    tips = _random_tips(args.tips, rng, args.authors, args.recipients)
+
+    def timed(run):
+        gc.collect()
+        validator = TipValidator()
+        # validate_batch reports failures in registration order, so compare against that order
+        validator.pipeline.reorder_every = 0
+        start = time.perf_counter()
+        result = run(validator)
+        return result, time.perf_counter() - start
+
+    def columns(validator):
+        return validator.validate_columns(
+            [tip['amount'] for tip in tips], [tip['recipient'] for tip in tips],
+            [tip['message'] for tip in tips], [tip['author_id'] for tip in tips]
+        )
+
+    verdicts, columnar = timed(columns)
+    actual, batch = timed(lambda validator: validator.validate_batch(tips))
+    expected, loop = timed(lambda validator: [validator.validate_tip(dict(tip)) for tip in tips])
+
+    def verdict(result):
+        is_valid, reason, details = result
+        return is_valid, reason, details['checks_passed'], details['checks_failed'], round(details['risk_score'], 9)
+
+    mismatches = sum(verdict(a) != verdict(b) for a, b in zip(expected, actual))
+    print(f"{args.tips} tips, {args.authors} authors: {verdicts.counts()}")
+    print(f"{mismatches} verdict mismatches between validate_batch and validate_tip")
+    print(f"validate_tip loop:  {loop:.3f}s ({loop / args.tips * 1e6:.2f} us/tip)")
+    print(f"validate_batch:     {batch:.3f}s ({batch / args.tips * 1e6:.2f} us/tip, {loop / batch:.1f}x)")
+    print(f"validate_columns:   {columnar:.3f}s ({columnar / args.tips * 1e6:.2f} us/tip, {loop / columnar:.1f}x)")
+
+    # Replay the accepted tips through fresh sketches to show what the sequential behavior loop costs
+    gc.collect()
+    sketches = TipValidator().behavior
+    accepted = [tips[i] for i in np.flatnonzero(verdicts.is_valid).tolist()]
+    start = time.perf_counter()
+    for tip in accepted:
+        sketches.record(tip['author_id'], tip['recipient'], tip['amount'], 0.0)
+    behavior = time.perf_counter() - start
+    rest = max(columnar - behavior, 1e-9)
+    print(f"  behavior sketches: {behavior:.3f}s for {len(accepted)} accepted tips, sequential by design")
+    print(f"  everything else:   {rest:.3f}s ({loop / rest:.1f}x vs the validate_tip loop)")
+
+
+def bench_pipeline(args) -> None:
+    rng = random.Random(args.seed)
+    patterns = _random_patterns(args.patterns, rng)
+    tips = _random_tips(args.tips, rng, args.tips, 1_000)
+    for tip in tips:
+        tip['message'] = ' '.join(rng.choices(WORDS, k=40))
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.writelines(f"{term} {weight}\n" for term, weight in patterns.items())
+    os.environ['SPAM_KEYWORDS_FILE'] = f.name
+    try:
+        from main import TipValidator
+
+        def run(reorder_every: int):
+            validator = TipValidator()
+            # Every tip is distinct, so the verdict cache would only add misses
+            validator.verdict_cache = None
+            pipeline = validator.pipeline
+            pipeline.reorder_every = reorder_every
+            # Start from the worst order: the expensive spam scan first, cheap amount check last
+            pipeline.set_order(['spam', 'recipient_pattern', 'recipient_format', 'amount', 'rate_limit'])
+            gc.collect()
+            start = time.perf_counter()
+            for tip in tips:
+                validator.validate_tip(tip)
+            return time.perf_counter() - start, pipeline.stats()
+
+        fixed, _ = run(0)
+        adaptive, stats = run(args.reorder_every)
+    finally:
+        os.unlink(f.name)
+        del os.environ['SPAM_KEYWORDS_FILE']
+
+    print(f"{args.tips} tips, {args.patterns} spam patterns, 40-word messages")
+    print(f"fixed order:     {fixed / args.tips * 1e6:.2f} us/tip")
+    print(f"adaptive order:  {adaptive / args.tips * 1e6:.2f} us/tip ({fixed / adaptive:.1f}x)")
+    print(json.dumps(stats, indent=2))
+
+
+def bench_cache(args) -> None:
+    rng = random.Random(args.seed)
+    patterns = _random_patterns(args.patterns, rng)
+    distinct = _random_tips(args.tips // args.repeats, rng, args.tips, 1_000)
+    for tip in distinct:
+        tip['message'] = ' '.join(rng.choices(WORDS, k=40))
+    # Each tip arrives `repeats` times, like retries and the same tip forwarded by two agents
+    tips = [dict(tip, message=tip['message'].upper() if i % 2 else tip['message'])
+            for tip in distinct for i in range(args.repeats)]
+    rng.shuffle(tips)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.writelines(f"{term} {weight}\n" for term, weight in patterns.items())
+    os.environ['SPAM_KEYWORDS_FILE'] = f.name
+    try:
+        from main import TipValidator
+
+        def run(cached: bool):
+            validator = TipValidator()
+            if not cached:
+                validator.verdict_cache = None
+            gc.collect()
+            start = time.perf_counter()
+            verdicts = [validator.validate_tip(dict(tip)) for tip in tips]
+            return time.perf_counter() - start, verdicts, validator
+
+        uncached, expected, _ = run(False)
+        cached, actual, validator = run(True)
+    finally:
+        os.unlink(f.name)
+        del os.environ['SPAM_KEYWORDS_FILE']
+
+    mismatches = sum((a[0], a[1], a[2]['checks_failed']) != (b[0], b[1], b[2]['checks_failed'])
+                     for a, b in zip(expected, actual))
+    print(f"{len(tips)} tips ({len(distinct)} distinct x {args.repeats}), {args.patterns} spam patterns")
+    print(f"cache: {validator.verdict_cache.stats()}")
+    print(f"{mismatches} verdict mismatches with the cache off")
+    print(f"no cache:  {uncached / len(tips) * 1e6:.2f} us/tip")
+    print(f"cache:     {cached / len(tips) * 1e6:.2f} us/tip ({uncached / cached:.1f}x)")
+
+
+def _hammer_limiter(path: str, limits: list, authors: int, attempts: int, seed: int, start_at: float):
+    """One replica: try `attempts` tips from random authors against the shared limiter"""
+    from rate_limit import SqliteRateLimiter
+
+    limiter = SqliteRateLimiter(path, limits)
+    rng = random.Random(seed)
+    accepted = {}
+    latencies = []
+    while time.time() < start_at:
+        time.sleep(0.001)
+    for _ in range(attempts):
+        author = f"author{rng.randrange(authors)}"
+        start = time.perf_counter()
+        if limiter.acquire(author) is None:
+            accepted[author] = accepted.get(author, 0) + 1
+        latencies.append(time.perf_counter() - start)
+    limiter.close()
+    return accepted, latencies
+
+
+def bench_ratelimit(args) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+    from rate_limit import parse_limits
+
+    limits = parse_limits(args.limits)
+    per_window = min(count for count, _ in limits)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rate_limit.db")
+        start_at = time.time() + 1.0
+        with ProcessPoolExecutor(args.processes) as pool:
+            results = list(pool.map(
+                _hammer_limiter, [path] * args.processes, [limits] * args.processes,
+                [args.authors] * args.processes, [args.attempts] * args.processes,
+                range(args.processes), [start_at] * args.processes
+            ))
+        elapsed = time.time() - start_at
+
+    totals = {}
+    latencies = []
+    for accepted, timings in results:
+        latencies += timings
+        for author, count in accepted.items():
+            totals[author] = totals.get(author, 0) + count
+    latencies.sort()
+    over = {author: count for author, count in totals.items() if count > per_window}
+    attempts = args.processes * args.attempts
+
+    print(f"{args.processes} processes x {args.attempts} tips from {args.authors} shared authors, limits {args.limits}")
+    print(f"accepted {sum(totals.values())} of {attempts}; most for one author {max(totals.values(), default=0)} "
+          f"(global limit {per_window}, run took {elapsed:.1f}s)")
+    print(f"authors over the global limit: {len(over)}")
+    print(f"acquire latency: p50 {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+    if over:
+        raise SystemExit(f"Global limit violated: {over}")
+
+
+def bench_sketches(args) -> None:
+    rng = random.Random(args.seed)
+    sketches = BehaviorSketches(fanout_min=args.fanout_high)
+    sybils = {f"sybil{i}" for i in range(args.sybils)}
+    washers = [(f"wash{i}a", f"wash{i}b") for i in range(args.wash_pairs)]
+
+    # Background traffic, with sybils fanning out and wash pairs tipping back and forth mixed in
+    stream = [(f"user{rng.randrange(args.authors)}", f"user{rng.randrange(args.authors)}") for _ in range(args.tips)]
+    for sybil in sybils:
+        stream += [(sybil, f"fresh{sybil}{j}") for j in range(args.fanout_high * 2)]
+    for a, b in washers:
+        stream += [(a, b), (b, a)] * 5
+    rng.shuffle(stream)
+
+    flagged = set()
+    start = time.perf_counter()
+    for author, recipient in stream:
+        features = sketches.record(author, recipient, 1.0, now=0.0)
+        if features['author_fanout'] >= args.fanout_high:
+            flagged.add(('fanout', author))
+        if min(features['pair_tips'], features['reverse_pair_tips']) >= 3:
+            flagged.add(('wash', author))
+    elapsed = time.perf_counter() - start
+
+    fanout_hits = {author for kind, author in flagged if kind == 'fanout'}
+    wash_hits = {author for kind, author in flagged if kind == 'wash'}
+    wash_authors = {author for pair in washers for author in pair}
+    print(f"{len(stream)} tips from {args.authors} background authors, sketch memory {sketches.nbytes / 1e6:.2f} MB (fixed)")
+    print(f"record: {elapsed / len(stream) * 1e6:.2f} us/tip")
+    print(f"fan-out: {len(fanout_hits & sybils)}/{len(sybils)} sybils flagged, {len(fanout_hits - sybils)} false positives")
+    print(f"wash:    {len(wash_hits & wash_authors)}/{len(wash_authors)} wash authors flagged, {len(wash_hits - wash_authors)} false positives")
+
+
+def bench_reputation(args) -> None:
+    from reputation import ReputationIndex, build_index
+
+    rng = random.Random(args.seed)
+    handles = [f"spammer{i}" for i in range(args.handles)]
+    probes = [f"user{i}" for i in range(args.lookups)]
+    listed = rng.sample(handles, min(args.lookups, len(handles)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reputation.idx")
+        start = time.perf_counter()
+        build_index(((handle, rng.random()) for handle in handles), path, args.bits_per_key)
+        build = time.perf_counter() - start
+        index = ReputationIndex(path)
+
+        def per_lookup(keys):
+            start = time.perf_counter()
+            for key in keys:
+                index.lookup(key)
+            return (time.perf_counter() - start) / len(keys)
+
+        negative = per_lookup(probes)
+        false_positives = len(probes) - index.bloom_rejects
+        positive = per_lookup(listed)
+
+        gc.collect()
+        tracemalloc.start()
+        as_dict = {handle: rng.random() for handle in handles}
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for key in probes:
+            as_dict.get(key)
+        dict_lookup = (time.perf_counter() - start) / len(probes)
+
+        print(f"{args.handles} handles: built in {build:.2f}s, file {os.path.getsize(path) / 1e6:.1f} MB "
+              f"(shared via page cache) vs {dict_bytes / 1e6:.1f} MB per process as a dict")
+        print(f"unknown recipient: {negative * 1e6:.2f} us/lookup, "
+              f"{false_positives / len(probes):.2%} passed the Bloom filter")
+        print(f"listed recipient:  {positive * 1e6:.2f} us/lookup")
+        print(f"dict lookup:       {dict_lookup * 1e6:.2f} us/lookup")
+        index.close()
+
+
+def bench_scorer(args) -> None:
+    import asyncio
+    from scorer import FEATURES, LogisticScorer, TickBatcher
+
+    rng = random.Random(args.seed)
+    scorer = LogisticScorer(FEATURES, [rng.uniform(-1, 1) for _ in FEATURES], -2.0)
+    rows = [[rng.random() * 5 for _ in FEATURES] for _ in range(args.tips)]
+
+    start = time.perf_counter()
+    single = [scorer.score_rows([row])[0] for row in rows]
+    one_at_a_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = scorer.score_rows(rows)
+    whole_batch = time.perf_counter() - start
+
+    batcher = TickBatcher(scorer)
+
+    async def concurrent():
+        # Tasks queued together, like mentions from one wait_for_mentions result
+        for offset in range(0, len(rows), args.tick_size):
+            await asyncio.gather(*(batcher.submit(row) for row in rows[offset:offset + args.tick_size]))
+
+    start = time.perf_counter()
+    asyncio.run(concurrent())
+    ticked = time.perf_counter() - start
+
+    drift = max(abs(a - b) for a, b in zip(single, batched))
+    print(f"{args.tips} rows x {len(FEATURES)} features, max difference single vs batch {drift:.1e}")
+    print(f"one row per call:   {one_at_a_time / args.tips * 1e6:.2f} us/tip")
+    print(f"TickBatcher ({args.tick_size}/tick): {ticked / args.tips * 1e6:.2f} us/tip, "
+          f"{batcher.rows / batcher.batches:.0f} rows per batch")
+    print(f"one batch:          {whole_batch / args.tips * 1e6:.2f} us/tip ({one_at_a_time / whole_batch:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation agent benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    patterns_parser = subparsers.add_parser("patterns", help="Multi-pattern matcher vs per-keyword scans")
+    patterns_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000])
+    patterns_parser.add_argument("--messages", type=int, default=10_000)
+    patterns_parser.add_argument("--hit-rate", type=float, default=0.1)
+    patterns_parser.add_argument("--seed", type=int, default=7)
+    patterns_parser.set_defaults(func=bench_patterns)
+
+    batch_parser = subparsers.add_parser("batch", help="validate_batch vs a validate_tip loop")
+    batch_parser.add_argument("--tips", type=int, default=100_000)
+    batch_parser.add_argument("--authors", type=int, default=50_000)
+    batch_parser.add_argument("--recipients", type=int, default=10_000)
+    batch_parser.add_argument("--seed", type=int, default=7)
+    batch_parser.set_defaults(func=bench_batch)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Adaptive rule order vs a fixed bad order")
+    pipeline_parser.add_argument("--tips", type=int, default=20_000)
+    pipeline_parser.add_argument("--patterns", type=int, default=10_000)
+    pipeline_parser.add_argument("--reorder-every", type=int, default=1_000)
+    pipeline_parser.add_argument("--seed", type=int, default=7)
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    cache_parser = subparsers.add_parser("cache", help="Verdict cache on repeated tips")
+    cache_parser.add_argument("--tips", type=int, default=20_000)
+    cache_parser.add_argument("--repeats", type=int, default=4)
+    cache_parser.add_argument("--patterns", type=int, default=1_000)
+    cache_parser.add_argument("--seed", type=int, default=7)
+    cache_parser.set_defaults(func=bench_cache)
+
+    ratelimit_parser = subparsers.add_parser("ratelimit", help="Shared SQLite rate limit across processes")
+    ratelimit_parser.add_argument("--processes", type=int, default=4)
+    ratelimit_parser.add_argument("--attempts", type=int, default=2_000)
+    ratelimit_parser.add_argument("--authors", type=int, default=50)
+    ratelimit_parser.add_argument("--limits", default="10/300")
+    ratelimit_parser.set_defaults(func=bench_ratelimit)
+
+    sketches_parser = subparsers.add_parser("sketches", help="Behavior sketch cost and detection")
+    sketches_parser.add_argument("--tips", type=int, default=200_000)
+    sketches_parser.add_argument("--authors", type=int, default=100_000)
+    sketches_parser.add_argument("--sybils", type=int, default=20)
+    sketches_parser.add_argument("--wash-pairs", type=int, default=20)
+    sketches_parser.add_argument("--fanout-high", type=int, default=50)
+    sketches_parser.add_argument("--seed", type=int, default=7)
+    sketches_parser.set_defaults(func=bench_sketches)
+
+    reputation_parser = subparsers.add_parser("reputation", help="Reputation index lookups and memory")
+    reputation_parser.add_argument("--handles", type=int, default=1_000_000)
+    reputation_parser.add_argument("--lookups", type=int, default=100_000)
+    reputation_parser.add_argument("--bits-per-key", type=int, default=10)
+    reputation_parser.add_argument("--seed", type=int, default=7)
+    reputation_parser.set_defaults(func=bench_reputation)
+
+    scorer_parser = subparsers.add_parser("scorer", help="Fraud model inference per tip vs batched")
+    scorer_parser.add_argument("--tips", type=int, default=50_000)
+    scorer_parser.add_argument("--tick-size", type=int, default=64)
+    scorer_parser.add_argument("--seed", type=int, default=7)
+    scorer_parser.set_defaults(func=bench_scorer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Coral I/O
+Parsing of Coral mentions and tip payloads for direct validation
+"""
+
+import html
+import json
+import math
+import re
+from typing import Dict, Any, List, Optional
+
+TIP_COMMAND_PATTERN = re.compile(r'/tip\s+@(\S+)\s+([\d.]+)\s+SOL\s*(.*)', re.IGNORECASE)
+MESSAGE_PATTERN = re.compile(r'<message\b([^>]*?)(?:/>|>(.*?)</message>)', re.DOTALL)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)\s*=\s*"([^"]*)"')
+CONTENT_PATTERN = re.compile(r'<content>(.*?)</content>', re.DOTALL)
+
+THREAD_KEYS = ('threadId', 'thread_id', 'threadID')
+SENDER_KEYS = ('senderId', 'sender_id', 'sender', 'senderID')
+MESSAGE_ID_KEYS = ('messageId', 'message_id', 'id')
+
+
+def _first(mapping: Dict[str, Any], keys) -> Optional[str]:
+    for key in keys:
+        if mapping.get(key):
+            return str(mapping[key])
+    return None
+
+
+def parse_mentions(raw: Any) -> List[Dict[str, str]]:
+    """Extract {'threadId', 'senderId', 'messageId', 'content'} dicts from a wait_for_mentions result
+
+    Coral returns mentions either as JSON or as XML-like text depending on
+    the server version; both are accepted. Anything unrecognized yields no
+    mentions.
+    """
+    if isinstance(raw, (list, dict)):
+        data = raw
+    else:
+        text = str(raw or '')
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+
+        if data is None:
+            mentions = []
+            for attributes, body in MESSAGE_PATTERN.findall(text):
+                attrs = {k: html.unescape(v) for k, v in ATTRIBUTE_PATTERN.findall(attributes)}
+                content = attrs.get('content')
+                if content is None:
+                    inner = CONTENT_PATTERN.search(body or '')
+                    content = html.unescape((inner.group(1) if inner else body or '').strip())
+                mentions.append({
+                    'threadId': _first(attrs, THREAD_KEYS),
+                    'senderId': _first(attrs, SENDER_KEYS),
+                    'messageId': _first(attrs, MESSAGE_ID_KEYS),
+                    'content': content
+                })
+            return [m for m in mentions if m['threadId'] and m['content']]
+
+    if isinstance(data, dict):
+        data = data.get('messages', data.get('mentions', [data]))
+
+    mentions = []
+    for message in data if isinstance(data, list) else []:
+        if not isinstance(message, dict):
+            continue
+        mention = {
+            'threadId': _first(message, THREAD_KEYS),
+            'senderId': _first(message, SENDER_KEYS),
+            'messageId': _first(message, MESSAGE_ID_KEYS),
+            'content': message.get('content') or ''
+        }
+        if mention['threadId'] and mention['content']:
+            mentions.append(mention)
+    return mentions
+
+
+def _json_objects(text: str):
+    """Yield every JSON object embedded in free text"""
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except ValueError:
+            start = text.find('{', start + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        start = text.find('{', end)
+
+
+def parse_tip_payload(content: str) -> Optional[Dict[str, Any]]:
+    """Return the structured tip in a message, or None if there is none
+
+    A tip is a JSON object with a string `recipient` and a numeric `amount`,
+    either at the top level or under a `tip` key, or a console command of the
+    form `/tip @recipient amount SOL message`. NaN and infinite amounts are
+    not tips; bounds are left to the validator.
+    """
+    for obj in _json_objects(content or ''):
+        tip = obj.get('tip') if isinstance(obj.get('tip'), dict) else obj
+        recipient = tip.get('recipient')
+        amount = tip.get('amount')
+        if not isinstance(recipient, str) or not recipient.strip():
+            continue
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
+            continue
+
+        tip = dict(tip)
+        tip['recipient'] = recipient.strip().lstrip('@')
+        tip['amount'] = float(amount)
+        tip.setdefault('message', '')
+        return tip
+
+    match = TIP_COMMAND_PATTERN.search(content or '')
+    if match:
+        try:
+            amount = float(match.group(2))
+        except ValueError:
+            return None
+        if not math.isfinite(amount):
+            return None
+        return {
+            'recipient': match.group(1),
+            'amount': amount,
+            'message': match.group(3).strip()
+        }
+    return None
+
+
+def message_type(content: str) -> Optional[str]:
+    """The `type` field of the first JSON object in a message, if any"""
+    for obj in _json_objects(content or ''):
+        value = obj.get('type')
+        return value if isinstance(value, str) else None
+    return None
+
+
+def parse_thread_id(raw: Any) -> Optional[str]:
+    """Pull the thread ID out of a create_thread result"""
+    text = str(raw or '')
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        thread = data.get('thread', data)
+        found = _first(thread, ('threadId', 'id', 'thread_id')) if isinstance(thread, dict) else None
+        if found:
+            return found
+
+    match = re.search(r'\b(?:threadId|thread_id|id)\b["\']?\s*[=:]\s*["\']?([\w-]+)', text)
+    return match.group(1) if match else None
+
+
+def tools_by_name(tools) -> Dict[str, Any]:
+    return {tool.name: tool for tool in tools}
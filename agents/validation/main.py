@@ -5,17 +5,35 @@ Validates tip requests for fraud detection and business rules
 """
 
 import asyncio
+import hashlib
 import os
 import json
 import logging
-from typing import Dict, Any, Tuple
+import math
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
+try:
+    import numpy as np
+except ImportError:  # optional: validate_batch falls back to per-tip validation
+    np = None
+
 from langchain.chat_models import init_chat_model
 from langchain.prompts import ChatPromptTemplate
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 
+from coral_io import message_type, parse_mentions, parse_thread_id, parse_tip_payload, tools_by_name
+from patterns import PatternMatcher
+from rate_limit import make_limiter, parse_limits
+from reputation import ReputationIndex
+from rules import PatternCheck, Rule, RulePipeline
+from scorer import FEATURES, LogisticScorer, TickBatcher, feature_row
+from sketches import BehaviorSketches
+from verdict_cache import VerdictCache
+
 # Load environment variables
 load_dotenv()
 
@@ -26,92 +44,544 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_SPAM_KEYWORDS = ['spam', 'scam', 'fake', 'bot', 'phishing', 'hack']
+DEFAULT_SUSPICIOUS_PATTERNS = ['123', '000', '999', '111']
+
+# validate_batch outcome codes, in the order validate_tip applies the checks
+(STAGE_AMOUNT_INVALID, STAGE_AMOUNT_MIN, STAGE_AMOUNT_MAX, STAGE_RECIPIENT_INVALID, STAGE_RECIPIENT_SUSPICIOUS,
+ STAGE_RECIPIENT_DENYLISTED, STAGE_SPAM, STAGE_RATE_LIMIT, STAGE_VALID) = range(9)
+
+STAGE_NAMES = ['amount_invalid', 'amount_min', 'amount_max', 'recipient_invalid', 'recipient_suspicious',
+               'recipient_denylisted', 'spam_detection', 'rate_limit', 'valid']
+
+STAGE_CHECKS = {
+    STAGE_AMOUNT_INVALID: ([], ['amount_invalid']),
+    STAGE_AMOUNT_MIN: ([], ['amount_min']),
+    STAGE_AMOUNT_MAX: ([], ['amount_max']),
+    STAGE_RECIPIENT_INVALID: (['amount_validation'], ['recipient_invalid']),
+    STAGE_RECIPIENT_SUSPICIOUS: (['amount_validation'], ['recipient_suspicious']),
+    STAGE_RECIPIENT_DENYLISTED: (['amount_validation', 'recipient_validation'], ['recipient_denylisted']),
+    STAGE_SPAM: (['amount_validation', 'recipient_validation'], ['spam_detection']),
+    STAGE_RATE_LIMIT: (['amount_validation', 'recipient_validation', 'spam_detection'], ['rate_limit']),
+    STAGE_VALID: (['amount_validation', 'recipient_validation', 'spam_detection', 'rate_limiting'], []),
+}
+
 class TipValidator:
     """Advanced tip validation with fraud detection"""
     
     def __init__(self):
         self.min_amount = float(os.getenv('MIN_TIP_AMOUNT', '0.001'))
         self.max_amount = float(os.getenv('MAX_TIP_AMOUNT', '100.0'))
-        self.spam_keywords = ['spam', 'scam', 'fake', 'bot', 'phishing', 'hack']
-        self.suspicious_patterns = ['123', '000', '999', '111']
-        self.validation_history = []
+        self.spam_threshold = float(os.getenv('SPAM_THRESHOLD', '0.4'))
+        self.recipient_threshold = float(os.getenv('SUSPICIOUS_RECIPIENT_THRESHOLD', '0.3'))
+        self.spam_matcher = PatternMatcher.from_file(
+            os.getenv('SPAM_KEYWORDS_FILE'), DEFAULT_SPAM_KEYWORDS, default_weight=0.2
+        )
+        self.recipient_matcher = PatternMatcher.from_file(
+            os.getenv('SUSPICIOUS_PATTERNS_FILE'), DEFAULT_SUSPICIOUS_PATTERNS, default_weight=0.3
+        )
+        reputation_path = os.getenv('REPUTATION_INDEX')
+        self.reputation = ReputationIndex(reputation_path) if reputation_path else None
+        self.reputation_reject = float(os.getenv('REPUTATION_REJECT_SCORE', '0.8'))
+        self.rate_limiter = make_limiter(
+            os.getenv('VALIDATION_RATE_BACKEND', 'memory'),
+            parse_limits(os.getenv('VALIDATION_RATE_LIMITS', '10/300')),
+            max_authors=int(os.getenv('VALIDATION_RATE_MAX_AUTHORS', '100000'))
+        )
+        self.validation_history = deque(maxlen=int(os.getenv('VALIDATION_HISTORY_SIZE', '1000')))
+        self.fanout_high = int(os.getenv('BEHAVIOR_FANOUT_HIGH', '50'))
+        self.behavior = BehaviorSketches(
+            window_seconds=float(os.getenv('BEHAVIOR_WINDOW_S', '600')), fanout_min=self.fanout_high
+        )
+        self.frequency_high = int(os.getenv('BEHAVIOR_TIPS_HIGH', '100'))
+        self.wash_min = int(os.getenv('BEHAVIOR_WASH_MIN', '3'))
+        self.amount_spike = float(os.getenv('BEHAVIOR_AMOUNT_SPIKE', '10'))
         
-    def validate_tip(self, tip_data: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
-        """Comprehensive tip validation"""
-        validation_result = {
+        model_path = os.getenv('FRAUD_MODEL')
+        self.scorer = LogisticScorer.from_file(model_path) if model_path else None
+        self.model_batcher = TickBatcher(self.scorer) if self.scorer else None
+        self.model_weight = float(os.getenv('FRAUD_MODEL_WEIGHT', '1.0'))
+        export_path = os.getenv('VALIDATION_HISTORY_EXPORT')
+        # Line buffered: a crash loses at most the record being written
+        self.history_export = open(export_path, 'a', encoding='utf-8', buffering=1) if export_path else None
+        cache_size = int(os.getenv('VALIDATION_CACHE_SIZE', '10000'))
+        self.verdict_cache = VerdictCache(
+            cache_size, ttl_seconds=float(os.getenv('VALIDATION_CACHE_TTL_S', '300'))
+        ) if cache_size > 0 else None
+        self.pipeline = RulePipeline(
+            reorder_every=int(os.getenv('VALIDATION_REORDER_EVERY', '1000')),
+            process_workers=int(os.getenv('VALIDATION_PROCESS_WORKERS', '0'))
+        )
+        self.pipeline.register(Rule('amount', self._check_amount, passed='amount_validation'))
+        self.pipeline.register(Rule('recipient_format', self._check_recipient_format))
+        self.pipeline.register(Rule(
+            'recipient_pattern',
+            PatternCheck(self.recipient_matcher, 'recipient', self.recipient_threshold, 'recipient_suspicious',
+                         "Suspicious recipient pattern detected", 'pattern_hits'),
+            passed='recipient_validation', cpu_bound=True
+        ))
+        if self.reputation is not None:
+            self.pipeline.register(Rule('recipient_reputation', self._check_reputation))
+        self.pipeline.register(Rule(
+            'spam',
+            PatternCheck(self.spam_matcher, 'message', self.spam_threshold, 'spam_detection',
+                         "Spam detected (score: {score:.2f})", 'spam_hits', risk_on_pass=True),
+            passed='spam_detection', cpu_bound=True
+        ))
+        # Only counts tips that pass everything else, so it always runs last
+        self.pipeline.register(Rule('rate_limit', self._check_rate_limit, passed='rate_limiting', stateful=True))
+    
+    @staticmethod
+    def _author(tip_data: Dict[str, Any]) -> str:
+        return str(tip_data.get('author_id') or tip_data.get('sender') or 'anonymous')
+    
+    def _check_amount(self, tip_data: Dict[str, Any]):
+        amount = tip_data.get('amount', 0)
+        # NaN compares false against both bounds, and infinities are not amounts either
+        if not math.isfinite(amount):
+            return 'amount_invalid', "Invalid amount", 0.0, None
+        if amount < self.min_amount:
+            return 'amount_min', f"Amount too small (min: {self.min_amount} SOL)", 0.0, None
+        if amount > self.max_amount:
+            return 'amount_max', f"Amount too large (max: {self.max_amount} SOL)", 0.0, None
+        return None
+    
+    def _check_recipient_format(self, tip_data: Dict[str, Any]):
+        recipient = tip_data.get('recipient', '')
+        if not recipient or len(recipient) < 2:
+            return 'recipient_invalid', "Invalid recipient format", 0.0, None
+        return None
+    
+    def _check_reputation(self, tip_data: Dict[str, Any]):
+        score = self.reputation.score(tip_data.get('recipient', ''))
+        if score >= self.reputation_reject:
+            return 'recipient_denylisted', "Recipient is on the denylist", score, {'reputation_score': score}
+        if score:
+            return None, '', score, {'reputation_score': score}
+        return None
+    
+    def _check_rate_limit(self, tip_data: Dict[str, Any]):
+        # Checks and records in one step, so replicas sharing a backend cannot both take the last slot
+        exceeded = self.rate_limiter.acquire(self._author(tip_data))
+        if exceeded:
+            count, seconds, retry_after = exceeded
+            reason = f"Rate limit exceeded (max {count} tips per {seconds:g} seconds)"
+            return 'rate_limit', reason, 0.0, {'retry_after': round(retry_after, 2)}
+        return None
+    
+    @staticmethod
+    def _new_result() -> Dict[str, Any]:
+        return {
             'is_valid': False,
             'reason': '',
             'checks_passed': [],
             'checks_failed': [],
             'risk_score': 0.0,
-            'timestamp': asyncio.get_event_loop().time()
+            'timestamp': time.monotonic()
         }
+    
+    def _score_behavior(self, author: str, recipient: str, amount: float,
+                        now: Optional[float] = None) -> Tuple[float, List[str], Dict[str, Any]]:
+        """Risk from the author's recent behavior, counting this tip in the sketches
         
-        amount = tip_data.get('amount', 0)
-        message = tip_data.get('message', '').lower()
+        Flags sybil fan-out (many distinct recipients), high tip frequency,
+        wash tipping (two handles tipping each other back and forth) and
+        amounts far above the author's usual.
+        """
+        features = self.behavior.record(author, recipient, amount, now)
+        flags = []
+        risk = 0.0
+        if features['author_fanout'] >= self.fanout_high:
+            flags.append('fanout')
+            risk += 0.4
+        if features['author_tips'] >= self.frequency_high:
+            flags.append('high_frequency')
+            risk += 0.3
+        if min(features['pair_tips'], features['reverse_pair_tips']) >= self.wash_min:
+            flags.append('wash_tipping')
+            risk += 0.4
+        if features['amount_samples'] >= 5 and features['amount_ratio'] >= self.amount_spike:
+            flags.append('amount_spike')
+            risk += 0.2
+        return risk, flags, features
+    
+    def _accept(self, tip_data: Dict[str, Any], validation_result: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
+        validation_result['is_valid'] = True
+        validation_result['reason'] = "All validations passed successfully"
+        
+        author = self._author(tip_data)
+        risk, flags, features = self._score_behavior(author, tip_data.get('recipient', ''), tip_data.get('amount', 0))
+        validation_result['risk_score'] += risk
+        validation_result['behavior'] = features
+        if flags:
+            validation_result['behavior_flags'] = flags
+        
+        # Record validation; the rate limit rule has already counted the tip
+        self.validation_history.append(validation_result)
+        return True, validation_result['reason'], validation_result
+    
+    def _model_row(self, tip_data: Dict[str, Any], validation_result: Dict[str, Any]) -> List[float]:
+        # Recipient pattern hits below the threshold are not kept in the result, so score it again
         recipient = tip_data.get('recipient', '')
+        return feature_row(tip_data.get('amount', 0), tip_data.get('message') or '',
+                           len(validation_result.get('spam_hits', ())), self.recipient_matcher.score(recipient)[0],
+                           validation_result.get('reputation_score', 0.0), validation_result['behavior'])
+    
+    def _apply_model(self, validation_result: Dict[str, Any], probability: Optional[float]) -> None:
+        if probability is not None:
+            validation_result['model_score'] = round(probability, 4)
+            validation_result['risk_score'] += self.model_weight * probability
+    
+    def _export_records(self, records: List[Tuple[Dict[str, Any], List[float], Dict[str, Any]]]) -> None:
+        """Append accepted tips with their model features for train_scorer.py, as JSON lines"""
+        now = time.time()
+        self.history_export.write(''.join(json.dumps({
+            'timestamp': now,
+            'author': self._author(tip_data),
+            'recipient': tip_data.get('recipient', ''),
+            'amount': tip_data.get('amount', 0),
+            'features': dict(zip(FEATURES, row)),
+            'risk_score': validation_result['risk_score'],
+            'model_score': validation_result.get('model_score')
+        }) + '\n' for tip_data, row, validation_result in records))
+    
+    @staticmethod
+    def _cache_key(tip_data: Dict[str, Any]) -> Tuple[str, Any, bytes]:
+        """Normalized (recipient, amount, message hash); tips with the same key pass the same stateless rules"""
+        recipient = tip_data.get('recipient') or ''
+        # Pattern scans and reputation lookups ignore case, but lowercasing can change the
+        # length of non-ASCII text, which the format check looks at
+        if recipient.isascii():
+            recipient = recipient.lower()
+        message = (tip_data.get('message') or '').lower().encode('utf-8')
+        return recipient, tip_data.get('amount', 0), hashlib.blake2b(message, digest_size=16).digest()
+    
+    def _from_cache(self, tip_data: Dict[str, Any], validation_result: Dict[str, Any]) -> Tuple[Any, Optional[bool]]:
+        """Cache key for a tip and whether its stateless rules passed, or None on a miss
         
-        # 1. Amount validation
-        if amount < self.min_amount:
-            validation_result['checks_failed'].append('amount_min')
-            validation_result['reason'] = f"Amount too small (min: {self.min_amount} SOL)"
+        On a hit the cached outcome is copied into validation_result.
+        """
+        key = self._cache_key(tip_data)
+        cached = self.verdict_cache.get(key)
+        if cached is None:
+            return key, None
+        passed, fields = cached
+        for name, value in fields.items():
+            validation_result[name] = value[:] if isinstance(value, list) else value
+        validation_result['cached'] = True
+        return key, passed
+    
+    def _to_cache(self, key: Any, passed: bool, validation_result: Dict[str, Any]) -> None:
+        fields = dict(validation_result)
+        del fields['timestamp']
+        # The stateful rules go on to append to these
+        fields['checks_passed'] = fields['checks_passed'][:]
+        fields['checks_failed'] = fields['checks_failed'][:]
+        self.verdict_cache.put(key, (passed, fields))
+    
+    def validate_tip(self, tip_data: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
+        """Comprehensive tip validation, running every rule inline
+        
+        Outcomes of the stateless rules are cached by normalized tip
+        content; the rate limit and behavior scoring always run fresh.
+        """
+        validation_result = self._new_result()
+        if self.verdict_cache is None:
+            passed = self.pipeline.run(tip_data, validation_result)
+        else:
+            key, passed = self._from_cache(tip_data, validation_result)
+            if passed is None:
+                passed = self.pipeline.run(tip_data, validation_result, stateful=False)
+                self._to_cache(key, passed, validation_result)
+            passed = passed and self.pipeline.run(tip_data, validation_result, stateful=True)
+        if not passed:
             return False, validation_result['reason'], validation_result
+        verdict = self._accept(tip_data, validation_result)
+        if self.scorer is not None or self.history_export is not None:
+            row = self._model_row(tip_data, validation_result)
+            self._apply_model(validation_result, self.scorer.score_rows([row])[0] if self.scorer else None)
+            if self.history_export is not None:
+                self._export_records([(tip_data, row, validation_result)])
+        return verdict
+    
+    async def validate_tip_async(self, tip_data: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
+        """validate_tip for the agent loop
         
-        if amount > self.max_amount:
-            validation_result['checks_failed'].append('amount_max')
-            validation_result['reason'] = f"Amount too large (max: {self.max_amount} SOL)"
+        CPU-bound rules use the process pool if configured, and the fraud
+        model scores all tips accepted in the same event loop tick together.
+        """
+        validation_result = self._new_result()
+        if self.verdict_cache is None:
+            passed = await self.pipeline.run_async(tip_data, validation_result)
+        else:
+            key, passed = self._from_cache(tip_data, validation_result)
+            if passed is None:
+                passed = await self.pipeline.run_async(tip_data, validation_result, stateful=False)
+                self._to_cache(key, passed, validation_result)
+            passed = passed and self.pipeline.run(tip_data, validation_result, stateful=True)
+        if not passed:
             return False, validation_result['reason'], validation_result
+        verdict = self._accept(tip_data, validation_result)
+        if self.scorer is not None or self.history_export is not None:
+            row = self._model_row(tip_data, validation_result)
+            self._apply_model(validation_result, await self.model_batcher.submit(row) if self.scorer else None)
+            if self.history_export is not None:
+                self._export_records([(tip_data, row, validation_result)])
+        return verdict
+    
+    def stats(self) -> Dict[str, Any]:
+        """Rule pipeline and verdict cache counters"""
+        return {
+            'pipeline': self.pipeline.stats(),
+            'cache': self.verdict_cache.stats() if self.verdict_cache is not None else None,
+            'rate_limited_authors': len(self.rate_limiter)
+        }
+    
+    def close(self) -> None:
+        self.pipeline.close()
+        self.rate_limiter.close()
+        if self.history_export is not None:
+            self.history_export.close()
+        if self.reputation is not None:
+            self.reputation.close()
+    
+    def validate_batch(self, tips: List[Dict[str, Any]]) -> List[Tuple[bool, str, Dict[str, Any]]]:
+        """Validate many tips at once, with the same verdicts as calling validate_tip in order
         
-        validation_result['checks_passed'].append('amount_validation')
+        Reasons and checks follow the registration order of the built-in
+        rules; an adaptive pipeline that has reordered them can report a
+        different first failure for tips that break several rules.
         
-        # 2. Recipient validation
-        if not recipient or len(recipient) < 2:
-            validation_result['checks_failed'].append('recipient_invalid')
-            validation_result['reason'] = "Invalid recipient format"
-            return False, validation_result['reason'], validation_result
+        Batches do not use the verdict cache; repeated recipients and
+        messages within a batch are already scanned once. Without NumPy
+        this is a loop over validate_tip.
+        """
+        if np is None:
+            return [self.validate_tip(tip) for tip in tips]
         
-        # Check for suspicious recipient patterns
-        if any(pattern in recipient.lower() for pattern in self.suspicious_patterns):
-            validation_result['risk_score'] += 0.3
-            validation_result['checks_failed'].append('recipient_suspicious')
-            validation_result['reason'] = "Suspicious recipient pattern detected"
-            return False, validation_result['reason'], validation_result
+        verdicts = self.validate_columns(
+            [tip.get('amount', 0) for tip in tips],
+            [tip.get('recipient') or '' for tip in tips],
+            [tip.get('message') or '' for tip in tips],
+            [self._author(tip) for tip in tips]
+        )
+        return list(verdicts)
+    
+    def validate_columns(self, amounts, recipients: List[str], messages: List[str],
+                         authors: List[str]) -> "BatchVerdicts":
+        """Validate a batch given as columns; requires NumPy
         
-        validation_result['checks_passed'].append('recipient_validation')
+        Amount and recipient checks and the risk scores run as array
+        operations over the whole batch, and each distinct recipient and
+        message is pattern-scanned only once. The rate limit is stateful, so
+        it is applied per author to the tips that pass everything else, in
+        batch order, as is behavior scoring. The fraud model scores every
+        accepted tip in one pass. Per-tip result dicts are only built when
+        read.
         
-        # 3. Spam detection
-        spam_score = 0.0
-        for keyword in self.spam_keywords:
-            if keyword in message:
-                spam_score += 0.2
-                validation_result['risk_score'] += 0.2
+        Behavior scoring stays a Python loop: each tip's features depend on
+        the conservative sketch updates of every tip before it, so it cannot
+        be vectorized without changing verdicts. It is most of the remaining
+        cost when most tips are accepted.
+        """
+        count = len(recipients)
+        now = time.monotonic()
+        amounts = np.asarray(amounts, dtype=np.float64)
+        recipient_lengths = np.fromiter(map(len, recipients), dtype=np.int64, count=count)
         
-        if spam_score >= 0.4:  # Include exact threshold
-            validation_result['checks_failed'].append('spam_detection')
-            validation_result['reason'] = f"Spam detected (score: {spam_score:.2f})"
-            return False, validation_result['reason'], validation_result
+        # Scan each distinct string once; bulk imports repeat handles and messages heavily
+        recipient_ids, recipient_scans = self._scan_distinct(self.recipient_matcher, recipients)
+        message_ids, message_scans = self._scan_distinct(self.spam_matcher, [m.lower() for m in messages])
+        recipient_scores = np.array([score for score, _ in recipient_scans] or [0.0])[recipient_ids]
+        spam_scores = np.array([score for score, _ in message_scans] or [0.0])[message_ids]
+        if self.reputation is not None:
+            _, distinct = self._codes(recipients)
+            reputation_scores = np.array([self.reputation.score(r) for r in distinct] or [0.0])[recipient_ids]
+        else:
+            reputation_scores = np.zeros(count)
         
-        validation_result['checks_passed'].append('spam_detection')
+        stages = np.select(
+            [
+                ~np.isfinite(amounts),
+                amounts < self.min_amount,
+                amounts > self.max_amount,
+                recipient_lengths < 2,
+                recipient_scores >= self.recipient_threshold,
+                reputation_scores >= self.reputation_reject,
+                spam_scores >= self.spam_threshold,
+            ],
+            [STAGE_AMOUNT_INVALID, STAGE_AMOUNT_MIN, STAGE_AMOUNT_MAX, STAGE_RECIPIENT_INVALID,
+             STAGE_RECIPIENT_SUSPICIOUS, STAGE_RECIPIENT_DENYLISTED, STAGE_SPAM],
+            default=STAGE_VALID
+        )
         
-        # 4. Rate limiting (simple implementation)
-        recent_tips = [v for v in self.validation_history if 
-                      asyncio.get_event_loop().time() - v['timestamp'] < 300]  # 5 minutes
+        # Authors are independent, so each author's share of the batch is admitted in one call
+        limited: Dict[int, Tuple[str, float]] = {}
+        candidates = np.flatnonzero(stages == STAGE_VALID)
+        if candidates.size:
+            codes, names = self._codes([authors[i] for i in candidates.tolist()])
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            ranks = np.empty(len(codes), dtype=np.int64)
+            ranks[order] = np.arange(len(codes)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(codes)]))
+            
+            admitted = np.empty(len(names), dtype=np.int64)
+            rejections = {}
+            limiter_now = self.rate_limiter.clock()
+            for code, (name, tip_count) in enumerate(zip(names, np.bincount(codes).tolist())):
+                admitted[code], exceeded = self.rate_limiter.admit(name, tip_count, limiter_now)
+                if exceeded:
+                    rejections[code] = (self._stage_reason(STAGE_RATE_LIMIT, 0.0, exceeded), round(exceeded[2], 2))
+            
+            over = ranks >= admitted[codes]
+            stages[candidates[over]] = STAGE_RATE_LIMIT
+            limited = dict(zip(candidates[over].tolist(), (rejections[c] for c in codes[over].tolist())))
         
-        if len(recent_tips) > 10:  # Max 10 tips per 5 minutes
-            validation_result['checks_failed'].append('rate_limit')
-            validation_result['reason'] = "Rate limit exceeded (max 10 tips per 5 minutes)"
-            return False, validation_result['reason'], validation_result
+        # Accumulated in the order validate_tip adds them, so the floats match exactly
+        risk_scores = (np.where(stages == STAGE_RECIPIENT_SUSPICIOUS, recipient_scores, 0.0)
+                       + np.where(stages >= STAGE_RECIPIENT_DENYLISTED, reputation_scores, 0.0)
+                       + np.where(stages >= STAGE_SPAM, spam_scores, 0.0))
         
-        validation_result['checks_passed'].append('rate_limiting')
+        # Behavior sketches are sequential state: score and count accepted tips in batch order
+        behavior = {}
+        for index in np.flatnonzero(stages == STAGE_VALID).tolist():
+            risk, flags, features = self._score_behavior(authors[index], recipients[index], float(amounts[index]), now)
+            risk_scores[index] += risk
+            behavior[index] = (features, flags)
         
-        # All validations passed
-        validation_result['is_valid'] = True
-        validation_result['reason'] = "All validations passed successfully"
+        model_scores = {}
+        if behavior and (self.scorer is not None or self.history_export is not None):
+            accepted = list(behavior)
+            rows = [feature_row(float(amounts[i]), messages[i], len(message_scans[message_ids[i]][1]),
+                                float(recipient_scores[i]), float(reputation_scores[i]), behavior[i][0])
+                    for i in accepted]
+            if self.scorer is not None:
+                model_scores = dict(zip(accepted, self.scorer.score_rows(rows)))
+                risk_scores[accepted] += self.model_weight * np.array([model_scores[i] for i in accepted])
         
-        # Record validation
-        self.validation_history.append(validation_result)
+        verdicts = BatchVerdicts(self, stages, risk_scores, now, recipient_ids, recipient_scans,
+                                 message_ids, message_scans, spam_scores, reputation_scores, limited, behavior,
+                                 model_scores)
+        if self.history_export is not None and behavior:
+            self._export_records([({'recipient': recipients[i], 'amount': float(amounts[i]), 'author_id': authors[i]},
+                                   row, verdicts.result(i)[2]) for i, row in zip(accepted, rows)])
         
-        return True, validation_result['reason'], validation_result
+        valid = np.flatnonzero(verdicts.is_valid)
+        if self.validation_history.maxlen is not None:
+            valid = valid[-self.validation_history.maxlen:]
+        self.validation_history.extend(verdicts.result(i)[2] for i in valid.tolist())
+        return verdicts
+    
+    @classmethod
+    def _scan_distinct(cls, matcher: PatternMatcher, texts: List[str]):
+        """Pattern-scan each distinct text once; returns per-text indexes into the scans"""
+        codes, distinct = cls._codes(texts)
+        return codes, [matcher.score(text) for text in distinct]
+    
+    @staticmethod
+    def _codes(values: List[str]):
+        """Integer codes for values, plus the distinct values in code order"""
+        positions: Dict[str, int] = {}
+        codes = np.fromiter((positions.setdefault(value, len(positions)) for value in values),
+                            dtype=np.int64, count=len(values))
+        return codes, list(positions)
+    
+    def _stage_reason(self, stage: int, score: float, exceeded) -> str:
+        if stage == STAGE_AMOUNT_INVALID:
+            return "Invalid amount"
+        if stage == STAGE_AMOUNT_MIN:
+            return f"Amount too small (min: {self.min_amount} SOL)"
+        if stage == STAGE_AMOUNT_MAX:
+            return f"Amount too large (max: {self.max_amount} SOL)"
+        if stage == STAGE_RECIPIENT_INVALID:
+            return "Invalid recipient format"
+        if stage == STAGE_RECIPIENT_SUSPICIOUS:
+            return "Suspicious recipient pattern detected"
+        if stage == STAGE_RECIPIENT_DENYLISTED:
+            return "Recipient is on the denylist"
+        if stage == STAGE_SPAM:
+            return f"Spam detected (score: {score:.2f})"
+        if stage == STAGE_RATE_LIMIT:
+            count, seconds, _ = exceeded
+            return f"Rate limit exceeded (max {count} tips per {seconds:g} seconds)"
+        return "All validations passed successfully"
+
+class BatchVerdicts:
+    """Columnar validate_columns output
+    
+    `is_valid`, `stages` and `risk_scores` are arrays over the batch.
+    Indexing or iterating yields the (is_valid, reason, result) tuples that
+    validate_tip returns, built on access.
+    """
+    
+    def __init__(self, validator: TipValidator, stages, risk_scores, timestamp: float,
+                 recipient_ids, recipient_scans, message_ids, message_scans, spam_scores, reputation_scores,
+                 limited, behavior, model_scores):
+        self.stages = stages
+        self.risk_scores = risk_scores
+        self.is_valid = stages == STAGE_VALID
+        self.timestamp = timestamp
+        self._recipient_ids = recipient_ids
+        self._recipient_scans = recipient_scans
+        self._message_ids = message_ids
+        self._message_scans = message_scans
+        self._spam_scores = spam_scores
+        self._reputation_scores = reputation_scores
+        self._limited = limited
+        self._behavior = behavior
+        self._model_scores = model_scores
+        self._reasons = {stage: validator._stage_reason(stage, 0.0, None)
+                         for stage in (STAGE_AMOUNT_INVALID, STAGE_AMOUNT_MIN, STAGE_AMOUNT_MAX, STAGE_RECIPIENT_INVALID,
+                                       STAGE_RECIPIENT_SUSPICIOUS, STAGE_RECIPIENT_DENYLISTED, STAGE_VALID)}
+        self._validator = validator
+    
+    def __len__(self) -> int:
+        return len(self.stages)
+    
+    def __getitem__(self, index: int) -> Tuple[bool, str, Dict[str, Any]]:
+        return self.result(index)
+    
+    def __iter__(self):
+        for index in range(len(self.stages)):
+            yield self.result(index)
+    
+    def result(self, index: int) -> Tuple[bool, str, Dict[str, Any]]:
+        stage = int(self.stages[index])
+        risk_score = float(self.risk_scores[index])
+        passed, failed = STAGE_CHECKS[stage]
+        validation_result = {
+            'is_valid': stage == STAGE_VALID,
+            'reason': self._reasons.get(stage),
+            'checks_passed': passed[:],
+            'checks_failed': failed[:],
+            'risk_score': risk_score,
+            'timestamp': self.timestamp
+        }
+        if stage == STAGE_RECIPIENT_SUSPICIOUS:
+            validation_result['pattern_hits'] = self._recipient_scans[self._recipient_ids[index]][1]
+        elif stage >= STAGE_RECIPIENT_DENYLISTED and self._reputation_scores[index]:
+            validation_result['reputation_score'] = float(self._reputation_scores[index])
+        if stage >= STAGE_SPAM:
+            spam_hits = self._message_scans[self._message_ids[index]][1]
+            if spam_hits:
+                validation_result['spam_hits'] = spam_hits
+            if stage == STAGE_SPAM:
+                validation_result['reason'] = self._validator._stage_reason(stage, float(self._spam_scores[index]), None)
+            elif stage == STAGE_RATE_LIMIT:
+                validation_result['reason'], validation_result['retry_after'] = self._limited[index]
+            else:
+                features, flags = self._behavior[index]
+                validation_result['behavior'] = features
+                if flags:
+                    validation_result['behavior_flags'] = flags
+                if index in self._model_scores:
+                    validation_result['model_score'] = round(self._model_scores[index], 4)
+        return stage == STAGE_VALID, validation_result['reason'], validation_result
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of tips per outcome"""
+        return dict(zip(STAGE_NAMES, np.bincount(self.stages, minlength=len(STAGE_NAMES)).tolist()))
 
 def load_config() -> Dict[str, Any]:
     """Load configuration from environment variables"""
@@ -124,6 +594,9 @@ def load_config() -> Dict[str, Any]:
         "model_temperature": float(os.getenv("MODEL_TEMPERATURE", "0.1")),  # Low temp for consistency
         "model_max_tokens": int(os.getenv("MODEL_MAX_TOKENS", "4000")),
         "timeout_ms": float(os.getenv("TIMEOUT_MS", "60000")),
+        "mention_timeout_ms": int(os.getenv("MENTION_TIMEOUT_MS", "30000")),
+        "transaction_agent_id": os.getenv("TRANSACTION_AGENT_ID", "transaction"),
+        "notification_agent_id": os.getenv("NOTIFICATION_AGENT_ID", "notification"),
     }
     
     # Validate required fields
@@ -166,19 +639,25 @@ Validation criteria:
 - Amount between 0.001 and 100 SOL
 - Valid recipient format
 - No spam keywords in message
-- Rate limiting compliance
+- Rate limiting compliance (per author)
 - Suspicious pattern detection
 
+Tips sent as JSON or as a /tip command are validated and forwarded
+automatically before they reach you. You only receive mentions that could not
+be parsed as a tip. They are listed in the input with their threadId and
+senderId; do not call wait_for_mentions for them.
+
 Process flow:
-1. Use wait_for_mentions to receive tip data
-2. Validate the tip using all criteria
-3. Send validation result back to sender
-4. If valid, create thread with transaction agent
-5. Forward validated tip data to transaction agent
+1. Read each mention in the input
+2. If it describes a tip, reply in the same thread with send_message asking the
+   sender to resend it as JSON: {{"recipient": "alice", "amount": 1.5, "message": "..."}}
+3. Otherwise answer the sender's question about validation briefly
+4. Always mention the sender in your reply
 
 Always be thorough but fair in validation decisions.
 """
         ),
+        ("human", "{input}"),
         ("placeholder", "{agent_scratchpad}")
     ])
     
@@ -196,6 +675,98 @@ Always be thorough but fair in validation decisions.
     agent = create_tool_calling_agent(model, coral_tools, prompt)
     return AgentExecutor(agent=agent, tools=coral_tools, verbose=True)
 
+# Results other agents post back into shared threads; never re-validated
+IGNORED_TYPES = ('validation_result', 'validated_tip', 'transaction_result')
+
+async def send_with_fallback(send_message, thread_id: str, content: str, mentions: List[str]) -> None:
+    """Send a message, dropping all but the first mention if an agent is not in the thread"""
+    mentions = list(dict.fromkeys(agent for agent in mentions if agent))
+    try:
+        await send_message.ainvoke({'threadId': thread_id, 'content': content, 'mentions': mentions})
+    except Exception as e:
+        if len(mentions) < 2:
+            raise
+        logger.warning(f"Send with mentions {mentions} failed ({e}), retrying {mentions[0]} only")
+        await send_message.ainvoke({'threadId': thread_id, 'content': content, 'mentions': mentions[:1]})
+
+async def create_forward_thread(tools: Dict[str, Any], requester: str, config: Dict[str, Any]) -> str:
+    """Open a 'validated-tips' thread with the transaction and notification agents and the requester"""
+    participants = [config["transaction_agent_id"], config["notification_agent_id"], requester]
+    created = await tools['create_thread'].ainvoke({
+        'threadName': 'validated-tips',
+        'participantIds': list(dict.fromkeys(agent for agent in participants if agent))
+    })
+    thread_id = parse_thread_id(created)
+    if thread_id is None:
+        raise RuntimeError(f"Could not read thread ID from create_thread result: {created}")
+    return thread_id
+
+async def forward_to_transaction(tools: Dict[str, Any], requester: str, content: str,
+                                 config: Dict[str, Any], threads: Dict[str, asyncio.Future]) -> None:
+    """Hand a validated tip to the transaction agent
+
+    Tips go to a thread created once per requester, so the transaction
+    result can mention the requester and the notification agent as well.
+    Concurrent tips from a new requester share the one thread being created.
+    """
+    thread = threads.get(requester)
+    if thread is None:
+        thread = threads[requester] = asyncio.ensure_future(create_forward_thread(tools, requester, config))
+    try:
+        thread_id = await asyncio.shield(thread)
+    except Exception:
+        if threads.get(requester) is thread:
+            del threads[requester]
+        raise
+    
+    await tools['send_message'].ainvoke({
+        'threadId': thread_id, 'content': content, 'mentions': [config["transaction_agent_id"]]
+    })
+
+async def process_tip_mention(validator: TipValidator, tools: Dict[str, Any], mention: Dict[str, str],
+                              tip_data: Dict[str, Any], config: Dict[str, Any],
+                              threads: Dict[str, asyncio.Future]) -> None:
+    """Validate a structured tip, reply to the sender and forward it if valid, without the LLM"""
+    # Rate limits and behavior scoring key on the author, so it is whoever sent the message,
+    # never a value the payload claims for itself
+    tip_data['author_id'] = mention.get('senderId') or 'anonymous'
+    # Tips the console did not stamp, e.g. a typed /tip line, are keyed by the message that
+    # carried them so the transaction agent can still drop a repeated forward
+    if not tip_data.get('timestamp') and not tip_data.get('idempotency_key') and mention.get('messageId'):
+        tip_data['idempotency_key'] = f"coral:{mention['threadId']}:{mention['messageId']}"
+    is_valid, reason, result = await validator.validate_tip_async(tip_data)
+    
+    if is_valid:
+        # requested_by lets the transaction agent mention the requester on its result
+        forward = json.dumps({
+            'type': 'validated_tip',
+            'tip_id': tip_data.get('tip_id'),
+            'tip': dict(tip_data, requested_by=mention['senderId']),
+            'validation': result
+        }, default=str)
+        try:
+            await forward_to_transaction(tools, mention['senderId'], forward, config, threads)
+        except Exception as e:
+            logger.error(f"Forwarding tip to transaction agent failed: {e}")
+            result = dict(result, forwarded=False, forward_error=str(e))
+    
+    # Rejections also go to the notification agent; accepted tips reach it via the transaction result
+    # tip_id lets a requester with several tips in flight match this reply to its tip
+    reply = json.dumps({'type': 'validation_result', 'tip_id': tip_data.get('tip_id'), 'tip': tip_data,
+                        'result': result}, default=str)
+    mentions = [mention['senderId']] if is_valid else [mention['senderId'], config["notification_agent_id"]]
+    await send_with_fallback(tools['send_message'], mention['threadId'], reply, mentions)
+
+def log_task_error(task: asyncio.Task) -> None:
+    """Done callback for tip tasks, which nothing awaits: log what they raised"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Tip task failed: {task.exception()!r}", exc_info=task.exception())
+
+def looks_like_messages(raw: Any) -> bool:
+    """Whether an unparsed wait_for_mentions result still seems to carry messages"""
+    text = str(raw or '').lower()
+    return 'sender' in text and 'thread' in text
+
 async def main():
     """Main validation agent loop"""
     print("✅ Starting Validation Agent")
@@ -224,22 +795,60 @@ async def main():
         agent_executor = await create_validation_agent(coral_tools)
         validator = TipValidator()
         
+        tools = tools_by_name(coral_tools)
+        wait_for_mentions = tools["wait_for_mentions"]
+        forward_threads: Dict[str, asyncio.Future] = {}
+        tip_tasks = set()
+        
         print("🎯 Validation agent ready!")
         
-        # Main validation loop
-        while True:
-            try:
-                # Listen for validation requests
-                await agent_executor.ainvoke({
-                    "input": "Listen for tip validation requests and process them",
-                    "agent_scratchpad": []
-                })
-                await asyncio.sleep(5)
-                
-            except Exception as e:
-                print(f"❌ Validation error: {e}")
-                logger.error(f"Validation error: {e}")
-                await asyncio.sleep(10)
+        try:
+            # Main validation loop
+            while True:
+                try:
+                    # Listen for validation requests
+                    raw = await wait_for_mentions.ainvoke({"timeoutMs": config["mention_timeout_ms"]})
+                    mentions = parse_mentions(raw)
+                    unparsed = []
+                    
+                    # Direct path: parsed tips go straight to the validator
+                    for mention in mentions:
+                        if message_type(mention['content']) in IGNORED_TYPES:
+                            continue
+                        tip_data = parse_tip_payload(mention['content'])
+                        if tip_data is None:
+                            unparsed.append(mention)
+                            continue
+                        
+                        task = asyncio.ensure_future(process_tip_mention(
+                            validator, tools, mention, tip_data, config, forward_threads
+                        ))
+                        tip_tasks.add(task)
+                        task.add_done_callback(tip_tasks.discard)
+                        task.add_done_callback(log_task_error)
+                    
+                    # The LLM only handles what the direct path could not parse
+                    if unparsed:
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {json.dumps(unparsed)}",
+                            "agent_scratchpad": []
+                        })
+                    elif not mentions and looks_like_messages(raw):
+                        await agent_executor.ainvoke({
+                            "input": f"Mentions to handle: {raw}",
+                            "agent_scratchpad": []
+                        })
+                    
+                except Exception as e:
+                    print(f"❌ Validation error: {e}")
+                    logger.error(f"Validation error: {e}")
+                    await asyncio.sleep(10)
+        finally:
+            for task in tip_tasks:
+                task.cancel()
+            await asyncio.gather(*tip_tasks, return_exceptions=True)
+            # Shuts down the rule process pool and closes the rate limit database and history export
+            validator.close()
                 
     except Exception as e:
         print(f"💥 Fatal error in validation agent: {e}")
@@ -0,0 +1,104 @@
+"""
+Pattern Matching
+Aho-Corasick automaton for scanning text against many weighted patterns at once
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def load_patterns(path: str, default_weight: float) -> Dict[str, float]:
+    """Read weighted patterns from a file
+
+    One pattern per line, optionally followed by whitespace and a weight.
+    Blank lines and lines starting with '#' are skipped. Patterns are
+    lowercased because scans are case-insensitive.
+    """
+    patterns = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            pattern, weight = line, default_weight
+            head, _, tail = line.rpartition(' ')
+            if head:
+                try:
+                    pattern, weight = head.rstrip(), float(tail)
+                except ValueError:
+                    pass
+            patterns[pattern.lower()] = weight
+    return patterns
+
+
+class PatternMatcher:
+    """Case-insensitive multi-pattern matcher
+
+    The automaton is built once from all patterns, and a scan walks the text
+    a single time however many patterns there are. Each node's output
+    includes the patterns of its suffix links, so no link chasing is needed
+    to report matches.
+    """
+
+    def __init__(self, patterns: Dict[str, float]):
+        self.patterns: List[str] = [p for p in patterns if p]
+        self.weights: List[float] = [patterns[p] for p in self.patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    @classmethod
+    def from_file(cls, path: Optional[str], defaults: Iterable[str], default_weight: float) -> "PatternMatcher":
+        """Matcher for the patterns in `path`, or for `defaults` when no path is set"""
+        if path:
+            return cls(load_patterns(path, default_weight))
+        return cls({pattern: default_weight for pattern in defaults})
+
+    def _build(self) -> None:
+        goto, fail, output = self._goto, self._fail, self._output
+        for index, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                child = goto[node].get(char)
+                if child is None:
+                    child = len(goto)
+                    goto[node][char] = child
+                    goto.append({})
+                    fail.append(0)
+                    output.append(())
+                node = child
+            output[node] += (index,)
+
+        # Breadth-first, so every suffix link target is finished before use
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                link = fail[node]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(char, 0)
+                output[child] += output[fail[child]]
+
+    def scan(self, text: str) -> Dict[int, int]:
+        """Count occurrences of each pattern in text, keyed by pattern index"""
+        goto, fail, output = self._goto, self._fail, self._output
+        hits: Dict[int, int] = {}
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                hits[index] = hits.get(index, 0) + 1
+        return hits
+
+    def score(self, text: str) -> Tuple[float, List[str]]:
+        """Summed weight of the distinct patterns found in text, and those patterns"""
+        hits = self.scan(text)
+        return sum(self.weights[i] for i in hits), [self.patterns[i] for i in hits]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
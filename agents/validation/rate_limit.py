@@ -0,0 +1,231 @@
+"""
+Rate Limiting
+Per-author sliding-window limits with memory bounded by active authors
+"""
+
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+# (count, seconds, retry_after) of an exceeded window
+Exceeded = Tuple[int, float, float]
+
+
+def parse_limits(spec: str) -> List[Tuple[int, float]]:
+    """Parse 'count/seconds' pairs such as '10/300,3/10'"""
+    limits = []
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        count, _, seconds = part.partition('/')
+        limits.append((int(count), float(seconds)))
+    if not limits:
+        raise ValueError(f"No rate limits in {spec!r}")
+    return limits
+
+
+class SlidingWindowLimiter:
+    """Sliding-log rate limiter keyed by author
+
+    Each author keeps a deque of their most recent accepted tip times, capped
+    at the largest window count, so a window of (count, seconds) is exceeded
+    when the count-th most recent tip falls inside it. Authors are kept in
+    least-recently-active order and dropped once their newest tip is older
+    than the longest window; `max_authors` caps memory under a flood of new
+    authors by evicting the least recently active first.
+
+    State is per process; see SqliteRateLimiter for limits shared between
+    validation agent replicas.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, limits: List[Tuple[int, float]], max_authors: int = 100_000):
+        self.limits = sorted(limits, key=lambda limit: limit[1])
+        self.max_authors = max_authors
+        self._depth = max(count for count, _ in self.limits)
+        self._horizon = max(seconds for _, seconds in self.limits)
+        self._logs: "OrderedDict[str, deque]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        """Drop authors idle for longer than the longest window"""
+        logs = self._logs
+        while logs:
+            author, log = next(iter(logs.items()))
+            if now - log[-1] < self._horizon:
+                break
+            del logs[author]
+
+    def check(self, author: str, now: Optional[float] = None) -> Optional[Tuple[int, float, float]]:
+        """Return the (count, seconds, retry_after) of the first exceeded window, or None"""
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        log = self._logs.get(author)
+        if log is None:
+            return None
+        for count, seconds in self.limits:
+            if len(log) >= count and now - log[-count] < seconds:
+                return count, seconds, log[-count] + seconds - now
+        return None
+
+    def record(self, author: str, now: Optional[float] = None) -> None:
+        """Count an accepted tip against the author's windows"""
+        now = time.monotonic() if now is None else now
+        log = self._logs.get(author)
+        if log is None:
+            log = self._logs[author] = deque(maxlen=self._depth)
+            if len(self._logs) > self.max_authors:
+                self._logs.popitem(last=False)
+        else:
+            self._logs.move_to_end(author)
+        log.append(now)
+
+    def acquire(self, author: str, now: Optional[float] = None) -> Optional[Exceeded]:
+        """check, then record the tip if no window is exceeded"""
+        now = time.monotonic() if now is None else now
+        exceeded = self.check(author, now)
+        if exceeded is None:
+            self.record(author, now)
+        return exceeded
+
+    def admit(self, author: str, count: int, now: Optional[float] = None) -> Tuple[int, Optional[Exceeded]]:
+        """Accept up to `count` simultaneous tips from one author
+
+        Equivalent to calling check and record for each tip in turn at the
+        same instant. Returns how many were accepted and, if any were not,
+        the exceeded window as check reports it.
+        """
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        log = self._logs.get(author)
+        accepted = count
+        for limit, seconds in self.limits:
+            recent = 0
+            for stamp in reversed(log or ()):
+                if recent >= limit or now - stamp >= seconds:
+                    break
+                recent += 1
+            accepted = min(accepted, limit - recent)
+
+        accepted = max(accepted, 0)
+        if accepted:
+            if log is None:
+                self.record(author, now)
+                accepted_rest = accepted - 1
+                log = self._logs[author]
+            else:
+                self._logs.move_to_end(author)
+                accepted_rest = accepted
+            log.extend([now] * accepted_rest)
+        return accepted, (self.check(author, now) if accepted < count else None)
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def close(self) -> None:
+        """Nothing to release; here so backends are interchangeable"""
+
+
+class SqliteRateLimiter:
+    """Sliding-log rate limiter shared by every process that opens the same database
+
+    Same limits and results as SlidingWindowLimiter, but the tip log lives
+    in a SQLite database in WAL mode. acquire and admit each run as one
+    IMMEDIATE transaction, so checking and recording a tip is atomic across
+    processes and N replicas together stay within one global limit.
+    Timestamps are wall-clock seconds, since monotonic clocks are not
+    comparable between processes on every platform. Entries older than the
+    longest window are pruned every `prune_every` writes.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, path: str, limits: List[Tuple[int, float]], prune_every: int = 1000,
+                 busy_timeout_ms: int = 5000):
+        self.path = path
+        self.limits = sorted(limits, key=lambda limit: limit[1])
+        self.prune_every = prune_every
+        self._depth = max(count for count, _ in self.limits)
+        self._horizon = max(seconds for _, seconds in self.limits)
+        self._writes = 0
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rate_log (author TEXT NOT NULL, stamp REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS rate_log_author ON rate_log (author, stamp)")
+
+    def _recent(self, author: str, now: float) -> List[float]:
+        """The author's most recent stamps inside the longest window, newest first"""
+        return [stamp for stamp, in self._db.execute(
+            "SELECT stamp FROM rate_log WHERE author = ? AND stamp > ? ORDER BY stamp DESC LIMIT ?",
+            (author, now - self._horizon, self._depth)
+        )]
+
+    def _exceeded(self, recent: List[float], now: float) -> Optional[Exceeded]:
+        for count, seconds in self.limits:
+            if len(recent) >= count and now - recent[count - 1] < seconds:
+                return count, seconds, recent[count - 1] + seconds - now
+        return None
+
+    def check(self, author: str, now: Optional[float] = None) -> Optional[Exceeded]:
+        """Return the (count, seconds, retry_after) of the first exceeded window, or None"""
+        now = time.time() if now is None else now
+        return self._exceeded(self._recent(author, now), now)
+
+    def record(self, author: str, now: Optional[float] = None) -> None:
+        """Count an accepted tip against the author's windows"""
+        self.admit(author, 1, now)
+
+    def acquire(self, author: str, now: Optional[float] = None) -> Optional[Exceeded]:
+        """Atomically check, then record the tip if no window is exceeded"""
+        return self.admit(author, 1, now)[1]
+
+    def admit(self, author: str, count: int, now: Optional[float] = None) -> Tuple[int, Optional[Exceeded]]:
+        """Accept up to `count` simultaneous tips from one author in one transaction
+
+        Returns how many were accepted and, if any were not, the exceeded
+        window as check reports it.
+        """
+        now = time.time() if now is None else now
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            recent = self._recent(author, now)
+            accepted = count
+            for limit, seconds in self.limits:
+                inside = sum(1 for stamp in recent[:limit] if now - stamp < seconds)
+                accepted = min(accepted, limit - inside)
+            accepted = max(accepted, 0)
+            if accepted:
+                db.executemany("INSERT INTO rate_log (author, stamp) VALUES (?, ?)", [(author, now)] * accepted)
+                self._writes += 1
+                if self.prune_every and self._writes % self.prune_every == 0:
+                    db.execute("DELETE FROM rate_log WHERE stamp <= ?", (now - self._horizon,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return accepted, (self._exceeded([now] * accepted + recent, now) if accepted < count else None)
+
+    def __len__(self) -> int:
+        """Authors with tips inside the longest window"""
+        return self._db.execute(
+            "SELECT COUNT(DISTINCT author) FROM rate_log WHERE stamp > ?", (time.time() - self._horizon,)
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def make_limiter(backend: str, limits: List[Tuple[int, float]], max_authors: int = 100_000):
+    """Rate limiter for a backend spec: 'memory' (per process) or 'sqlite:<path>' (shared)"""
+    kind, _, target = backend.partition(':')
+    if kind == 'memory':
+        return SlidingWindowLimiter(limits, max_authors=max_authors)
+    if kind == 'sqlite' and target:
+        return SqliteRateLimiter(target, limits)
+    raise ValueError(f"Unknown rate limit backend {backend!r} (expected 'memory' or 'sqlite:<path>')")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Recipient Reputation Index
+Memory-mapped denylist/reputation scores behind a Bloom filter, built offline
+
+File layout (little endian):
+  header   magic, hash count, key count, Bloom filter bits
+  bloom    Bloom filter over the key hashes
+  keys     sorted uint64 hashes of the normalized handles
+  scores   float32 risk score per key, 0 (trusted) to 1 (denylisted)
+"""
+
+import argparse
+import bisect
+import hashlib
+import math
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, Optional, Tuple
+
+MAGIC = b'TIPREP01'
+HEADER = struct.Struct('<8sIIQ')
+
+
+def handle_hash(handle: str) -> int:
+    """64-bit hash of a normalized handle, stable across processes and builds"""
+    normalized = handle.strip().lstrip('@').lower().encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(normalized, digest_size=8).digest(), 'little')
+
+
+def _bloom_positions(h: int, hashes: int, bits: int):
+    h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def build_index(entries: Iterable[Tuple[str, float]], path: str, bits_per_key: int = 10) -> int:
+    """Write an index for (handle, score) entries and return the number of keys
+
+    A later entry for the same handle replaces an earlier one. The file is
+    written beside `path` and renamed into place, so readers never see a
+    partial index.
+    """
+    scores = {}
+    for handle, score in entries:
+        scores[handle_hash(handle)] = score
+    keys = sorted(scores)
+
+    bits = max(64, (len(keys) * bits_per_key + 63) // 64 * 64)
+    hashes = max(1, round(bits_per_key * math.log(2)))
+    bloom = bytearray(bits // 8)
+    for key in keys:
+        for position in _bloom_positions(key, hashes, bits):
+            bloom[position >> 3] |= 1 << (position & 7)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, hashes, len(keys), bits))
+        f.write(bloom)
+        f.write(array('Q', keys).tobytes())
+        f.write(array('f', (scores[key] for key in keys)).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+def read_entries(path: str, default_score: float = 1.0):
+    """Yield (handle, score) from a text list: one handle per line, optionally followed by a score"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            handle, _, score = line.partition(' ')
+            yield handle, float(score) if score.strip() else default_score
+
+
+class ReputationIndex:
+    """Read-only view of an index file
+
+    The file is memory-mapped, so every validation process on a host shares
+    one copy through the page cache. A lookup hashes the handle and checks
+    the Bloom filter; only possible members pay for a binary search over
+    the sorted keys.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.hashes, self.count, self.bits = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a reputation index")
+
+        self._view = view = memoryview(self._map)
+        bloom_start = HEADER.size
+        keys_start = bloom_start + self.bits // 8
+        scores_start = keys_start + 8 * self.count
+        self._bloom = view[bloom_start:keys_start]
+        self._keys = view[keys_start:scores_start].cast('Q')
+        self._scores = view[scores_start:scores_start + 4 * self.count].cast('f')
+        self.lookups = 0
+        self.bloom_rejects = 0
+
+    def score(self, handle: str) -> float:
+        """Reputation risk for a handle, 0.0 when it is not in the index"""
+        found = self.lookup(handle)
+        return 0.0 if found is None else found
+
+    def lookup(self, handle: str) -> Optional[float]:
+        self.lookups += 1
+        key = handle_hash(handle)
+        bloom = self._bloom
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.bits
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                self.bloom_rejects += 1
+                return None
+
+        index = bisect.bisect_left(self._keys, key)
+        if index < self.count and self._keys[index] == key:
+            return round(self._scores[index], 6)
+        return None
+
+    def __contains__(self, handle: str) -> bool:
+        return self.lookup(handle) is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        self._bloom.release()
+        self._keys.release()
+        self._scores.release()
+        self._view.release()
+        self._map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a recipient reputation index")
+    parser.add_argument("source", help="Text list: one handle per line, optionally followed by a 0-1 score")
+    parser.add_argument("output", help="Index file to write")
+    parser.add_argument("--bits-per-key", type=int, default=10, help="Bloom filter size (10 gives ~1%% false positives)")
+    parser.add_argument("--default-score", type=float, default=1.0, help="Score for handles listed without one")
+    args = parser.parse_args()
+
+    count = build_index(read_entries(args.source, args.default_score), args.output, args.bits_per_key)
+    print(f"Wrote {count} handles to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
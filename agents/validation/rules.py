@@ -0,0 +1,259 @@
+"""
+Validation Rules
+Rule registry and a pipeline that orders rules by measured cost and rejection rate
+"""
+
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# What a rule check returns: (failed_check or None, reason, risk_delta, extra_fields).
+# A clean pass with nothing to report may return None instead.
+RuleOutcome = Optional[Tuple[Optional[str], str, float, Optional[Dict[str, Any]]]]
+
+# Checks installed in each pool worker, so they are pickled once per worker rather than per call
+_WORKER_CHECKS: Dict[str, Callable[[Dict[str, Any]], RuleOutcome]] = {}
+
+
+def _install_checks(checks: Dict[str, Callable[[Dict[str, Any]], RuleOutcome]]) -> None:
+    _WORKER_CHECKS.update(checks)
+
+
+def _run_check(name: str, tip_data: Dict[str, Any]) -> RuleOutcome:
+    return _WORKER_CHECKS[name](tip_data)
+
+
+class Rule:
+    """One validation check plus its runtime counters
+
+    `passed` is the name added to checks_passed when the rule passes, if
+    any. Rules marked `fixed` keep their registration order after every
+    reorderable rule; `cpu_bound` rules run in the pipeline's process pool
+    when it has one, so their check must be picklable. `stateful` rules
+    depend on more than the tip itself (like the rate limit), so their
+    outcome is never reused between tips; they are always fixed.
+    """
+
+    __slots__ = ('name', 'check', 'passed', 'fixed', 'cpu_bound', 'stateful', 'calls', 'rejections', 'timed',
+                 'total_ns')
+
+    def __init__(self, name: str, check: Callable[[Dict[str, Any]], RuleOutcome], passed: Optional[str] = None,
+                 fixed: bool = False, cpu_bound: bool = False, stateful: bool = False):
+        self.name = name
+        self.check = check
+        self.passed = passed
+        self.fixed = fixed or stateful
+        self.cpu_bound = cpu_bound
+        self.stateful = stateful
+        self.calls = 0
+        self.rejections = 0
+        self.timed = 0
+        self.total_ns = 0
+
+    @property
+    def mean_cost_ns(self) -> float:
+        return self.total_ns / self.timed if self.timed else 0.0
+
+    @property
+    def rejection_rate(self) -> float:
+        # Laplace-smoothed so new and never-rejecting rules still get a finite rank
+        return (self.rejections + 1) / (self.calls + 2)
+
+    def rank(self) -> float:
+        """Expected cost paid per rejection; lower runs earlier"""
+        return self.mean_cost_ns / self.rejection_rate
+
+
+class RulePipeline:
+    """Runs rules in order until one rejects
+
+    Every `reorder_every` runs the reorderable rules are sorted by cost over
+    rejection rate, which minimizes the expected cost of reaching a verdict
+    for independent rules. Calls and rejections are counted on every run;
+    rule cost is timed on one run in `timing_sample` to keep clock reads off
+    the common path. Rules that depend on earlier rules having passed
+    (like the rate limit, which only counts tips that pass everything else)
+    should be registered as fixed.
+
+    Passing `stateful=False` to run applies only the rules whose outcome
+    depends on the tip alone, and `stateful=True` only the rest, so a
+    caller can reuse the first part for repeated tips.
+    """
+
+    def __init__(self, reorder_every: int = 1000, process_workers: int = 0, timing_sample: int = 8):
+        self.reorder_every = reorder_every
+        self.timing_sample = max(1, timing_sample)
+        self.process_workers = process_workers
+        self.rules: List[Rule] = []
+        self.order: List[Rule] = []
+        self._stateless: List[Rule] = []
+        self._stateful: List[Rule] = []
+        self.runs = 0
+        self.reorders = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def register(self, rule: Rule) -> Rule:
+        if any(existing.name == rule.name for existing in self.rules):
+            raise ValueError(f"Rule {rule.name!r} is already registered")
+        self.rules.append(rule)
+        if rule.fixed:
+            self.order.append(rule)
+        else:
+            # New reorderable rules run after existing ones until the next reorder
+            first_fixed = next((i for i, r in enumerate(self.order) if r.fixed), len(self.order))
+            self.order.insert(first_fixed, rule)
+        self._split()
+        return rule
+
+    def reorder(self) -> None:
+        reorderable = sorted((rule for rule in self.rules if not rule.fixed), key=Rule.rank)
+        self.order = reorderable + [rule for rule in self.rules if rule.fixed]
+        self.reorders += 1
+        self._split()
+
+    def set_order(self, names: List[str]) -> None:
+        """Run rules in the given order until the next reorder; fixed rules still run last"""
+        rules = {rule.name: rule for rule in self.rules}
+        order = [rules[name] for name in names]
+        if len(order) != len(self.rules) or len(set(names)) != len(names):
+            raise ValueError("set_order needs every registered rule exactly once")
+        self.order = [rule for rule in order if not rule.fixed] + [rule for rule in order if rule.fixed]
+        self._split()
+
+    def _split(self) -> None:
+        self._stateless = [rule for rule in self.order if not rule.stateful]
+        self._stateful = [rule for rule in self.order if rule.stateful]
+
+    def _tick(self) -> bool:
+        """Count a run, reorder when due, and say whether to time this run"""
+        self.runs += 1
+        if self.reorder_every and self.runs % self.reorder_every == 0:
+            self.reorder()
+        return self.runs % self.timing_sample == 0
+
+    @staticmethod
+    def _apply(rule: Rule, outcome: RuleOutcome, validation_result: Dict[str, Any]) -> bool:
+        failed, reason, risk, extra = outcome
+        validation_result['risk_score'] += risk
+        if extra:
+            validation_result.update(extra)
+        if failed:
+            rule.rejections += 1
+            validation_result['checks_failed'].append(failed)
+            validation_result['reason'] = reason
+            return False
+        if rule.passed:
+            validation_result['checks_passed'].append(rule.passed)
+        return True
+
+    def _select(self, stateful: Optional[bool]) -> List[Rule]:
+        if stateful is None:
+            return self.order
+        return self._stateful if stateful else self._stateless
+
+    def run(self, tip_data: Dict[str, Any], validation_result: Dict[str, Any],
+            stateful: Optional[bool] = None) -> bool:
+        """Apply rules to a tip in the current order; False as soon as one rejects"""
+        # The stateful rules alone do not count as a run, and are not timed
+        timed = self._tick() if stateful is not True else False
+        clock = time.perf_counter_ns
+        passed = validation_result['checks_passed']
+        for rule in self._select(stateful):
+            rule.calls += 1
+            if timed:
+                start = clock()
+                outcome = rule.check(tip_data)
+                rule.total_ns += clock() - start
+                rule.timed += 1
+            else:
+                outcome = rule.check(tip_data)
+            if outcome is None:
+                if rule.passed:
+                    passed.append(rule.passed)
+            elif not self._apply(rule, outcome, validation_result):
+                return False
+        return True
+
+    async def run_async(self, tip_data: Dict[str, Any], validation_result: Dict[str, Any],
+                        stateful: Optional[bool] = None) -> bool:
+        """Like run, but CPU-bound rules execute in the process pool"""
+        timed = self._tick() if stateful is not True else False
+        clock = time.perf_counter_ns
+        for rule in self._select(stateful):
+            rule.calls += 1
+            start = clock() if timed else 0
+            if rule.cpu_bound and self.process_workers > 0:
+                outcome = await asyncio.get_running_loop().run_in_executor(
+                    self._get_pool(), _run_check, rule.name, tip_data
+                )
+            else:
+                outcome = rule.check(tip_data)
+            if timed:
+                rule.total_ns += clock() - start
+                rule.timed += 1
+            if outcome is None:
+                if rule.passed:
+                    validation_result['checks_passed'].append(rule.passed)
+            elif not self._apply(rule, outcome, validation_result):
+                return False
+        return True
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            checks = {rule.name: rule.check for rule in self.rules if rule.cpu_bound}
+            self._pool = ProcessPoolExecutor(self.process_workers, initializer=_install_checks, initargs=(checks,))
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-rule call, rejection and timing counters, in current order"""
+        return {
+            'runs': self.runs,
+            'reorders': self.reorders,
+            'order': [rule.name for rule in self.order],
+            'rules': {
+                rule.name: {
+                    'calls': rule.calls,
+                    'rejections': rule.rejections,
+                    'rejection_rate': round(rule.rejections / rule.calls, 4) if rule.calls else 0.0,
+                    'mean_us': round(rule.mean_cost_ns / 1000, 3),
+                    'timed_calls': rule.timed,
+                    'cpu_bound': rule.cpu_bound,
+                    'fixed': rule.fixed,
+                    'stateful': rule.stateful
+                }
+                for rule in self.rules
+            }
+        }
+
+
+class PatternCheck:
+    """Picklable rule check that scores one tip field with a PatternMatcher
+
+    Rejects when the summed pattern weight reaches `threshold`. With
+    `risk_on_pass` the score also counts toward risk when it stays below
+    the threshold.
+    """
+
+    def __init__(self, matcher, field: str, threshold: float, failed_check: str, reason: str,
+                 hits_key: str, risk_on_pass: bool = False):
+        self.matcher = matcher
+        self.field = field
+        self.threshold = threshold
+        self.failed_check = failed_check
+        self.reason = reason
+        self.hits_key = hits_key
+        self.risk_on_pass = risk_on_pass
+
+    def __call__(self, tip_data: Dict[str, Any]) -> RuleOutcome:
+        score, hits = self.matcher.score(tip_data.get(self.field) or '')
+        if score >= self.threshold:
+            return self.failed_check, self.reason.format(score=score), score, {self.hits_key: hits}
+        if hits and self.risk_on_pass:
+            return None, '', score, {self.hits_key: hits}
+        return None
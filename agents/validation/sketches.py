@@ -0,0 +1,266 @@
+"""
+Behavior Sketches
+Fixed-memory streaming summaries of who tips whom, how often and how much
+"""
+
+import math
+import time
+from array import array
+from typing import Any, Dict, Optional
+
+MASK64 = (1 << 64) - 1
+
+# 2 ** -rank for every possible HyperLogLog register value
+INVERSE_POWERS = [2.0 ** -rank for rank in range(66)]
+
+
+def _hash(key) -> int:
+    """64-bit hash of a key; stable within one process, which is all the sketches need"""
+    return hash(key) & MASK64
+
+
+class CountMinSketch:
+    """Approximate counts in width x depth counters, never underestimating
+
+    Counters are split into a current and a previous generation. `rotate`
+    discards the previous one, so estimates cover the last one to two
+    rotation periods. Counters saturate at the maximum of `typecode`; byte
+    counters fit four times the width in the same memory when only small
+    counts matter.
+    """
+
+    def __init__(self, width: int = 16384, depth: int = 4, typecode: str = 'I'):
+        self.width = width
+        self.depth = depth
+        self.typecode = typecode
+        self._itemsize = array(typecode).itemsize
+        self._max = (1 << (8 * self._itemsize)) - 1
+        self._generations = [[self._zeros() for _ in range(depth)] for _ in range(2)]
+
+    def _zeros(self) -> array:
+        return array(self.typecode, bytes(self._itemsize * self.width))
+
+    def _cells(self, h: int):
+        # Double hashing: row i uses h1 + i * h2
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, h: int, count: int = 1) -> None:
+        rows = self._generations[0]
+        cells = self._cells(h)
+        # Conservative update: only raise counters that are at the current minimum
+        target = min([row[cell] for row, cell in zip(rows, cells)]) + count
+        if target > self._max:
+            target = self._max
+        for row, cell in zip(rows, cells):
+            if row[cell] < target:
+                row[cell] = target
+
+    def estimate(self, h: int) -> int:
+        cells = self._cells(h)
+        current, previous = self._generations
+        return (min([row[cell] for row, cell in zip(current, cells)])
+                + min([row[cell] for row, cell in zip(previous, cells)]))
+
+    def increment(self, h: int) -> int:
+        """Add one to a key and return its estimate from before the add"""
+        cells = self._cells(h)
+        current, previous = self._generations
+        counts = [row[cell] for row, cell in zip(current, cells)]
+        before = min(counts)
+        if before < self._max:
+            for row, cell, count in zip(current, cells, counts):
+                if count == before:
+                    row[cell] = before + 1
+        return before + min([row[cell] for row, cell in zip(previous, cells)])
+
+    def rotate(self) -> None:
+        current, previous = self._generations
+        for row in previous:
+            row[:] = self._zeros()
+        self._generations = [previous, current]
+
+    @property
+    def nbytes(self) -> int:
+        return 2 * self._itemsize * self.width * self.depth
+
+
+class HyperLogLogTable:
+    """Distinct-count estimates for many keys in one fixed table
+
+    Like a count-min sketch whose cells are HyperLogLog register sets: each
+    key maps to one set of 2**precision registers in each of `depth` rows,
+    and its estimate is the smallest across rows. Keys sharing a set share
+    its registers, which can only overstate a key's distinct count; taking
+    the minimum keeps that overstatement to the luckiest row. Registers have
+    a current and a previous generation like CountMinSketch; estimates merge
+    both.
+    """
+
+    def __init__(self, buckets: int = 4096, precision: int = 5, depth: int = 2):
+        self.buckets = buckets
+        self.precision = precision
+        self.depth = depth
+        self.registers = 1 << precision
+        self._generations = [bytearray(depth * buckets * self.registers) for _ in range(2)]
+        m = self.registers
+        self._alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+
+    def _bases(self, key_hash: int):
+        h1, h2 = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        span = self.buckets * self.registers
+        return [row * span + ((h1 + row * h2) % self.buckets) * self.registers for row in range(self.depth)]
+
+    def add(self, key_hash: int, item_hash: int) -> None:
+        index = item_hash & (self.registers - 1)
+        rest = item_hash >> self.precision
+        rank = (rest & -rest).bit_length() if rest else 64 - self.precision + 1
+        table = self._generations[0]
+        for base in self._bases(key_hash):
+            if table[base + index] < rank:
+                table[base + index] = rank
+
+    def estimate(self, key_hash: int) -> float:
+        """Distinct items added under a key across both generations"""
+        m = self.registers
+        current, previous = self._generations
+        best = None
+        for base in self._bases(key_hash):
+            registers = bytes(map(max, current[base:base + m], previous[base:base + m]))
+            zeros = registers.count(0)
+            if zeros == m:
+                return 0.0
+            if zeros and zeros > 0.3 * m:
+                # Small range: linear counting is the better estimator
+                estimate = m * math.log(m / zeros)
+            else:
+                estimate = self._alpha * m * m / sum(map(INVERSE_POWERS.__getitem__, registers))
+            best = estimate if best is None else min(best, estimate)
+        return best
+
+    def rotate(self) -> None:
+        current, previous = self._generations
+        previous[:] = bytes(len(previous))
+        self._generations = [previous, current]
+
+    @property
+    def nbytes(self) -> int:
+        return 2 * len(self._generations[0])
+
+
+class EwmaTable:
+    """Exponentially weighted moving averages for many keys in a fixed table"""
+
+    def __init__(self, buckets: int = 16384, alpha: float = 0.2):
+        self.buckets = buckets
+        self.alpha = alpha
+        self._values = array('d', bytes(8 * buckets))
+        self._counts = array('I', bytes(4 * buckets))
+
+    def update(self, key_hash: int, value: float) -> None:
+        slot = key_hash % self.buckets
+        if self._counts[slot]:
+            self._values[slot] += self.alpha * (value - self._values[slot])
+        else:
+            self._values[slot] = value
+        if self._counts[slot] < 0xFFFFFFFF:
+            self._counts[slot] += 1
+
+    def get(self, key_hash: int):
+        """(average, samples) for a key"""
+        slot = key_hash % self.buckets
+        return self._values[slot], self._counts[slot]
+
+    @property
+    def nbytes(self) -> int:
+        return 12 * self.buckets
+
+
+class BehaviorSketches:
+    """Rolling tip-behavior features per author and recipient in fixed memory
+
+    Counts and distinct-recipient estimates cover the current and previous
+    `window_seconds` generations, so features span between one and two
+    windows; generations rotate lazily on access. Amount averages are not
+    windowed and adapt through the EWMA instead.
+
+    An author cannot have tipped more distinct recipients than tips, so the
+    distinct-recipient estimate is skipped until the author's tip count
+    reaches `fanout_min`, and the tip count is reported in its place.
+    """
+
+    def __init__(self, window_seconds: float = 600.0, width: int = 16384, depth: int = 4,
+                 pair_width: int = 1 << 18, hll_buckets: int = 4096, hll_precision: int = 5,
+                 ewma_buckets: int = 16384, ewma_alpha: float = 0.2, fanout_min: int = 0):
+        self.window_seconds = window_seconds
+        self.fanout_min = fanout_min
+        self._tips = CountMinSketch(width, depth)
+        # Far more distinct pairs than authors, but wash detection only needs small counts
+        self._pairs = CountMinSketch(pair_width, depth, typecode='B')
+        self._fanout = HyperLogLogTable(hll_buckets, hll_precision)
+        self._amounts = EwmaTable(ewma_buckets, ewma_alpha)
+        self._generation_start: Optional[float] = None
+
+    def _rotate(self, now: float) -> None:
+        if self._generation_start is None:
+            self._generation_start = now
+            return
+        elapsed = now - self._generation_start
+        if elapsed < self.window_seconds:
+            return
+        # Idle for two windows or more: both generations are stale
+        for _ in range(1 if elapsed < 2 * self.window_seconds else 2):
+            self._tips.rotate()
+            self._pairs.rotate()
+            self._fanout.rotate()
+        self._generation_start = now
+
+    def observe(self, author: str, recipient: str, amount: float, now: Optional[float] = None) -> None:
+        """Record one accepted tip"""
+        self._rotate(time.monotonic() if now is None else now)
+        author_hash = _hash(author)
+        self._tips.add(author_hash)
+        self._pairs.add(_hash((author, recipient)))
+        self._fanout.add(author_hash, _hash(recipient))
+        self._amounts.update(author_hash, amount)
+
+    def features(self, author: str, recipient: str, amount: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """Behavior features for a tip, from everything observed before it"""
+        self._rotate(time.monotonic() if now is None else now)
+        author_hash = _hash(author)
+        return self._features(author_hash, self._tips.estimate(author_hash),
+                              self._pairs.estimate(_hash((author, recipient))), author, recipient, amount)
+
+    def record(self, author: str, recipient: str, amount: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """features() followed by observe(), sharing the sketch lookups"""
+        self._rotate(time.monotonic() if now is None else now)
+        author_hash = _hash(author)
+        author_tips = self._tips.increment(author_hash)
+        pair_tips = self._pairs.increment(_hash((author, recipient)))
+        features = self._features(author_hash, author_tips, pair_tips, author, recipient, amount)
+        self._fanout.add(author_hash, _hash(recipient))
+        self._amounts.update(author_hash, amount)
+        return features
+
+    def _features(self, author_hash: int, author_tips: int, pair_tips: int, author: str, recipient: str,
+                  amount: float) -> Dict[str, Any]:
+        average, samples = self._amounts.get(author_hash)
+        if author_tips >= self.fanout_min:
+            fanout = min(author_tips, round(self._fanout.estimate(author_hash)))
+        else:
+            fanout = author_tips
+        return {
+            'author_tips': author_tips,
+            'author_fanout': fanout,
+            'pair_tips': pair_tips,
+            'reverse_pair_tips': self._pairs.estimate(_hash((recipient, author))),
+            'amount_ewma': average,
+            'amount_samples': samples,
+            'amount_ratio': amount / average if samples and average > 0 else 1.0
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Total sketch memory, fixed at construction"""
+        return self._tips.nbytes + self._pairs.nbytes + self._fanout.nbytes + self._amounts.nbytes
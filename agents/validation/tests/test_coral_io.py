@@ -0,0 +1,24 @@
+"""
+Parsing tips out of Coral messages
+"""
+
+import pytest
+
+from coral_io import parse_tip_payload
+
+
+def test_json_and_command_tips():
+    assert parse_tip_payload('{"tip": {"recipient": "@alice", "amount": 2}}') == \
+        {'recipient': 'alice', 'amount': 2.0, 'message': ''}
+    assert parse_tip_payload('/tip @bob 0.5 SOL thanks') == {'recipient': 'bob', 'amount': 0.5, 'message': 'thanks'}
+
+
+@pytest.mark.parametrize('content', [
+    '{"recipient": "alice", "amount": NaN}',
+    '{"recipient": "alice", "amount": Infinity}',
+    '{"tip": {"recipient": "alice", "amount": -Infinity}}',
+    '{"recipient": "alice", "amount": 1e400}',
+    '/tip @alice ' + '9' * 400 + ' SOL',
+])
+def test_non_finite_amounts_are_not_tips(content):
+    assert parse_tip_payload(content) is None
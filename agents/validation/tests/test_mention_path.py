@@ -0,0 +1,99 @@
+"""
+The validation agent's fast path for structured tips
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import main
+
+
+class FakeTool:
+    def __init__(self, result="ok"):
+        self.calls = []
+        self.result = result
+
+    async def ainvoke(self, args):
+        self.calls.append(args)
+        return self.result
+
+
+@pytest.fixture
+def validator(monkeypatch):
+    monkeypatch.setenv('VALIDATION_RATE_LIMITS', '2/300')
+    validator = main.TipValidator()
+    yield validator
+    validator.close()
+
+
+def run_tips(validator, mentions):
+    """Run each mention through process_tip_mention in turn and return the validation results"""
+    config = {'transaction_agent_id': 'transaction', 'notification_agent_id': 'notification'}
+    tools = {'send_message': FakeTool(), 'create_thread': FakeTool('{"thread": {"id": "fwd"}}')}
+
+    async def run():
+        threads = {}
+        for mention in mentions:
+            tip_data = dict(json.loads(mention['content'])['tip'])
+            await main.process_tip_mention(validator, tools, mention, tip_data, config, threads)
+
+    asyncio.run(run())
+    replies = [json.loads(call['content']) for call in tools['send_message'].calls]
+    return [reply for reply in replies if reply['type'] == 'validation_result']
+
+
+def test_author_is_the_sender_not_the_payload(validator):
+    # One sender claiming a new author_id on every tip still shares one rate limit
+    mentions = [
+        {'id': f'm{n}', 'threadId': 't1', 'senderId': 'console',
+         'content': json.dumps({'tip': {'recipient': 'alice', 'amount': 1.0, 'author_id': f'someone{n}'}})}
+        for n in range(3)
+    ]
+
+    results = run_tips(validator, mentions)
+
+    assert [reply['tip']['author_id'] for reply in results] == ['console'] * 3
+    assert [reply['result']['is_valid'] for reply in results] == [True, True, False]
+    assert 'Rate limit exceeded' in results[2]['result']['reason']
+
+
+def test_a_failed_tip_task_is_logged(validator, caplog):
+    class FailingTool:
+        async def ainvoke(self, args):
+            raise ConnectionError("coral went away")
+
+    mention = {'id': 'm1', 'threadId': 't1', 'senderId': 'console', 'content': ''}
+    tools = {'send_message': FailingTool(), 'create_thread': FailingTool()}
+
+    async def run():
+        task = asyncio.ensure_future(main.process_tip_mention(
+            validator, tools, mention, {'recipient': 'x', 'amount': 1.0}, {'notification_agent_id': 'notification'}, {}
+        ))
+        task.add_done_callback(main.log_task_error)
+        await asyncio.wait([task])
+
+    asyncio.run(run())
+
+    assert any('Tip task failed' in record.message and 'coral went away' in record.message
+               for record in caplog.records)
+
+
+def test_replies_echo_the_tip_id(validator):
+    mention = {'id': 'm1', 'threadId': 't1', 'senderId': 'console',
+               'content': json.dumps({'type': 'tip', 'tip_id': 'console-s-1',
+                                      'tip': {'recipient': 'alice', 'amount': 1.0, 'tip_id': 'console-s-1'}})}
+    config = {'transaction_agent_id': 'transaction', 'notification_agent_id': 'notification'}
+    tools = {'send_message': FakeTool(), 'create_thread': FakeTool('{"thread": {"id": "fwd"}}')}
+
+    async def run():
+        tip_data = main.parse_tip_payload(mention['content'])
+        await main.process_tip_mention(validator, tools, mention, tip_data, config, {})
+
+    asyncio.run(run())
+    sent = {json.loads(call['content'])['type']: json.loads(call['content']) for call in tools['send_message'].calls}
+
+    assert sent['validated_tip']['tip_id'] == 'console-s-1'
+    assert sent['validated_tip']['tip']['tip_id'] == 'console-s-1'
+    assert sent['validation_result']['tip_id'] == 'console-s-1'
@@ -0,0 +1,51 @@
+"""
+Rate limits shared between validation agent processes
+"""
+
+import multiprocessing
+
+from rate_limit import SqliteRateLimiter
+
+LIMITS = [(10, 60.0), (25, 3600.0)]
+NOW = 1_700_000_000.0
+
+
+def acquire_many(path, barrier, results, attempts):
+    """One replica: race the others to acquire tips for the same authors"""
+    limiter = SqliteRateLimiter(path, LIMITS)
+    try:
+        barrier.wait()
+        accepted = {'alice': 0, 'bob': 0}
+        for n in range(attempts):
+            # Spread over 30 s so the 10/60 window, not the 25/3600 one, is what binds
+            if limiter.acquire('alice', NOW + n * 30 / attempts) is None:
+                accepted['alice'] += 1
+            accepted['bob'] += limiter.admit('bob', 3, NOW)[0]
+        results.put(accepted)
+    finally:
+        limiter.close()
+
+
+def test_processes_sharing_a_database_stay_within_one_limit(tmp_path):
+    path = str(tmp_path / 'rate.db')
+    SqliteRateLimiter(path, LIMITS).close()
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(4)
+    results = context.Queue()
+    processes = [context.Process(target=acquire_many, args=(path, barrier, results, 20)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    accepted = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert sum(counts['alice'] for counts in accepted) == 10
+    assert sum(counts['bob'] for counts in accepted) == 10
+
+    limiter = SqliteRateLimiter(path, LIMITS)
+    try:
+        assert limiter.check('alice', NOW + 30)[:2] == (10, 60.0)
+        assert limiter.check('alice', NOW + 91) is None
+    finally:
+        limiter.close()
@@ -0,0 +1,79 @@
+"""
+validate_batch against validate_tip
+"""
+
+import pytest
+
+from main import TipValidator
+
+
+@pytest.fixture
+def validators(monkeypatch):
+    """One validator for the batch and one for validate_tip, since both count tips against rate limits"""
+    monkeypatch.setenv('VALIDATION_RATE_LIMITS', '3/300')
+    monkeypatch.setenv('MIN_TIP_AMOUNT', '0.001')
+    monkeypatch.setenv('MAX_TIP_AMOUNT', '100.0')
+    pair = TipValidator(), TipValidator()
+    for validator in pair:
+        validator.pipeline.reorder_every = 0
+    yield pair
+    for validator in pair:
+        validator.close()
+
+
+def verdicts(results):
+    return [(is_valid, reason, result['checks_passed'], result['checks_failed']) for is_valid, reason, result in results]
+
+
+def compare(validators, tips):
+    """Validate the tips both ways; the verdicts must match. Returns the batch results"""
+    batch_validator, tip_validator = validators
+    batch = batch_validator.validate_batch(tips)
+    assert verdicts(batch) == verdicts(tip_validator.validate_tip(dict(tip)) for tip in tips)
+    return batch
+
+
+def test_null_message_and_recipient(validators):
+    batch = compare(validators, [
+        {'recipient': 'alice', 'amount': 1.0, 'message': None, 'author_id': 'a1'},
+        {'recipient': None, 'amount': 1.0, 'message': 'thanks', 'author_id': 'a2'},
+        {'recipient': 'bob', 'amount': 1.0, 'author_id': 'a3'},
+        {'recipient': 'carol', 'amount': 1.0, 'message': '', 'author_id': 'a4'},
+    ])
+
+    assert [is_valid for is_valid, _, _ in batch] == [True, False, True, True]
+
+
+def test_rate_limited_authors(validators):
+    # a1 goes over 3/300 within the batch; a2's invalid tips do not count against it
+    tips = [{'recipient': f'user{n}', 'amount': 1.0, 'author_id': 'a1'} for n in range(5)]
+    tips += [{'recipient': 'x', 'amount': 1.0, 'author_id': 'a2'}] * 2
+    tips += [{'recipient': 'dave', 'amount': 1.0, 'author_id': 'a2'}] * 3
+    tips.insert(2, {'recipient': 'erin', 'amount': 1.0, 'author_id': 'a3'})
+
+    batch = compare(validators, tips)
+
+    assert [is_valid for is_valid, _, _ in batch] == [True, True, True, True, False, False, False, False, True, True, True]
+    assert 'Rate limit exceeded' in batch[4][1]
+    assert batch[4][2]['checks_failed'] == ['rate_limit']
+
+    # Limits carry over into the next batch
+    batch = compare(validators, [{'recipient': 'frank', 'amount': 1.0, 'author_id': author} for author in ('a1', 'a2', 'a3')])
+    assert [is_valid for is_valid, _, _ in batch] == [False, False, True]
+
+
+@pytest.mark.parametrize('amount, valid', [
+    (0.0, False), (-1.0, False), (0.0009, False), (0.001, True), (100.0, True), (100.0001, False), (1e9, False),
+])
+def test_out_of_range_amounts(validators, amount, valid):
+    batch = compare(validators, [{'recipient': 'alice', 'amount': amount, 'author_id': 'a1'}])
+
+    assert batch[0][0] is valid
+
+
+@pytest.mark.parametrize('amount', [float('nan'), float('inf'), float('-inf')])
+def test_non_finite_amounts(validators, amount):
+    batch = compare(validators, [{'recipient': 'alice', 'amount': amount, 'author_id': 'a1'}])
+
+    assert batch[0][0] is False
+    assert batch[0][2]['checks_failed'] == ['amount_invalid']
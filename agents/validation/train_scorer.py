@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Fraud Scorer Trainer
+Fits the LogisticScorer model offline from exported validation history
+
+The validation agent appends every accepted tip, with its model features,
+to VALIDATION_HISTORY_EXPORT. Label those records (for example by joining
+them with fraud reports) by setting a 0/1 field, then train:
+
+    uv run train_scorer.py history.jsonl --label-field fraud --output fraud_model.json
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional, Tuple
+
+from scorer import FEATURES
+
+
+def load_history(paths: List[str], label_field: str, unlabeled_as: Optional[int],
+                 features: List[str]) -> Tuple[List[List[float]], List[int], int]:
+    """Feature rows and labels from history exports; also returns how many records were skipped"""
+    rows, labels, skipped = [], [], 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                label = record.get(label_field, unlabeled_as)
+                values = record.get('features') or {}
+                if label is None or any(name not in values for name in features):
+                    skipped += 1
+                    continue
+                rows.append([float(values[name]) for name in features])
+                labels.append(1 if label else 0)
+    return rows, labels, skipped
+
+
+def train(x, y, epochs: int, learning_rate: float, l2: float):
+    """Full-batch gradient descent on L2-regularized log loss over standardized features"""
+    import numpy as np
+
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.0
+    z = (x - mean) / scale
+
+    # Weight the classes equally; fraud is rare and would otherwise be ignored
+    positives = y.sum()
+    sample_weights = np.where(y == 1, len(y) / (2 * max(positives, 1)), len(y) / (2 * max(len(y) - positives, 1)))
+
+    weights = np.zeros(z.shape[1])
+    bias = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-np.clip(z @ weights + bias, -500, 500)))
+        error = (p - y) * sample_weights
+        weights -= learning_rate * (z.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return mean, scale, weights, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the validation agent's fraud scorer")
+    parser.add_argument("history", nargs="+", help="JSONL exports written via VALIDATION_HISTORY_EXPORT")
+    parser.add_argument("--output", default="fraud_model.json", help="Model file for FRAUD_MODEL")
+    parser.add_argument("--label-field", default="fraud", help="Record field holding the 0/1 label")
+    parser.add_argument("--unlabeled-as", type=int, choices=[0, 1], help="Label for records without one (default: skip them)")
+    parser.add_argument("--features", nargs="+", default=list(FEATURES), choices=FEATURES)
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    try:
+        import numpy as np
+    except ImportError:
+        sys.exit("Training needs NumPy: uv sync --extra batch")
+
+    rows, labels, skipped = load_history(args.history, args.label_field, args.unlabeled_as, args.features)
+    if len(set(labels)) < 2:
+        sys.exit(f"Need both fraud and legitimate examples; found {len(labels)} labeled records ({skipped} skipped)")
+
+    x = np.array(rows, dtype=np.float64)
+    y = np.array(labels, dtype=np.float64)
+    mean, scale, weights, bias = train(x, y, args.epochs, args.learning_rate, args.l2)
+
+    p = 1.0 / (1.0 + np.exp(-np.clip(((x - mean) / scale) @ weights + bias, -500, 500)))
+    eps = 1e-12
+    log_loss = float(-np.mean(y * np.log(p + eps) + (1 - y) * np.log(1 - p + eps)))
+    flagged = p >= 0.5
+    recall = float((flagged & (y == 1)).sum() / max(y.sum(), 1))
+    precision = float((flagged & (y == 1)).sum() / max(flagged.sum(), 1))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'features': args.features,
+            'mean': mean.tolist(),
+            'scale': scale.tolist(),
+            'weights': weights.tolist(),
+            'bias': float(bias),
+            'trained_on': len(labels)
+        }, f, indent=2)
+
+    print(f"Trained on {len(labels)} records ({int(y.sum())} fraud, {skipped} skipped)")
+    print(f"log loss {log_loss:.4f}, precision {precision:.2%}, recall {recall:.2%} at p >= 0.5")
+    for name, weight in sorted(zip(args.features, weights), key=lambda item: -abs(item[1])):
+        print(f"  {name:<24} {weight:+.3f}")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
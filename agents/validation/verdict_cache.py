@@ -0,0 +1,66 @@
+"""
+Verdict Cache
+LRU cache with a TTL for the stateless part of tip validation
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class VerdictCache:
+    """Least-recently-used entries that also expire `ttl_seconds` after being stored
+
+    Expired entries are dropped when looked up, or when they reach the LRU
+    end while the cache is full.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if (time.monotonic() if now is None else now) >= expires:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, now: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = ((time.monotonic() if now is None else now) + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expirations': self.expirations,
+            'evictions': self.evictions
+        }